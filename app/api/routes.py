@@ -1,5 +1,10 @@
-from fastapi import APIRouter, Query
-from services.places import get_categories_by_district, filter_places
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from app.config.settings import settings
+from app.services.places import get_categories_by_district, filter_places, get_store
+from app.services.place_reload import get_reloader
+from app.services.place_search import search_index
 
 router = APIRouter()
 
@@ -10,4 +15,33 @@ async def categories(city: str = Query(...), district: str = Query(...)):
 @router.get("/places")
 async def places(city: str = Query(...), district: str = Query(...),
                  category: str | None = None, page:int=1, page_size:int=6):
-    return filter_places(city, district, category, page, page_size)
\ No newline at end of file
+    return filter_places(city, district, category, page, page_size)
+
+@router.get("/places/search")
+async def search_places(q: str = Query(..., min_length=1), city: str | None = None,
+                        district: str | None = None, category: str | None = None,
+                        limit: int = Query(10, ge=1, le=50)):
+    store = get_store()
+    hits = search_index(store).search(q, city=city, district=district, category=category, limit=limit)
+    return {"q": q, "version": store.version,
+            "items": [{**dict(h.place), "score": h.score} for h in hits]}
+
+
+# ---------- Admin ----------
+def _check_admin(token: str | None):
+    if not settings.admin_token:
+        raise HTTPException(status_code=404)
+    if not token or not hmac.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="invalid admin token")
+
+@router.get("/admin/places")
+async def admin_places(x_admin_token: str | None = Header(default=None)):
+    _check_admin(x_admin_token)
+    return {"store": get_store().stats(), "reload": get_reloader().stats()}
+
+@router.post("/admin/places/reload")
+async def admin_reload_places(force: bool = False, x_admin_token: str | None = Header(default=None)):
+    """立即檢查資料檔並熱更新；force=true 時即使檔案沒變也重建。"""
+    _check_admin(x_admin_token)
+    result = await get_reloader().reload(force=force)
+    return {**result, "reload": get_reloader().stats()}
@@ -35,8 +35,19 @@ class Settings(BaseSettings):
     places_dir: Path = Field(default=PROJECT_ROOT / "app" / "data", env="PLACES_DIR")
     # ✅ 舊：單一檔案（相容用；若設了就用它）
     places_path: Optional[Path] = Field(default=None, env="PLACES_PATH")
+    # 二進位快照（python -m app.services.place_snapshot 產生）；不存在或驗證失敗就讀 JSON
+    # 相對路徑以 places_dir 為準（GCS 同步下來的 .snap 也放在 places_dir），用 snapshot_path 取實際路徑
+    places_snapshot: Optional[Path] = Field(default=Path("places.snap"), env="PLACES_SNAPSHOT")
+
+    # 熱更新：每 N 秒檢查資料檔（0 = 關閉）；設了 GCS prefix 會先從 ASSETS_BUCKET/<prefix> 同步到 PLACES_DIR
+    places_reload_interval: float = Field(default=0, env="PLACES_RELOAD_INTERVAL")
+    places_gcs_prefix: Optional[str] = Field(default=None, env="PLACES_GCS_PREFIX")
+    # /admin/* 用的 token（X-Admin-Token）；沒設就關閉 admin endpoint
+    admin_token: Optional[str] = Field(default=None, env="ADMIN_TOKEN")
 
     assets_bucket: Optional[str] = Field(default=None, env="ASSETS_BUCKET")
+    # 影像合成 / 縮圖用的 process 數（0 = 在單一 thread 裡跑，不開 process）
+    image_workers: int = Field(default=1, env="IMAGE_WORKERS")
     assets_prefix: str = Field(default="imagemeps", env="ASSETS_PREFIX")
     
     # --- OpenAI ---
@@ -45,6 +56,48 @@ class Settings(BaseSettings):
 
     gemini_api_key: Optional[str] = Field(default=None, env="GEMINI_API_KEY")
     gemini_model: str = Field(default="models/gemini-2.5-flash", env="GEMINI_MODEL")
+    # 同時進行的 Gemini 呼叫數（= 專用 thread 數）與排隊上限
+    gemini_concurrency: int = Field(default=4, env="GEMINI_CONCURRENCY")
+    gemini_max_waiting: int = Field(default=64, env="GEMINI_MAX_WAITING")
+
+    # --- AI 回應快取 ---
+    ai_cache_ttl: float = Field(default=3600, env="AI_CACHE_TTL")          # 秒
+    ai_cache_max_entries: int = Field(default=1000, env="AI_CACHE_MAX_ENTRIES")
+    ai_cache_redis_url: Optional[str] = Field(default=None, env="AI_CACHE_REDIS_URL")  # 例：redis://redis:6379/0
+
+    # --- AI 串流推送：每位使用者 window 秒內最多幾則 push ---
+    ai_push_budget: int = Field(default=5, env="AI_PUSH_BUDGET")
+    ai_push_window: float = Field(default=60, env="AI_PUSH_WINDOW")
+
+    # --- AI / push 限流（token bucket；每種模式各一組，AI_RATE_LIMITS 可個別覆寫，見 rate_limit.parse_limits）---
+    ai_rate_user_per_min: float = Field(default=6, env="AI_RATE_USER_PER_MIN")
+    ai_rate_user_burst: int = Field(default=3, env="AI_RATE_USER_BURST")
+    ai_rate_global_per_min: float = Field(default=300, env="AI_RATE_GLOBAL_PER_MIN")
+    ai_rate_global_burst: int = Field(default=30, env="AI_RATE_GLOBAL_BURST")
+    ai_rate_limits: Optional[str] = Field(default=None, env="AI_RATE_LIMITS")
+    ai_rate_max_users: int = Field(default=100_000, env="AI_RATE_MAX_USERS")
+
+    # --- 使用者 session（最近推薦、上次的城市 / 行政區、分頁游標）---
+    session_ttl: float = Field(default=6 * 3600, env="SESSION_TTL")              # 秒，每次互動重新計算
+    session_max_users: int = Field(default=100_000, env="SESSION_MAX_USERS")
+    session_redis_url: Optional[str] = Field(default=None, env="SESSION_REDIS_URL")  # 多個 instance 共用
+
+    # --- Webhook 背景處理 ---
+    # 開啟後 webhook 驗完簽章立即回 200，事件交給背景處理（同一使用者依序、不同使用者並行）
+    webhook_async_ack: bool = Field(default=False, env="WEBHOOK_ASYNC_ACK")
+    webhook_workers: int = Field(default=4, env="WEBHOOK_WORKERS")            # 同時執行的 handler 上限
+    webhook_queue_size: int = Field(default=1000, env="WEBHOOK_QUEUE_SIZE")   # 積壓上限，超過就丟掉並記 log
+    # webhookEventId 去重：精確記住最近幾秒、Bloom filter 涵蓋多長、每個時間桶預估幾則事件
+    webhook_dedup_exact_ttl: float = Field(default=300, env="WEBHOOK_DEDUP_EXACT_TTL")
+    webhook_dedup_window: float = Field(default=3600, env="WEBHOOK_DEDUP_WINDOW")
+    webhook_dedup_capacity: int = Field(default=100_000, env="WEBHOOK_DEDUP_CAPACITY")
+    webhook_dedup_redis_url: Optional[str] = Field(default=None, env="WEBHOOK_DEDUP_REDIS_URL")  # 多個 instance 共用
+
+    # --- LINE Messaging API ---
+    # 測試時可指向本機 stub
+    line_api_base: str = Field(default="https://api.line.me", env="LINE_API_BASE")
+    line_max_retries: int = Field(default=3, env="LINE_MAX_RETRIES")
+
     # ---- 路徑工具 ----
     @property
     def taipei_path(self) -> Path:
@@ -72,6 +125,12 @@ class Settings(BaseSettings):
             return self.places_path
         return self.places_dir / "kaohsiung.json"
 
+    @property
+    def snapshot_path(self) -> Optional[Path]:
+        if not self.places_snapshot:
+            return None
+        return self.places_snapshot if self.places_snapshot.is_absolute() else self.places_dir / self.places_snapshot
+
     def get_city_data_path(self, city: str) -> Optional[Path]:
         """
         取得城市對應的檔案路徑。
@@ -92,9 +151,9 @@ class Settings(BaseSettings):
     # ---- 載入工具：合併多檔 or 讀單檔 ----
     def iter_place_files(self) -> Iterable[Path]:
         """
-        依設定產生應讀取的檔案清單：
+        依設定產生應讀取的檔案清單（JSON 讀取、二進位快照、place_prep、熱更新都用這一份）：
         - 若 places_path 是有效檔案 → 只讀它（舊法）
-        - 否則讀 places_dir 下的 taipei/taichung/kaohsiung.json（存在才讀）
+        - 否則讀 places_dir 下的 taipei/taichung/kaohsiung/newtaipei.json（存在才讀），再加上 *.csv
         """
         if self.places_path and self.places_path.is_file():
             yield self.places_path
@@ -103,21 +162,30 @@ class Settings(BaseSettings):
         for p in [self.taipei_path, self.taichung_path, self.kaohsiung_path,self.newtaipei_path]:
             if p.is_file():
                 yield p
+        yield from sorted(self.places_dir.glob("*.csv"))
 
     def load_places(self) -> List[Dict[str, Any]]:
         """
         將 iter_place_files() 依序讀入並合併成一個 list。
+        CSV 與前面已讀到的資料重複的（同城市、行政區、名稱）以先讀到的（JSON）為準。
         """
+        from app.services.place_prep import iter_source  # 避免 settings 一載入就帶進整個 services
+
         data: List[Dict[str, Any]] = []
+        seen = set()
         for fp in self.iter_place_files():
             try:
-                with fp.open("r", encoding="utf-8") as f:
-                    chunk = json.load(f)
-                if isinstance(chunk, list):
-                    data.extend(chunk)
+                rows = list(iter_source(fp))
             except Exception as e:
                 # 這裡你有 logging 的話可記錄
-                pass
+                continue
+            is_csv = fp.suffix.lower() == ".csv"
+            for p in rows:
+                key = (p.get("city"), p.get("district"), p.get("name"))
+                if is_csv and key in seen:
+                    continue
+                seen.add(key)
+                data.append(p)
         return data
 
     class Config:
@@ -0,0 +1,120 @@
+# app/handlers/commands.py
+"""
+文字訊息路由表：開機時依 DISTRICTS_MAP 與已載入的資料建好，
+每則訊息只做字典查詢與前綴比對，不再隨資料量重建集合或線性搜尋。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# 精確比對的指令 → 路由種類
+EXACT_COMMANDS: Dict[str, str] = {
+    "/today": "today", "今日推薦": "today",
+    "輪盤": "eat", "吃什麼": "eat", "/eat": "eat",
+    "開始": "start", "start": "start", "hi": "start", "hello": "start", "嗨": "start", "您好": "start",
+    "咖啡放鬆": "cafe_relax", "下午喝咖啡": "cafe_relax",
+    "下一頁": "next_page", "更多": "next_page", "/more": "next_page",
+}
+
+# GPT 模式指令（前綴）
+GPT_PREFIXES: Tuple[Tuple[str, str], ...] = (
+    ("/摘要", "summary"),
+    ("/翻譯", "translate"),
+    ("/改寫", "rewrite"),
+)
+
+
+# 景點搜尋指令（前綴；後面接關鍵字，空白可省略）
+# 單獨一個「找」一定要接空白：「找個地方吃飯」這類一般句子仍交給 GPT
+SEARCH_PREFIXES: Tuple[str, ...] = ("/search", "/找", "搜尋", "找 ", "找　")
+
+
+class Route(NamedTuple):
+    kind: str
+    args: tuple = ()
+
+
+def build_district_city_map(districts_map: Dict[str, List[str]],
+                            places: Iterable[Dict[str, Any]] = ()) -> Dict[str, str]:
+    """
+    行政區 → 城市 反查表。
+    同名行政區（例：大安區 在台北與台中都有）一律以 DISTRICTS_MAP 的城市順序為準，先出現者勝；
+    DISTRICTS_MAP 沒列到、只出現在資料中的行政區，取資料中第一次出現的城市。
+    """
+    out: Dict[str, str] = {}
+    for city, ds in districts_map.items():
+        for d in ds:
+            out.setdefault(d, city)
+    for p in places:
+        d, c = p.get("district"), p.get("city")
+        if d and c:
+            out.setdefault(d, c)
+    return out
+
+
+def _looks_like_district(t: str) -> bool:
+    return t.endswith("區") and 2 <= len(t) <= 4
+
+
+class TextRouter:
+    """
+    依原 webhook 的判斷順序把文字訊息對應到路由：
+    關鍵字卡片 → /ai → 精確指令 → CAT| → 城市（含 #pN 分頁）→ 行政區 → 搜尋 → GPT。
+    """
+
+    def __init__(self, districts_map: Dict[str, List[str]], places: Iterable[Dict[str, Any]] = (),
+                 default_city: Optional[str] = None):
+        places = list(places)
+        self.cities = frozenset(districts_map)
+        self.district_city = build_district_city_map(districts_map, places)
+        self.menu_districts = frozenset(d for ds in districts_map.values() for d in ds)
+        self.data_districts = frozenset(p.get("district") for p in places if p.get("district"))
+        self.default_city = default_city or "台北"
+
+    def city_of(self, district: str) -> Optional[str]:
+        return self.district_city.get(district)
+
+    def _match_city(self, t: str) -> Optional[Tuple[str, int]]:
+        # 等同 ^(台北|新北|台中|高雄)(?:#p(\d+))?$
+        if t in self.cities:
+            return t, 1
+        city, sep, page = t.partition("#p")
+        if sep and city in self.cities and page.isdecimal():
+            return city, int(page)
+        return None
+
+    def route(self, t: str) -> Route:
+        # 關鍵字卡片（包含判斷，需在精確指令之前）
+        if ("咖啡" in t and ("放鬆" in t or "下午" in t)) or EXACT_COMMANDS.get(t) == "cafe_relax":
+            return Route("cafe_relax")
+        if "北海岸" in t and ("一日遊" in t or "行程" in t):
+            return Route("north_coast")
+
+        if t.startswith("/ai ") or t.startswith("ai "):
+            return Route("ai", (t.split(" ", 1)[1].strip() or "請用繁體中文打招呼。",))
+
+        kind = EXACT_COMMANDS.get(t)
+        if kind:
+            return Route(kind)
+
+        if t.startswith("CAT|"):
+            return Route("cat", (t,))
+
+        hit = self._match_city(t)
+        if hit:
+            return Route("city", hit)
+
+        if t in self.menu_districts or _looks_like_district(t):
+            return Route("district", (self.city_of(t) or self.default_city, t))
+
+        if t in self.data_districts:
+            return Route("suggest", (t,))
+
+        for prefix in SEARCH_PREFIXES:
+            if t.startswith(prefix) and len(t) > len(prefix):
+                return Route("search", (t[len(prefix):].strip(),))
+
+        for prefix, mode in GPT_PREFIXES:
+            if t.startswith(prefix):
+                return Route("gpt", (mode, t.replace(prefix, "", 1).strip() or t))
+        return Route("gpt", (None, t))
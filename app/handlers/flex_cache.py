@@ -0,0 +1,85 @@
+# app/handlers/flex_cache.py
+"""
+地點卡片的 Flex 快取。
+
+- bubble：以 (資料版本, place 物件身分) 為 key，存完整 bubble dict（gmaps 已在 PlaceStore 載入時正規化）
+- page：以 (資料版本, city, district, category, page, page_size) 為 key，存整則 flex 訊息 dict
+  （LineClient 直接收 dict，不必再經過 FlexMessage.from_dict 來回轉換）
+- 資料版本變了（重新載入）就整個清空；只快取有資料的頁，空結果不佔位
+- 呼叫端可帶入自己握著的 store 版本；熱更新後仍在處理的舊版請求照樣算出結果，但不寫進快取
+
+place 身分用 id(p)，同時把 p 本身存進快取，確保物件存活期間 id 不會被重用。
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.handlers.replies import bubble_from_place
+from app.utils.category import CATEGORY_LABELS
+
+
+class FlexCache:
+    def __init__(self, version_fn: Callable[[], Any]):
+        self._version_fn = version_fn
+        self._version: Any = None
+        self._bubbles: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._pages: Dict[tuple, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version: Any = None) -> bool:
+        """回傳 version（沒給就用目前版本）是否就是快取所屬的版本；舊版請求回 False。"""
+        v = self._version_fn() if version is None else version
+        if v == self._version:
+            return True
+        if version is not None and version != self._version_fn():
+            return False
+        self._version = v
+        self._bubbles.clear()
+        self._pages.clear()
+        return True
+
+    def bubble(self, p: Dict[str, Any], version: Any = None) -> Dict[str, Any]:
+        if not self._check_version(version):
+            return bubble_from_place(p)
+        hit = self._bubbles.get(id(p))
+        if hit is not None and hit[0] is p:
+            return hit[1]
+        b = bubble_from_place(p)
+        self._bubbles[id(p)] = (p, b)
+        return b
+
+    def page_message(self, city: str, district: str, category: str, page: int, page_size: int,
+                     items_fn: Callable[[], List[Dict[str, Any]]],
+                     version: Any = None) -> Optional[Dict[str, Any]]:
+        """回傳該頁的 flex 訊息 dict；沒有資料回 None。items_fn 只在未命中時呼叫。"""
+        current = self._check_version(version)
+        key = (city, district, category, page, page_size)
+        msg = self._pages.get(key) if current else None
+        if msg is not None:
+            self.hits += 1
+            return msg
+
+        self.misses += 1
+        items = items_fn()
+        if not items:
+            return None
+        bubbles = [self.bubble(p, version) for p in items]
+        contents = bubbles[0] if len(bubbles) == 1 else {"type": "carousel", "contents": bubbles}
+        msg = {
+            "type": "flex",
+            "altText": f"{city}{district}｜{CATEGORY_LABELS.get(category, category)}（第 {page} 頁）",
+            "contents": contents,
+        }
+        if current:
+            self._pages[key] = msg
+        return msg
+
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "bubbles": len(self._bubbles),
+            "pages": len(self._pages),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,16 +1,17 @@
-from linebot.v3.messaging import Configuration, ApiClient, MessagingApi, ReplyMessageRequest, PushMessageRequest
 from linebot.v3.messaging.models import (
     TextMessage, QuickReply, QuickReplyItem, MessageAction,
-    ImagemapMessage, ImagemapBaseSize, ImagemapArea, MessageImagemapAction,
     FlexMessage
 )
 import json
+from functools import lru_cache
 from app.utils.category import CATEGORY_LABELS, to_category
+from app.utils.links import https_image_url
 from app.config.settings import settings
 from urllib.parse import quote
 from app.services.today_recommend import pick_today_place
 from app.services.roulette import spin_food_roulette
-from linebot.v3.messaging.exceptions import ApiException
+from app.services.line_client import LineApiError
+from app.services.imagemap_layout import get_layout
 import os
 import time
 import re
@@ -80,9 +81,10 @@ def create_district_selection_message(city: str, page: int = 1) -> TextMessage:
     return TextMessage(text=title, quick_reply=QuickReply(items=qr_items))
 
 
+@lru_cache(maxsize=1)
 def _versioned_base_url() -> str:
     """
-    產生帶 /v{ver} 的 baseUrl。
+    產生帶 /v{ver} 的 baseUrl（每個 process 算一次）。
     規則：
     1) 若 ASSET_BASE_URL 已經有 /vxxx 結尾 -> 原樣返回
     2) 否則在尾巴加 /v{ASSET_VER | GITHUB_SHA | 啟動時間戳}
@@ -99,47 +101,20 @@ def _versioned_base_url() -> str:
     ver = os.getenv("ASSET_VER") or os.getenv("GITHUB_SHA") or str(int(time.time()))
     return f"{base}/v{ver}"
 
-def make_category_imagemap(city: str, district: str) -> ImagemapMessage:
-    size = ImagemapBaseSize(height=1040, width=1040)
-    W, H = 520, 346
-    rects = [
-        (0,   0,   "landmark"),
-        (520, 0,   "museum"),
-        (0,   346, "park_walk"),
-        (520, 346, "food_market"),
-        (0,   692, "temple_history"),
-        (520, 692, "family_fun"),
-    ]
-
-    actions = []
-    for x, y, cat in rects:
-        payload = f"CAT|{city}|{district}|{cat}|1"
-        actions.append(
-            MessageImagemapAction(
-                text=payload,
-                area=ImagemapArea(x=int(x), y=int(y), width=int(W), height=int(H)),
-            )
-        )
-
-    base_url = _versioned_base_url()  # ← 這裡一定會是 /imgmap/categories/v{ver}
-    return ImagemapMessage(
-        base_url=base_url,
-        alt_text=f"{city}{district}｜請選擇類別",
-        base_size=size,
-        actions=actions,
-    )
+def make_category_imagemap(city: str, district: str, layout: str = "categories") -> dict:
+    """
+    類別選單 imagemap（LINE API dict）。格子座標與類別來自 imagemap_layout 的登錄表，
+    和網格圖用的是同一份定義；每次只代入 city|district。
+    """
+    return get_layout(layout).message(city, district, _versioned_base_url())  # baseUrl 一定是 /imgmap/categories/v{ver}
 
 
 
 def _pick_image_url(p: dict) -> str:
-    """回傳可供 LINE 顯示的圖片網址：優先用 p['image_url']，否則給備援。"""
-    url = (p.get("image_url") or "").strip()
+    """回傳可供 LINE 顯示的圖片網址：優先用 p['image_url']（place_prep 已預先轉好 https），否則給備援。"""
+    url = https_image_url(p.get("image_url"))
 
-    # 1) 強制 HTTPS（LINE 要求）
-    if url.startswith("http://"):
-        url = "https://" + url[len("http://"):]
-
-    # 2) 沒提供或是空字串 → 備援圖
+    # 沒提供、空字串或不是 https 絕對網址 → 備援圖
     if not url:
         # 你的自家 CDN/靜態圖（建議）
         # return settings.asset_base_url.rstrip("/") + "/assets/places/default_hero.jpg"
@@ -192,28 +167,30 @@ def _extract_user_id(ev) -> str | None:
     except Exception:
         return None
 
-def safe_reply_or_push(msg_api, ev, reply_tok: str, messages: list) -> bool:
+async def safe_reply_or_push(line, ev, reply_tok: str, messages: list) -> bool:
+    """
+    先嘗試 reply；若遇到 Invalid reply token (400) 就改用 push。
+    line 為 app.services.line_client.LineClient；回傳 True 代表已送出任一種訊息。
+    """
+    user_id = _extract_user_id(ev)
     try:
-        msg_api.reply_message(ReplyMessageRequest(replyToken=reply_tok, messages=messages))
+        await line.reply(reply_tok, messages, user_id=user_id)
         return True
-    except ApiException as e:
-        body = getattr(e, "body", "") or getattr(e, "reason", "")
-        if e.status == 400 and "Invalid reply token" in str(body):
-            user_id = _extract_user_id(ev)
-            if user_id:
-                msg_api.push_message(PushMessageRequest(to=user_id, messages=messages))
+    except LineApiError as e:
+        if e.invalid_reply_token and user_id:
+            try:
+                await line.push(user_id, messages)
                 return True
+            except LineApiError:
+                pass
         # 其他錯誤：回 False 讓呼叫端決定要不要補一則純文字
         return False
     
 # --- 今日推薦：把 place 轉 Flex ---
 from urllib.parse import quote
 from typing import Dict, Any
-try:
-    # 若你的 places 模組有 PLACES，拿來做名稱→物件對照
-    from app.services.places import PLACES  # 可選
-except Exception:
-    PLACES = []
+from collections.abc import Mapping
+from app.services.places import get_store
 
 def _gmaps_search_url(name: str, lat=None, lng=None) -> str:
     # 沒座標就用關鍵字搜尋
@@ -224,15 +201,14 @@ def _to_place_obj(p: Any) -> Dict[str, Any]:
     把可能是 str/dict 的 place 正規化成 dict，
     至少提供 name/description/gmaps/image_url 這些欄位。
     """
-    if isinstance(p, dict):
+    if isinstance(p, Mapping):
         return p
 
     if isinstance(p, str):
-        # 1) 試著在 PLACES 裡找到同名物件
-        for obj in PLACES or []:
-            name = obj.get("name") or obj.get("title")
-            if name and name.strip() == p.strip():
-                return obj
+        # 1) 用 store 的名稱索引找同名物件
+        obj = get_store().by_name.get(p.strip())
+        if obj is not None:
+            return obj
         # 2) 找不到就用最小結構包起來
         return {
             "name": p,
@@ -251,12 +227,16 @@ def _to_place_obj(p: Any) -> Dict[str, Any]:
 
 def create_today_pick_message(city: str | None = None,
                               district: str | None = None,
-                              category: str | None = None):
-    places = pick_today_place(city=city, district=district, category=category, limit=1)
-    if not places:
-        return None
-
-    p = _to_place_obj(places[0])          # 確保是 dict
+                              category: str | None = None,
+                              place=None):
+    """place 有給就直接用（呼叫端已經依 session 挑好），否則現挑一筆。"""
+    if place is None:
+        places = pick_today_place(city=city, district=district, category=category, limit=1)
+        if not places:
+            return None
+        place = places[0]
+
+    p = _to_place_obj(place)              # 確保是 dict
     bubble = bubble_from_place(p)         # 這裡要回 dict，且內含 "type": "bubble"
 
     # ✅ 修正：from_dict 要含 "type": "flex"
@@ -271,8 +251,8 @@ def create_today_pick_message(city: str | None = None,
     })
 
 # --- 吃什麼輪盤：把抽到的食物轉 Flex ---
-def create_food_roulette_message(city: str = "台北", district: str = "信義區") -> FlexMessage:
-    result = spin_food_roulette(city=city, district=district)
+def create_food_roulette_message(city: str = "台北", district: str = "信義區", result=None) -> FlexMessage:
+    result = result or spin_food_roulette(city=city, district=district)
     food = result["food"]
     gmaps = result["gmaps"]
     
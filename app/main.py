@@ -1,22 +1,17 @@
 # app/main.py
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 from datetime import datetime
-from math import radians, sin, cos, asin, sqrt
 from pathlib import Path
 import json
 import logging
-from linebot.v3.messaging.models import ReplyMessageRequest, PushMessageRequest, TextMessage
-from linebot.v3.messaging.exceptions import ApiException
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from linebot.v3.messaging import (
-    MessagingApi, Configuration, ApiClient,
-    ReplyMessageRequest, TextMessage, FlexMessage
-)
+from linebot.v3.messaging import TextMessage, FlexMessage
 from linebot.v3.webhook import WebhookParser
 
 from app.config.settings import settings
@@ -24,186 +19,198 @@ from app.handlers.replies import (
     create_city_selection_message,
     create_district_selection_message,
     make_category_imagemap,
-    bubble_from_place,
     DISTRICTS_MAP,
 )
-from app.handlers.replies import create_today_pick_message, create_food_roulette_message
-from app.services.places import filter_places
+from app.handlers.replies import create_today_pick_message, create_food_roulette_message, safe_reply_or_push
+from app.handlers.commands import Route, TextRouter
+from app.services.places import PlaceStore, filter_places, get_store, register_warmer
+from app.services.place_search import search_index
+from recommend.engine import RecQuery, get_engine
+from app.services.place_reload import get_reloader
+from app.handlers.flex_cache import FlexCache
+from app.api.routes import router as places_router
 from app.utils.category import CATEGORY_LABELS
-from app.utils.links import normalize_existing_gmaps
-from app.services.image_compose import build_if_needed, ensure_resized
-from app.services.gemini import generate_text 
+from app.services.image_compose import LADDER_SIZES, derivative_path, generate_derivatives, make_category_grid_image
+from app.services.image_pool import ImageWorkPool
+from app.services.imagemap_layout import CATEGORY_GRID
+from app.services.asset_prep import AssetPreparer
+from app.services.imagemap_cache import CACHE_IMMUTABLE, CACHE_REVALIDATE, EncodedImageCache, etag_matches
+from app.services.event_queue import EventDispatcher, event_user_id
+from app.services.event_dedup import DEDUP
+from app.services.session_store import SESSIONS
+from app.services.today_recommend import pick_today_place
+from app.services.roulette import spin_food_roulette
+from app.services.line_client import LineClient
+from app.services.ai_cache import AI_CACHE
+from app.services.gemini import cached_text, generate_text, stream_text, start_pool, shutdown_pool, get_pool
+from app.services.ai_stream import MAX_LINE_TEXT, PushBudget, stream_to_user
+from app.services.rate_limit import LIMITER, limited_reply
 from app.handlers.ai_cards import itinerary_flex, cafe_list_flex
 from linebot.v3.messaging.models import FlexMessage, QuickReply, QuickReplyItem, MessageAction
 import hmac, hashlib
 from base64 import b64encode
-from io import BytesIO
 from fastapi import Response
-from PIL import Image
-from google.cloud import storage
-import re
 
 log = logging.getLogger(__name__)
 
-# 你六張分類小圖（檔名不變）
-CATS_SRC = [
-    "categories_1040_0.png",
-    "categories_1040_1.png",
-    "categories_1040_2.png",
-    "categories_1040_3.png",
-    "categories_1040_4.png",
-    "categories_1040_5.png",
-]
+# 分類小圖檔名由版面登錄表決定（與 imagemap 的 action 座標同一份定義）
+CATS_SRC = CATEGORY_GRID.sources
 
 TMP_DIR = "/tmp/imagemeps"   # ← 新增：統一用 /tmp
 
-def _sync_from_gcs(bucket_name: str, prefix: str, files: list[str], local_dir: str):
-    """把 GCS 上 prefix/files 同步到 local_dir"""
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
-    Path(local_dir).mkdir(parents=True, exist_ok=True)
-    for fn in files:
-        blob = bucket.blob(f"{prefix}/{fn}".strip("/"))
-        dst = Path(local_dir) / fn
-        blob.download_to_filename(str(dst))
+# PIL 合成 / 縮圖都丟到獨立 process，不跟 webhook 搶 GIL；同一個輸出同時只做一次
+IMAGE_POOL = ImageWorkPool(workers=settings.image_workers)
+
+def _ladder_key(base) -> tuple:
+    return ("ladder", str(base))
+
+# 素材準備（GCS 並行同步 + 內容 hash 快取的網格合成）在背景跑，不擋開機
+ASSETS = AssetPreparer(
+    TMP_DIR, CATS_SRC,
+    bucket=settings.assets_bucket, prefix=settings.assets_prefix,
+    compose=lambda out, base, cats: IMAGE_POOL.run_sync(("grid", out), make_category_grid_image, out, base, cats),
+    # 網格換了（或有尺寸缺檔）就一次產生 1040/700/460/300/240 全組
+    derive=lambda base, rebuilt: IMAGE_POOL.run_sync(
+        _ladder_key(base), generate_derivatives, str(base), LADDER_SIZES, rebuilt),
+)
+# 圖片請求最多等素材準備多久（秒）；逾時就用 /tmp 現有的檔案
+ASSETS_WAIT_S = 20
 
 # ---------- App lifecycle ----------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    try:
-        # 1) 從 GCS 同步六張 1040 小圖到 /tmp/imagemeps
-        if not settings.assets_bucket:
-            log.error("ASSETS_BUCKET 未設定，將跳過同步（服務仍會啟動）")
-        else:
-            _sync_from_gcs(settings.assets_bucket, settings.assets_prefix, CATS_SRC, TMP_DIR)
-
-        # 2) 刪除舊 1040 grid，強迫重建
-        p1040 = Path(TMP_DIR) / "categories_1040_grid.png"
-        if p1040.exists():
-            p1040.unlink()
-
-        # 3) 組新版 1040 grid（輸出在 /tmp/imagemeps）
-        build_if_needed(
-            output_path=str(p1040),
-            base_path=TMP_DIR,
-            categories=CATS_SRC,
-        )
-
-        # 4) 砍掉舊縮圖，讓 700/460 重新產生
-        for s in (700, 460):
-            p = Path(TMP_DIR) / f"categories_{s}.png"
-            if p.exists():
-                p.unlink()
-
-        log.info("[lifespan] synced/rebuilt assets under %s", TMP_DIR)
-    except Exception as e:
-        log.exception("[lifespan] prepare assets failed: %s", e)
+    # 1) 同步六張 1040 小圖 → 2) 來源沒變就沿用上次的 1040 grid 與各尺寸縮圖；全部在背景
+    ASSETS.start()
+
+    # Gemini 模型與專用 executor 只建一次
+    start_pool()
+
+    # 背景事件 worker（WEBHOOK_ASYNC_ACK=true 才啟動）
+    if settings.webhook_async_ack:
+        EVENTS.start()
+
+    # 資料熱更新（PLACES_RELOAD_INTERVAL > 0 才輪詢；admin endpoint 隨時可手動觸發）
+    RELOADER.mark_loaded(get_store())
+    RELOADER.start()
 
     yield
+
+    await RELOADER.stop()
+    await EVENTS.stop()
+    await ASSETS.stop()
+    await LINE.aclose()
+    shutdown_pool()
+    IMAGE_POOL.shutdown()
     return
 
 
 app = FastAPI(lifespan=lifespan)
+app.include_router(places_router)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 app.mount("/liff", StaticFiles(directory="app/static/liff", html=True))
 
 # ---------- Static helpers ----------
-@app.get("/imgmap/categories/{size}")
-def imagemap_categories(size: int):
+# 每個尺寸編碼好的 bytes 常駐記憶體；網格重建（檔案 mtime 變）時自動重讀。
+# 縮圖全由背景的 generate_derivatives 產生，請求路徑上只讀檔，不做任何 PIL 處理
+IMAGE_CACHE = EncodedImageCache(lambda size: derivative_path(size, base_dir=TMP_DIR))
+
+async def _load_image(size: int):
+    """命中記憶體快取就直接回；否則在 thread 讀檔，缺檔時請 image pool 補產整組尺寸後再讀一次。"""
     try:
-        # 如果 ensure_resized 支援 base_dir 參數，用它指向 /tmp
-        # 若不支援，就維持原來的呼叫
-        try:
-            img_path = ensure_resized(size, base_dir=TMP_DIR)  # ✅ 推薦
-        except TypeError:
-            img_path = ensure_resized(size)  # 舊版簽名就用這個
-
-        im = Image.open(img_path)
-        if im.mode != "RGB":
-            im = im.convert("RGB")
-
-        buf = BytesIO()
-        im.save(buf, format="PNG")
-        buf.seek(0)
-
-        resp = Response(buf.getvalue(), media_type="image/png")
-        resp.headers["Cache-Control"] = "no-store"
-        resp.headers["Pragma"] = "no-cache" # 不要快取
-        return resp
-    except HTTPException:
-        raise
+        return await asyncio.to_thread(IMAGE_CACHE.get, size)
+    except FileNotFoundError:
+        if size not in LADDER_SIZES:
+            raise
+    await IMAGE_POOL.run(_ladder_key(TMP_DIR), generate_derivatives, TMP_DIR, LADDER_SIZES, False)
+    return await asyncio.to_thread(IMAGE_CACHE.get, size)
+
+async def _imagemap_response(request: Request, size: int, versioned: bool) -> Response:
+    await ASSETS.until_ready(ASSETS_WAIT_S)
+    try:
+        img = IMAGE_CACHE.peek(size) or await _load_image(size)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        log.exception("imagemap build failed: %s", e)
+        log.exception("imagemap load failed: %s", e)
         raise HTTPException(status_code=500, detail=f"image build failed: {e}")
-    
-# 版本化路徑（忽略 ver，單純用來破快取）
+
+    # /v{ver}/ 路徑內容不會變 → 長期快取；未版本化路徑短暫快取後用 ETag 重新驗證
+    headers = {"ETag": img.etag, "Cache-Control": CACHE_IMMUTABLE if versioned else CACHE_REVALIDATE}
+    if etag_matches(request.headers.get("if-none-match"), img.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(img.data, media_type=img.media_type, headers=headers)
+
+# async route：event loop 上只做查表，檔案讀取與 PIL 工作都不在這裡跑
+@app.get("/imgmap/categories/{size}")
+async def imagemap_categories(size: int, request: Request):
+    return await _imagemap_response(request, size, versioned=False)
+
+# 版本化路徑（ver 只用來破快取，內容與未版本化相同）
 @app.get("/imgmap/categories/v{ver}/{size}")
-def imagemap_categories_v(ver: str, size: int):
-    return imagemap_categories(size)
+async def imagemap_categories_v(ver: str, size: int, request: Request):
+    return await _imagemap_response(request, size, versioned=True)
 
 @app.get("/imgmap/categories/v{ver}/{size}.png")
-def imagemap_categories_v_png(ver: str, size: int):
-    return imagemap_categories(size)
-
-
-# ---------- Load data & normalize links ----------
-PLACES = settings.load_places()
-log.info("[BOOT] DATA_SIZE=%d files=%s",
-         len(PLACES), [str(p) for p in settings.iter_place_files()])
-
-for p in PLACES:
-    g = p.get("geo") or {}
-    p["gmaps"] = normalize_existing_gmaps(
-        p.get("gmaps"),
-        name=p.get("name"),
-        lat=(float(g.get("lat")) if g.get("lat") is not None else None),
-        lng=(float(g.get("lng")) if g.get("lng") is not None else None),
-        place_id=p.get("place_id"),
-    )
+async def imagemap_categories_v_png(ver: str, size: int, request: Request):
+    return await _imagemap_response(request, size, versioned=True)
+
+
+# ---------- Load data ----------
+# 唯一的資料來源：載入一次、gmaps 已正規化、唯讀；索引與座標表都掛在 store 上。
+# 熱更新會整個換掉 store，所以每個 handler 開頭取一次 get_store()，之後都用同一份
+_BOOT_STORE = get_store()
+log.info("[BOOT] DATA_SIZE=%d origin=%s files=%s load_ms=%.1f",
+         len(_BOOT_STORE), _BOOT_STORE.origin, _BOOT_STORE.sources, _BOOT_STORE.load_ms)
+
+# 文字路由表（指令 / 城市 / 行政區 → 城市反查），每版資料建一次
+@register_warmer
+def text_router(store: PlaceStore) -> TextRouter:
+    return store.derived("text_router",
+                         lambda s: TextRouter(DISTRICTS_MAP, s.rows, default_city=settings.city_default))
+
+# 全文搜尋索引（增量建置：沒變的資料沿用上一版的斷詞結果）
+register_warmer(search_index)
+# 推薦引擎的特徵表（今日推薦 / 行政區推薦共用）
+register_warmer(get_engine)
+
+# 開機這一份也先建好（位置訊息用的網格索引、欄式座標表、路由表）
+_BOOT_STORE.warm()
+log.info("[BOOT] GEO_INDEX size=%d types=%s", _BOOT_STORE.geo_index.size, _BOOT_STORE.geo_index.types())
+RELOADER = get_reloader()
 
 # ---------- LINE SDK ----------
 CHANNEL_SECRET = settings.channel_secret
 CHANNEL_TOKEN  = settings.channel_access_token
 SKIP_VERIFY    = settings.should_skip_verify
 
-configuration = Configuration(access_token=CHANNEL_TOKEN)
-api_client = ApiClient(configuration)
-msg_api = MessagingApi(api_client)
+# AI 串流推送的每人額度（push 會計入 LINE 月額度）
+PUSH_BUDGET = PushBudget(limit=settings.ai_push_budget, window=settings.ai_push_window)
+
+# 地點卡片 / 分頁 carousel 快取，資料重新載入（索引版本變更）時自動清空
+FLEX_CACHE = FlexCache(lambda: get_store().version)
+
+# 非同步、連線池化的 Messaging API 客戶端（429/5xx 自動重試、同 reply token 合併送出）
+LINE = LineClient(CHANNEL_TOKEN, base_url=settings.line_api_base, max_retries=settings.line_max_retries)
 parser = WebhookParser(CHANNEL_SECRET)
 
 log.info("[BOOT] ENV=%s SKIP_VERIFY=%s SECRET_SET=%s TOKEN_SET=%s DATA_SIZE=%d",
-         settings.env, SKIP_VERIFY, bool(CHANNEL_SECRET), bool(CHANNEL_TOKEN), len(PLACES))
+         settings.env, SKIP_VERIFY, bool(CHANNEL_SECRET), bool(CHANNEL_TOKEN), len(_BOOT_STORE))
+del _BOOT_STORE  # 之後一律透過 get_store() 取目前版本
 
 # ---------- Small utils ----------
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    dlat, dlon = radians(lat2 - lat1), radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    return 2 * R * asin(sqrt(a))  # km
-
-def pick_by_location(lat: float | None, lng: float | None, now: datetime) -> str:
+def pick_by_location(lat: float | None, lng: float | None, now: datetime,
+                     store: PlaceStore | None = None) -> str:
     if lat is None or lng is None:
         return "沒有取得你的定位，請再傳一次位置訊息～"
-    if not PLACES:
+    store = store or get_store()
+    if not store.rows:
         return "目前景點資料尚未載入，請稍後再試～"
 
-    def _dist_km(p):
-        g = p.get("geo") or {}
-        plat, plng = g.get("lat"), g.get("lng")
-        if plat is None or plng is None:
-            return None
-        return haversine(lat, lng, float(plat), float(plng))
-
-    def _top1_by_type(t):
-        cand = [p for p in PLACES if p.get("type") == t]
-        cand = [(p, _dist_km(p)) for p in cand]
-        cand = [(p, d) for p, d in cand if d is not None]
-        cand.sort(key=lambda x: x[1])
-        return cand[0][0] if cand else None
-
-    walk = _top1_by_type("walk")
-    cafe = _top1_by_type("cafe")
-    special = _top1_by_type("spot") or _top1_by_type("event")
+    lat, lng = float(lat), float(lng)
+    geo = store.geo_index
+    walk = geo.nearest_one("walk", lat, lng)
+    cafe = geo.nearest_one("cafe", lat, lng)
+    special = geo.nearest_one("spot", lat, lng) or geo.nearest_one("event", lat, lng)
 
     def _pack(p): return f"{p['name']}\n{p['gmaps']}"
 
@@ -213,40 +220,45 @@ def pick_by_location(lat: float | None, lng: float | None, now: datetime) -> str
     if special:parts.append("🎯 景點（就近）：\n" + _pack(special))
     return "\n\n".join(parts) or "附近暫時找不到帶座標的景點，請先輸入行政區名稱查詢～"
 
-def pick_suggestions(district: str | None, now: datetime) -> str:
-    if not PLACES:
+@app.get("/places/nearby")
+def places_nearby(lat: float, lng: float, n: int = 3):
+    """每個類別最近的 n 筆（只計入有座標的資料）"""
+    n = max(1, min(n, 20))
+    groups = get_store().geo_store.nearest_per_category(lat, lng, n=n)
+    return {
+        "lat": lat, "lng": lng,
+        "categories": {
+            cat: [{"name": p.get("name"), "type": p.get("type"), "district": p.get("district"),
+                   "distance_km": round(d, 3), "gmaps": p.get("gmaps")} for d, p in hits]
+            for cat, hits in groups.items()
+        },
+    }
+
+def pick_suggestions(district: str | None, now: datetime, store: PlaceStore | None = None) -> str:
+    store = store or get_store()
+    if not store.rows:
         return "目前景點資料尚未載入，請稍後再試～"
+    engine = get_engine(store)
 
     def _pack(p): return f"{p['name']}\n{p['gmaps']}"
     if not district:
         return "請輸入或點選行政區，例如「信義區／西屯區／苓雅區」～"
 
-    def filt_by_type(t):
-        return [p for p in PLACES if p.get("type") == t and p.get("district") == district]
+    # 各 type 分數最高的一筆（popularity + 此刻營業中）；行政區沒有就退到整個城市
+    def best_of_type(t, city=None):
+        q = RecQuery(city=city, district=None if city else district, types=(t,), k=1)
+        return [r.place for r in engine.recommend(q, now)]
 
-    walk = filt_by_type("walk")[:1]
-    cafe = filt_by_type("cafe")[:1]
-    special = (filt_by_type("spot")[:1]) or (
-        [p for p in PLACES if p.get("type") == "event" and p.get("district") == district][:1]
-    )
+    walk = best_of_type("walk")
+    cafe = best_of_type("cafe")
+    special = best_of_type("spot") or best_of_type("event")
 
     if not (walk or cafe or special):
-        possible_cities = {p.get("city") for p in PLACES if p.get("district") == district}
-        city = next(iter(possible_cities), None) or {
-            # 簡易映射
-            "信義區":"台北","大安區":"台北","中正區":"台北","松山區":"台北","萬華區":"台北","大同區":"台北",
-            "中山區":"台北","內湖區":"台北","南港區":"台北","士林區":"台北","北投區":"台北","文山區":"台北",
-            "西屯區":"台中","北屯區":"台中","南屯區":"台中","中區":"台中","西區":"台中","北區":"台中",
-            "東區":"台中","南區":"台中","太平區":"台中","大里區":"台中","霧峰區":"台中","烏日區":"台中",
-            "鹽埕區":"高雄","鼓山區":"高雄","三民區":"高雄","苓雅區":"高雄","前金區":"高雄","新興區":"高雄",
-            "前鎮區":"高雄","左營區":"高雄","楠梓區":"高雄","小港區":"高雄","鳳山區":"高雄","仁武區":"高雄",
-        }.get(district)
-
+        city = text_router(store).city_of(district)
         if city:
-            def filt_city_type(t): return [p for p in PLACES if p.get("type") == t and p.get("city") == city]
-            walk = walk or filt_city_type("walk")[:1]
-            cafe = cafe or filt_city_type("cafe")[:1]
-            special = special or filt_city_type("spot")[:1] or filt_city_type("event")[:1]
+            walk = walk or best_of_type("walk", city)
+            cafe = cafe or best_of_type("cafe", city)
+            special = special or best_of_type("spot", city) or best_of_type("event", city)
 
     parts = []
     if walk:   parts.append("🚶 散步：\n" + _pack(walk[0]))
@@ -255,58 +267,49 @@ def pick_suggestions(district: str | None, now: datetime) -> str:
     return "\n\n".join(parts) if parts else \
         f"「{district}」目前沒有資料，看起來你尚未匯入該城市的清單。"
 
-def _to_float(v):
-    try:
-        if v is None: 
-            return None
-        s = str(v).strip()
-        if s == "":
-            return None
-        return float(s)
-    except (TypeError, ValueError):
+SEARCH_LIMIT = 10
+
+def search_message(q: str, store: PlaceStore) -> dict | None:
+    """搜尋結果的 flex carousel（bubble 走 FLEX_CACHE）；沒有結果回 None。"""
+    hits = search_index(store).search(q, limit=SEARCH_LIMIT)
+    if not hits:
         return None
+    bubbles = [FLEX_CACHE.bubble(h.place, store.version) for h in hits]
+    contents = bubbles[0] if len(bubbles) == 1 else {"type": "carousel", "contents": bubbles}
+    return {"type": "flex", "altText": f"「{q}」的搜尋結果", "contents": contents}
 
-def reply_places_list(reply_token: str, city: str, district: str, category: str,
-                      page: int = 1, page_size: int = 6):
-    res = filter_places(city, district, category, page=page, page_size=page_size)
-    items = res.get("items", [])
-
-    # ✅ 在這裡統一把 gmaps 轉成 google.com/maps 正式連結
-    for p in items:
-        g = p.get("geo") or {}
-        p["gmaps"] = normalize_existing_gmaps(
-            p.get("gmaps"),
-            name=p.get("name"),
-            lat=_to_float(g.get("lat")),
-            lng=_to_float(g.get("lng")),
-            place_id=p.get("place_id"),
-        )
-
-    if not items:
-        send_reply_if_needed(reply_token, f"{city}{district} 目前沒有「{CATEGORY_LABELS.get(category, category)}」資料，換個類別看看？")
+async def remember_area(user_id: str | None, city: str | None, district: str | None,
+                        cursor: tuple[str, int] | None = None, sess=None) -> None:
+    """記下使用者目前看的城市 / 行政區與清單游標（類別, 頁碼）；「下一頁」與輪盤的行政區都從這裡接。"""
+    if not user_id or not district:
         return
+    sess = sess or await SESSIONS.get(user_id)
+    sess.city, sess.district, sess.cursor = city, district, cursor
+    await SESSIONS.save(user_id, sess)
 
-    bubbles = [bubble_from_place(p) for p in items]
-    contents = bubbles[0] if len(bubbles) == 1 else {"type": "carousel", "contents": bubbles}
+async def reply_places_list(reply_token: str, city: str, district: str, category: str,
+                      page: int = 1, page_size: int = 6):
+    # 整頁 flex（含已正規化 gmaps 的 bubble）依資料版本快取；命中時只剩查表 + 序列化
+    store = get_store()
+    msg = FLEX_CACHE.page_message(
+        city, district, category, page, page_size,
+        lambda: filter_places(city, district, category, page=page, page_size=page_size, store=store).get("items", []),
+        version=store.version,
+    )
+    if not msg:
+        await send_reply_if_needed(reply_token, f"{city}{district} 目前沒有「{CATEGORY_LABELS.get(category, category)}」資料，換個類別看看？")
+        return
 
-    alt = f"{city}{district}｜{CATEGORY_LABELS.get(category, category)}（第 {page} 頁）"
-    flex_msg = FlexMessage.from_dict({
-        "type": "flex",
-        "altText": alt,
-        "contents": contents
-    })
-    msg_api.reply_message(ReplyMessageRequest(replyToken=reply_token, messages=[flex_msg]))
+    await LINE.reply(reply_token, [msg])
 
-def send_reply_if_needed(reply_token: str, text: str):
+async def send_reply_if_needed(reply_token: str, text: str):
     is_fake_token = (not reply_token) or reply_token.startswith("0000")
     is_dev = SKIP_VERIFY or (not CHANNEL_TOKEN)
     if is_dev or is_fake_token:
         log.info("(dev) skip LINE reply. text=%s", text)
         return
     try:
-        msg_api.reply_message(
-            ReplyMessageRequest(replyToken=reply_token, messages=[TextMessage(text=text)])
-        )
+        await LINE.reply(reply_token, [TextMessage(text=text)])
     except Exception as e:
         log.exception("Reply failed (skip second reply): %s", e)
 
@@ -321,36 +324,311 @@ def _valid_sig(body: bytes, sig: str | None) -> bool:
     except Exception:
         return False
     
-# ---------- 安全回覆工具 ----------
-def safe_reply_or_push(msg_api, event, reply_tok: str, messages: list):
-    """
-    先嘗試 reply；若遇到 Invalid reply token (400) 就改用 push。
-    回傳 True 代表已送出任一種訊息。
-    """
-    try:
-        msg_api.reply_message(ReplyMessageRequest(replyToken=reply_tok, messages=messages))
-        return True
-    except ApiException as e:
-        # 解析 400 Invalid reply token → fallback to push
-        try:
-            body = getattr(e, "body", "") or getattr(e, "reason", "")
-            if e.status == 400 and "Invalid reply token" in str(body):
-                # 取 userId
-                user_id = None
-                # v3 event 物件
-                user_id = getattr(getattr(event, "source", None), "user_id", None) or user_id
-                # raw dict（若你是自己組的 ev）
-                if not user_id and isinstance(event, dict):
-                    user_id = event.get("source", {}).get("userId")
+# ---------- 單一事件處理 ----------
+async def handle_event(ev):
+    ev_type   = ev.get("type") if isinstance(ev, dict) else getattr(ev, "type", None)
+    ev_msg    = ev.get("message") if isinstance(ev, dict) else getattr(ev, "message", None)
+    reply_tok = ev.get("replyToken") if isinstance(ev, dict) else getattr(ev, "reply_token", "")
+    store = get_store()  # 本事件從頭到尾用同一版資料
+
+    if ev_type == "message" and (ev_msg.get("type") if isinstance(ev_msg, dict) else getattr(ev_msg, "type", "")) == "location":
+        lat = (ev_msg.get("latitude") if isinstance(ev_msg, dict) else getattr(ev_msg, "latitude", None))
+        lng = (ev_msg.get("longitude") if isinstance(ev_msg, dict) else getattr(ev_msg, "longitude", None))
+        await send_reply_if_needed(reply_tok, pick_by_location(lat, lng, datetime.now(), store=store))
+        return
+
+    if ev_type == "message":
+        t = (ev_msg.get("text", "") if isinstance(ev_msg, dict) else getattr(ev_msg, "text", "")).strip()
+        if not t:
+            return
+
+        route = text_router(store).route(t)
+        
+        # === 咖啡放鬆清單（關鍵字觸發） ===
+        if route.kind == "cafe_relax":
+            # 1) 這裡先用固定假資料示範；之後可用 PLACES 自動篩選 type=="cafe"
+            demo = [
+                {
+                    "name":"Simple Kaffa",
+                    "district":"信義區",
+                    "price":"≈150–250",
+                    "time":"12:00–20:00",
+                    "features":["插座","Wi-Fi","不限時"],
+                    "tags":["手沖","甜點不錯"],
+                    "gmaps":"https://maps.app.goo.gl/?q=Simple+Kaffa",
+                },
+                {
+                    "name":"Woolloomooloo",
+                    "district":"信義區",
+                    "price":"≈160–260",
+                    "time":"10:00–22:00",
+                    "features":["插座","Wi-Fi"],
+                    "tags":["早午餐","空間大"],
+                    "gmaps":"https://maps.app.goo.gl/?q=Woolloomooloo",
+                },
+                {
+                    "name":"Fika Fika Cafe",
+                    "district":"松山區",
+                    "price":"≈150–220",
+                    "time":"11:00–19:00",
+                    "features":["Wi-Fi"],
+                    "tags":["北歐烘焙","拿鐵好喝"],
+                    "gmaps":"https://maps.app.goo.gl/?q=Fika+Fika+Cafe",
+                },
+            ]
+
+            bubble = cafe_list_flex(
+                title="下午放鬆喝咖啡",
+                subtitle="精選可久坐/有插座/Wi-Fi 的店家",
+                cafes=demo,
+            )
+
+            flex = FlexMessage.from_dict({
+                "type": "flex",
+                "altText": "咖啡放鬆清單",
+                "contents": bubble,  # 你的 bubble dict
+                "quickReply": {
+                    "items": [
+                        {"type":"action","action":{"type":"message","label":"信義區一日遊","text":"北海岸一日遊"}},
+                        {"type":"action","action":{"type":"message","label":"今日推薦","text":"/today"}},
+                        {"type":"action","action":{"type":"message","label":"吃什麼輪盤","text":"/eat"}},
+                    ]
+                }
+            })
+
+            await safe_reply_or_push(LINE, ev, reply_tok, [flex])
+            return
+
+        if route.kind == "north_coast":
+            bubble = itinerary_flex(
+                title="北海岸一日遊",
+                subtitle="海天一線｜自然地景・美食・人文",
+                tags=["自駕優先","春秋最佳","記得防曬"],
+                sections=[
+                    {"title":"上午",
+                    "items":[
+                        "淺水灣／白沙灣：海景咖啡＆散步拍照（約 60–90 分）",
+                        "富貴角燈塔：台灣最北端，步道看海蝕地形",
+                        "（季節）老梅綠石槽：3–5 月退潮時最美"
+                    ]},
+                    {"title":"中午",
+                    "items":[
+                        "金山老街：金山鴨肉、自助端菜；地瓜＆石花凍當點心"
+                    ]},
+                    {"title":"下午",
+                    "items":[
+                        "野柳地質公園：女王頭、蕈狀岩；注意防曬與補水"
+                    ]},
+                    {"title":"傍晚/晚餐",
+                    "items":[
+                        "龜吼漁港：逛魚市吃海鮮；或沿路找點看夕陽再返程"
+                    ]},
+                ]
+            )
+
+            flex = FlexMessage.from_dict({
+                "type":"flex",
+                "altText":"北海岸一日遊建議",
+                "contents": bubble
+            })
+
+            await safe_reply_or_push(LINE, ev, reply_tok, [flex])
+            return
+
+        # === Gemini 簡易對話指令 ===
+        if route.kind == "ai":
+            q, = route.args
+            user_id = event_user_id(ev)
+
+            # 限流：模型與 push 額度都要有；沒有就立刻回快取的答案或罐頭訊息，不排隊
+            # （PUSH_BUDGET 已用完時串流一則都送不出去，使用者只會看到「生成中」，一樣當成被限流）
+            if user_id and PUSH_BUDGET.remaining(user_id) == 0:
+                scope = "user"
+            else:
+                scope = LIMITER.allow(user_id, "ai", "push")
+            if scope:
+                text = await cached_text(q) or limited_reply(scope)
+                await safe_reply_or_push(LINE, ev, reply_tok, [TextMessage(text=text[:MAX_LINE_TEXT])])
+                return
+
+            # 第一步：先告知使用者正在生成中
+            await safe_reply_or_push(
+                LINE, ev, reply_tok,
+                [TextMessage(text="☕ 內容生成中，請稍候幾秒...")]
+            )
 
+            try:
+                # 第二步：串流生成，依句切段陸續主動推送（避免 Invalid reply token）
                 if user_id:
-                    msg_api.push_message(PushMessageRequest(to=user_id, messages=messages))
-                    return True
+                    async def _push(texts):
+                        await LINE.push(user_id, [TextMessage(text=x) for x in texts])
+
+                    result = await stream_to_user(stream_text(q), _push, user_id=user_id, budget=PUSH_BUDGET)
+                    if result.unsent:
+                        # 額度被同一人的其他請求用掉；全文已進快取，再問一次會直接回放
+                        log.warning("[ai] push budget exhausted for %s, %d chars not delivered",
+                                    user_id, len(result.unsent))
+            except Exception as e:
+                log.exception("Gemini failed: %s", e)
+                await safe_reply_or_push(
+                    LINE, ev, reply_tok,
+                    [TextMessage(text="Gemini 呼叫失敗，稍後再試 🙏")]
+                )
+            return
+
+        # === 今日推薦（session 記著最近推薦過的，連點不重複）===
+        if route.kind == "today":
+            try:
+                user_id = event_user_id(ev)
+                sess = await SESSIONS.get(user_id)
+                places = pick_today_place(seen=sess.recent_of("today"))
+                msg = create_today_pick_message(place=places[0]) if places else None  # FlexMessage 物件
+                if not msg:
+                    await safe_reply_or_push(LINE, ev, reply_tok, [TextMessage(text="目前沒有可推薦的景點，稍後再試看看！")])
+                else:
+                    sess.remember("today", places[0].get("name"))
+                    await SESSIONS.save(user_id, sess)
+                    await safe_reply_or_push(LINE, ev, reply_tok, [msg])
+            except Exception as e:
+                log.exception("Send today-pick failed: %s", e)
+                await safe_reply_or_push(LINE, ev, reply_tok, [TextMessage(text="今日推薦好像卡住了，等我一下再試 🙏")])
+            return  # ← 務必保留，避免同一事件再次回覆
+
+        # === 吃什麼輪盤（用上次看的行政區；最近抽過的不再抽）===
+        if route.kind == "eat":
+            try:
+                user_id = event_user_id(ev)
+                sess = await SESSIONS.get(user_id)
+                city, district = sess.city or "台北", sess.district or "信義區"
+                result = spin_food_roulette(city=city, district=district, recent=sess.recent_of("food"))
+                msg = create_food_roulette_message(city=city, district=district, result=result)
+                sess.remember("food", result["food"])
+                await SESSIONS.save(user_id, sess)
+                await safe_reply_or_push(LINE, ev, reply_tok, [msg])
+            except Exception as e:
+                log.exception("Send food-roulette failed: %s", e)
+                await safe_reply_or_push(LINE, ev, reply_tok, [TextMessage(text="轉盤好像卡住了，等我一下再轉 🙏")])
+            return
+
+        if route.kind == "cat":
+            try:
+                _, city, district, category, page_str = t.split("|", 4)
+                page = int(page_str) if page_str.isdigit() else 1
+                await remember_area(event_user_id(ev), city, district, (category, page))
+                await reply_places_list(reply_tok, city, district, category, page=page)
+            except Exception as e:
+                log.exception("Parse CAT payload failed: %s", e)
+                await send_reply_if_needed(reply_tok, "讀取類別失敗，請再點一次類別 🙏")
+            return
+
+        # === 下一頁：接著 session 裡最近一次看的清單 ===
+        if route.kind == "next_page":
+            user_id = event_user_id(ev)
+            sess = await SESSIONS.get(user_id)
+            if not (sess.cursor and sess.city and sess.district):
+                await send_reply_if_needed(reply_tok, "請先選擇行政區與類別，再說「下一頁」～")
+                return
+            category, page = sess.cursor
+            # 先確認下一頁有資料才移動游標；停在最後一頁，重複說「下一頁」不會越跑越遠
+            if not filter_places(sess.city, sess.district, category, page=page)["has_next"]:
+                await send_reply_if_needed(reply_tok, "沒有下一頁了，換個類別或行政區看看？")
+                return
+            await remember_area(user_id, sess.city, sess.district, (category, page + 1), sess)
+            await reply_places_list(reply_tok, sess.city, sess.district, category, page=page + 1)
+            return
+
+        if route.kind == "start":
+            try:
+                msg = create_city_selection_message()
+                await LINE.reply(reply_tok, [msg])
+            except Exception as e:
+                log.exception("Send city selection failed: %s", e)
+            return
+
+        if route.kind == "city":
+            city, page = route.args
+            try:
+                msg = create_district_selection_message(city, page=page)
+                await LINE.reply(reply_tok, [msg])
+            except Exception as e:
+                log.exception("Send district selection failed: %s", e)
+            return
+
+        if route.kind == "district":
+            city, district = route.args
+            try:
+                await remember_area(event_user_id(ev), city, district)
+                msg = make_category_imagemap(city, district)
+                await LINE.reply(reply_tok, [msg])
+            except Exception as e:
+                log.exception("Send category imagemap (by district text) failed: %s", e)
+            return
+
+        if route.kind == "suggest":
+            await send_reply_if_needed(reply_tok, pick_suggestions(t, datetime.now(), store=store))
+            return
+
+        # === 景點搜尋（找 / 搜尋 …）：沒有結果才交給 GPT ===
+        if route.kind == "search":
+            q = route.args[0]
+            msg = search_message(q, store) if q else None
+            if msg:
+                await LINE.reply(reply_tok, [msg])
+                return
+            route = Route("gpt", (None, t))
+        
+        # === GPT 指令 ===
+        mode, content = route.args
+        scope = LIMITER.allow(event_user_id(ev), mode or "fallback")
+        if scope:
+            ai = await cached_text(content, mode) or limited_reply(scope)
+        else:
+            ai = await generate_text(content, mode=mode)
+        sent = await safe_reply_or_push(LINE, ev, reply_tok, [TextMessage(text=ai)])
+        if not sent:
+            await send_reply_if_needed(reply_tok, "回覆似乎有點塞車，稍後再試一次～")
+        return
+        
+    if ev_type == "postback":
+        if isinstance(ev, dict):
+            pb = ev.get("postback") or {}
+            data_str = (pb.get("data") or "").strip()
+            reply_tok = ev.get("replyToken") or reply_tok
+        else:
+            pb = getattr(ev, "postback", None)
+            data_str = getattr(pb, "data", "") if pb else ""
+        try:
+            pdata = json.loads(data_str) if data_str else {}
         except Exception:
-            pass
-        # 其他錯誤或無 userId，就回傳 False，讓呼叫端決定要不要補一則錯誤文案
-        return False
-    
+            pdata = {}
+
+        action = pdata.get("action")
+        if action == "select_district":
+            city = pdata.get("city"); district = pdata.get("district")
+            try:
+                await remember_area(event_user_id(ev), city, district)
+                msg = make_category_imagemap(city, district)
+                await LINE.reply(reply_tok, [msg])
+            except Exception as e:
+                log.exception("Send category imagemap failed: %s", e)
+            return
+
+        if action in ("select_category", "list_next"):
+            city = pdata.get("city"); district = pdata.get("district")
+            category = pdata.get("category"); page = int(pdata.get("page", 1))
+            try:
+                await remember_area(event_user_id(ev), city, district, (category, page))
+                await reply_places_list(reply_tok, city, district, category, page=page)
+            except Exception as e:
+                log.exception("Reply places list failed: %s", e)
+            return
+
+EVENTS = EventDispatcher(
+    handle_event,
+    workers=settings.webhook_workers,
+    queue_size=settings.webhook_queue_size,
+)
+
 # 同一個 handler 綁多條常見路徑（含結尾斜線），避免路徑不一致
 @app.post("/webhook")
 async def webhook(request: Request):
@@ -385,260 +663,15 @@ async def webhook(request: Request):
 
     events = data.get("events", [])
 
-    # ----以下是你原本的事件處理邏輯（保持不變）----
+    # 背景模式：交給背景事件鏈就回 200（積壓滿了會丟掉並記 log，不在這裡同步處理）；未啟動則同步處理
+    # LINE 重送的事件（同一個 webhookEventId）在任何查資料 / 外呼之前就略過
     for ev in events:
-        ev_type   = ev.get("type") if isinstance(ev, dict) else getattr(ev, "type", None)
-        ev_msg    = ev.get("message") if isinstance(ev, dict) else getattr(ev, "message", None)
-        reply_tok = ev.get("replyToken") if isinstance(ev, dict) else getattr(ev, "reply_token", "")
-
-        if ev_type == "message" and (ev_msg.get("type") if isinstance(ev_msg, dict) else getattr(ev_msg, "type", "")) == "location":
-            lat = (ev_msg.get("latitude") if isinstance(ev_msg, dict) else getattr(ev_msg, "latitude", None))
-            lng = (ev_msg.get("longitude") if isinstance(ev_msg, dict) else getattr(ev_msg, "longitude", None))
-            send_reply_if_needed(reply_tok, pick_by_location(lat, lng, datetime.now()))
+        if await DEDUP.is_duplicate(ev):
             continue
-
-        if ev_type == "message":
-            t = (ev_msg.get("text", "") if isinstance(ev_msg, dict) else getattr(ev_msg, "text", "")).strip()
-            if not t:
-                continue
-            
-            # === 咖啡放鬆清單（關鍵字觸發） ===
-            if ("咖啡" in t and ("放鬆" in t or "下午" in t)) or t in ("咖啡放鬆","下午喝咖啡"):
-                # 1) 這裡先用固定假資料示範；之後可用 PLACES 自動篩選 type=="cafe"
-                demo = [
-                    {
-                        "name":"Simple Kaffa",
-                        "district":"信義區",
-                        "price":"≈150–250",
-                        "time":"12:00–20:00",
-                        "features":["插座","Wi-Fi","不限時"],
-                        "tags":["手沖","甜點不錯"],
-                        "gmaps":"https://maps.app.goo.gl/?q=Simple+Kaffa",
-                    },
-                    {
-                        "name":"Woolloomooloo",
-                        "district":"信義區",
-                        "price":"≈160–260",
-                        "time":"10:00–22:00",
-                        "features":["插座","Wi-Fi"],
-                        "tags":["早午餐","空間大"],
-                        "gmaps":"https://maps.app.goo.gl/?q=Woolloomooloo",
-                    },
-                    {
-                        "name":"Fika Fika Cafe",
-                        "district":"松山區",
-                        "price":"≈150–220",
-                        "time":"11:00–19:00",
-                        "features":["Wi-Fi"],
-                        "tags":["北歐烘焙","拿鐵好喝"],
-                        "gmaps":"https://maps.app.goo.gl/?q=Fika+Fika+Cafe",
-                    },
-                ]
-
-                bubble = cafe_list_flex(
-                    title="下午放鬆喝咖啡",
-                    subtitle="精選可久坐/有插座/Wi-Fi 的店家",
-                    cafes=demo,
-                )
-
-                flex = FlexMessage.from_dict({
-                    "type": "flex",
-                    "altText": "咖啡放鬆清單",
-                    "contents": bubble,  # 你的 bubble dict
-                    "quickReply": {
-                        "items": [
-                            {"type":"action","action":{"type":"message","label":"信義區一日遊","text":"北海岸一日遊"}},
-                            {"type":"action","action":{"type":"message","label":"今日推薦","text":"/today"}},
-                            {"type":"action","action":{"type":"message","label":"吃什麼輪盤","text":"/eat"}},
-                        ]
-                    }
-                })
-
-                safe_reply_or_push(msg_api, ev, reply_tok, [flex])
-                continue
-
-            if "北海岸" in t and ("一日遊" in t or "行程" in t):
-                bubble = itinerary_flex(
-                    title="北海岸一日遊",
-                    subtitle="海天一線｜自然地景・美食・人文",
-                    tags=["自駕優先","春秋最佳","記得防曬"],
-                    sections=[
-                        {"title":"上午",
-                        "items":[
-                            "淺水灣／白沙灣：海景咖啡＆散步拍照（約 60–90 分）",
-                            "富貴角燈塔：台灣最北端，步道看海蝕地形",
-                            "（季節）老梅綠石槽：3–5 月退潮時最美"
-                        ]},
-                        {"title":"中午",
-                        "items":[
-                            "金山老街：金山鴨肉、自助端菜；地瓜＆石花凍當點心"
-                        ]},
-                        {"title":"下午",
-                        "items":[
-                            "野柳地質公園：女王頭、蕈狀岩；注意防曬與補水"
-                        ]},
-                        {"title":"傍晚/晚餐",
-                        "items":[
-                            "龜吼漁港：逛魚市吃海鮮；或沿路找點看夕陽再返程"
-                        ]},
-                    ]
-                )
-
-                flex = FlexMessage.from_dict({
-                    "type":"flex",
-                    "altText":"北海岸一日遊建議",
-                    "contents": bubble
-                })
-
-                safe_reply_or_push(msg_api, ev, reply_tok, [flex])
-                continue
-
-            # === Gemini 簡易對話指令 ===
-            if t.startswith("/ai ") or t.startswith("ai "):
-                q = t.split(" ", 1)[1].strip() or "請用繁體中文打招呼。"
-
-                # 第一步：先告知使用者正在生成中
-                safe_reply_or_push(
-                    msg_api, ev, reply_tok,
-                    [TextMessage(text="☕ 內容生成中，請稍候幾秒...")]
-                )
-
-                try:
-                    ans = await generate_text(q)
-
-                    # 第二步：AI 完成後再主動推送（避免 Invalid reply token）
-                    user_id = None
-                    if isinstance(ev, dict):
-                        user_id = ev.get("source", {}).get("userId")
-                    else:
-                        user_id = getattr(getattr(ev, "source", None), "user_id", None)
-
-                    if user_id:
-                        msg_api.push_message(
-                            PushMessageRequest(to=user_id, messages=[TextMessage(text=ans[:1900])])
-                        )
-                except Exception as e:
-                    log.exception("Gemini failed: %s", e)
-                    safe_reply_or_push(
-                        msg_api, ev, reply_tok,
-                        [TextMessage(text="Gemini 呼叫失敗，稍後再試 🙏")]
-                    )
-                continue
-
-            # === 今日推薦 ===
-            if t in ("/today", "今日推薦"):
-                try:
-                    msg = create_today_pick_message()  # FlexMessage 物件
-                    if not msg:
-                        safe_reply_or_push(msg_api, ev, reply_tok, [TextMessage(text="目前沒有可推薦的景點，稍後再試看看！")])
-                    else:
-                        safe_reply_or_push(msg_api, ev, reply_tok, [msg])
-                except Exception as e:
-                    log.exception("Send today-pick failed: %s", e)
-                    safe_reply_or_push(msg_api, ev, reply_tok, [TextMessage(text="今日推薦好像卡住了，等我一下再試 🙏")])
-                continue  # ← 務必保留，避免同一事件再次回覆
-
-            # === 吃什麼輪盤 ===
-            if t in ("輪盤", "吃什麼", "/eat"):
-                try:
-                    msg = create_food_roulette_message(city="台北", district="信義區")
-                    safe_reply_or_push(msg_api, ev, reply_tok, [msg])
-                except Exception as e:
-                    log.exception("Send food-roulette failed: %s", e)
-                    safe_reply_or_push(msg_api, ev, reply_tok, [TextMessage(text="轉盤好像卡住了，等我一下再轉 🙏")])
-                continue
-
-            if t.startswith("CAT|"):
-                try:
-                    _, city, district, category, page_str = t.split("|", 4)
-                    page = int(page_str) if page_str.isdigit() else 1
-                    reply_places_list(reply_tok, city, district, category, page=page)
-                except Exception as e:
-                    log.exception("Parse CAT payload failed: %s", e)
-                    send_reply_if_needed(reply_tok, "讀取類別失敗，請再點一次類別 🙏")
-                continue
-
-            if t in ("開始", "start", "hi", "hello", "嗨", "您好"):
-                try:
-                    msg = create_city_selection_message()
-                    msg_api.reply_message(ReplyMessageRequest(replyToken=reply_tok, messages=[msg]))
-                except Exception as e:
-                    log.exception("Send city selection failed: %s", e)
-                continue
-
-            m = re.match(r"^(台北|新北|台中|高雄)(?:#p(\d+))?$", t)
-            if m:
-                city = m.group(1)
-                page = int(m.group(2) or "1")
-                try:
-                    msg = create_district_selection_message(city, page=page)
-                    msg_api.reply_message(ReplyMessageRequest(replyToken=reply_tok, messages=[msg]))
-                except Exception as e:
-                    log.exception("Send district selection failed: %s", e)
-                continue
-
-            ALL_DISTRICTS = {d for ds in DISTRICTS_MAP.values() for d in ds}
-            if t in ALL_DISTRICTS or (t.endswith("區") and 2 <= len(t) <= 4):
-                city = next((c for c, ds in DISTRICTS_MAP.items() if t in ds), None) or (settings.city_default or "台北")
-                try:
-                    msg = make_category_imagemap(city, t)
-                    msg_api.reply_message(ReplyMessageRequest(replyToken=reply_tok, messages=[msg]))
-                except Exception as e:
-                    log.exception("Send category imagemap (by district text) failed: %s", e)
-                continue
-
-            district_set = {p.get("district") for p in PLACES if p.get("district")}
-            if t in district_set or (t.endswith("區") and 2 <= len(t) <= 4):
-                send_reply_if_needed(reply_tok, pick_suggestions(t, datetime.now()))
-                continue
-            
-            # === GPT 指令 ===
-            mode = None
-            content = t
-            if t.startswith("/摘要"):
-                mode, content = "summary", t.replace("/摘要", "", 1).strip() or t
-            elif t.startswith("/翻譯"):
-                mode, content = "translate", t.replace("/翻譯", "", 1).strip() or t
-            elif t.startswith("/改寫"):
-                mode, content = "rewrite", t.replace("/改寫", "", 1).strip() or t
-
-            ai = await generate_text(content, mode=mode)
-            sent = safe_reply_or_push(msg_api, ev, reply_tok, [TextMessage(text=ai)])
-            if not sent:
-                send_reply_if_needed(reply_tok, "回覆似乎有點塞車，稍後再試一次～")
+        if EVENTS.running:
+            EVENTS.submit(ev)
             continue
-            
-        if ev_type == "postback":
-            if isinstance(ev, dict):
-                pb = ev.get("postback") or {}
-                data_str = (pb.get("data") or "").strip()
-                reply_tok = ev.get("replyToken") or reply_tok
-            else:
-                pb = getattr(ev, "postback", None)
-                data_str = getattr(pb, "data", "") if pb else ""
-            try:
-                pdata = json.loads(data_str) if data_str else {}
-            except Exception:
-                pdata = {}
-
-            action = pdata.get("action")
-            if action == "select_district":
-                city = pdata.get("city"); district = pdata.get("district")
-                try:
-                    msg = make_category_imagemap(city, district)
-                    msg_api.reply_message(ReplyMessageRequest(replyToken=reply_tok, messages=[msg]))
-                except Exception as e:
-                    log.exception("Send category imagemap failed: %s", e)
-                continue
-
-            if action in ("select_category", "list_next"):
-                city = pdata.get("city"); district = pdata.get("district")
-                category = pdata.get("category"); page = int(pdata.get("page", 1))
-                try:
-                    reply_places_list(reply_tok, city, district, category, page=page)
-                except Exception as e:
-                    log.exception("Reply places list failed: %s", e)
-                continue
+        await handle_event(ev)
 
     return {"ok": True}
 
@@ -650,4 +683,17 @@ def root():
 
 @app.get("/healthz")
 def health():
-    return {"status": "ok"}
+    # ready=false 代表 imagemap 素材仍在背景準備或準備失敗（服務本身已可處理 webhook）；
+    # 失敗時 ok=false 並附上 assets_error，readiness probe 看得到
+    return {"status": "ok", "ready": ASSETS.ready, "ok": not ASSETS.failed, "assets_error": ASSETS.error}
+
+@app.get("/metrics")
+def metrics():
+    return {"webhook": EVENTS.stats(), "webhook_dedup": DEDUP.stats(),
+            "line": LINE.stats(), "ai_cache": AI_CACHE.stats(),
+            "ai_push_denied": PUSH_BUDGET.denied, "gemini_pool": get_pool().stats(),
+            "flex_cache": FLEX_CACHE.stats(), "places": get_store().stats(),
+            "places_reload": RELOADER.stats(), "assets": ASSETS.stats(), "imagemap": IMAGE_CACHE.stats(),
+            "image_pool": IMAGE_POOL.stats(), "search": search_index(get_store()).stats(),
+            "recommend": get_engine(get_store()).stats(), "sessions": SESSIONS.stats(),
+            "rate_limit": LIMITER.stats()}
@@ -0,0 +1,184 @@
+# app/services/ai_cache.py
+"""
+AI 生成文字的回應快取。
+
+- key = (model, mode, system prompt, 正規化後的使用者文字) 的 sha256
+- 預設 in-process：TTL + LRU（OrderedDict，O(1) 讀寫與淘汰）
+- 設定 AI_CACHE_REDIS_URL 時改用 Redis 共用（需要安裝 redis 套件；沒裝就退回 in-process）
+- 相同 key 的並發請求只會有一個真的打上游，其餘等同一個結果（single-flight，限同一個 process）
+- 只快取成功且非空的結果；producer 丟例外時不寫入，等待中的請求拿到同一個例外
+- producer 被取消（該使用者逾時 / 斷線）不會連帶取消其他人：等待者之一接手重新產生
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config.settings import settings
+
+log = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """全半形統一（NFKC）、去頭尾空白、連續空白縮成一格、英文小寫。"""
+    t = unicodedata.normalize("NFKC", text or "")
+    return _WS.sub(" ", t).strip().lower()
+
+
+def cache_key(model: str, mode: Optional[str], system: Optional[str], text: str) -> str:
+    raw = "\x1f".join([model or "", mode or "", system or "", normalize_prompt(text)])
+    return "ai:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        hit = self._data.get(key)
+        if hit is None:
+            return None
+        expires, value = hit
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def size(self) -> Optional[int]:
+        return len(self._data)
+
+
+class RedisBackend:
+    """多個 instance 共用的快取；淘汰交給 Redis 的 maxmemory-policy（建議 allkeys-lru）。"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # 可選依賴
+        self._r = redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._r.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._r.set(key, value, ex=max(1, int(ttl)))
+
+    def size(self) -> Optional[int]:
+        return None  # 不追蹤遠端大小
+
+
+class _ProducerCancelled(Exception):
+    """原本的 producer 被取消；等待者收到後自己接手產生。"""
+
+
+class AICache:
+    def __init__(self, backend=None, ttl: float = 3600.0):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.deduped = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """只查不產生（串流路徑用：命中就整段回放）。"""
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            log.warning("[ai-cache] backend get failed: %s", e)
+            return None
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    async def put(self, key: str, value: str) -> None:
+        if not value:
+            return
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            log.warning("[ai-cache] backend set failed: %s", e)
+
+    async def get_or_generate(self, key: str, producer: Callable[[], Awaitable[str]]) -> str:
+        while True:
+            try:
+                cached = await self.backend.get(key)
+            except Exception as e:
+                log.warning("[ai-cache] backend get failed: %s", e)
+                cached = None
+            if cached is not None:
+                self.hits += 1
+                return cached
+
+            fut = self._inflight.get(key)
+            if fut is None:
+                break
+            self.deduped += 1
+            try:
+                return await asyncio.shield(fut)
+            except _ProducerCancelled:
+                continue  # 第一個醒來的等待者成為新的 producer，其他人改等它
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await producer()
+        except asyncio.CancelledError:
+            fut.set_exception(_ProducerCancelled())
+            fut.exception()
+            raise
+        except Exception as e:
+            self.errors += 1
+            fut.set_exception(e)
+            fut.exception()  # 沒有其他等待者時避免 "exception was never retrieved"
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        fut.set_result(value)
+        await self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "deduped": self.deduped,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "inflight": len(self._inflight),
+        }
+
+
+def build_cache(redis_url: Optional[str], max_entries: int, ttl: float) -> AICache:
+    if redis_url:
+        try:
+            return AICache(RedisBackend(redis_url), ttl=ttl)
+        except ImportError:
+            log.error("AI_CACHE_REDIS_URL 已設定但未安裝 redis 套件，改用 in-process 快取")
+    return AICache(MemoryBackend(max_entries), ttl=ttl)
+
+
+# 全站共用一份（Gemini / GPT 以 model 名稱區分 key）
+AI_CACHE = build_cache(settings.ai_cache_redis_url, settings.ai_cache_max_entries, settings.ai_cache_ttl)
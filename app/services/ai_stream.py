@@ -0,0 +1,190 @@
+# app/services/ai_stream.py
+"""
+AI 串流輸出 → LINE push。
+
+- iterate_in_thread：把 SDK 的同步串流 iterator 放到 thread 跑，轉成 async generator；
+  消費端中途離開（取消、break）時通知 thread 停下，不等整段串流跑完
+- SentenceChunker：依句尾（。！？!?\\n）切段，每段不超過 LINE 的 1900 字；
+  第一段只要湊到一句就送（讓使用者最快看到內容），之後的段落累積到 min_chars 再送，省 push 次數
+- PushBudget：每位使用者在 window 秒內最多 push 幾則；只剩一則時剩下的文字併進最後一則
+- stream_to_user：串起來；chunks 只要是 async iterator 即可，測試可直接餵假的串流模型。
+  額度被用光而送不出去的文字放在回傳值的 unsent，交給呼叫端處理，不會默默丟掉
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MAX_LINE_TEXT = 1900
+SENTENCE_ENDS = "。！？!?\n"
+
+_DONE = object()
+
+
+async def iterate_in_thread(factory: Callable[[], Iterable[str]], executor=None) -> AsyncIterator[str]:
+    """
+    在 worker thread（executor 未指定時用預設的）裡建立並走完同步 iterator，逐一把 chunk 交回 event loop。
+    消費端提早結束（break、取消）時通知 thread 在下一個 chunk 停下並關閉 iterator，不等它把串流跑完。
+    """
+    loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def _put(item) -> None:
+        if stop.is_set():
+            return
+        try:
+            loop.call_soon_threadsafe(q.put_nowait, item)
+        except RuntimeError:  # event loop 已經關了
+            stop.set()
+
+    def _run():
+        it = None
+        try:
+            it = iter(factory())
+            for chunk in it:
+                if stop.is_set():
+                    break
+                _put(chunk)
+        except BaseException as e:  # 交給 async 端拋出
+            _put(e)
+        finally:
+            close = getattr(it, "close", None)
+            if stop.is_set() and close is not None:
+                try:
+                    close()  # 例如 SDK 的串流物件：關掉底層連線
+                except Exception:
+                    pass
+            _put(_DONE)
+
+    fut = loop.run_in_executor(executor, _run)
+    finished = False
+    try:
+        while True:
+            item = await q.get()
+            if item is _DONE:
+                finished = True
+                break
+            if isinstance(item, BaseException):
+                raise item
+            if item:
+                yield item
+    finally:
+        if finished:
+            await fut  # thread 已經送出 _DONE，馬上就會結束
+        else:
+            stop.set()
+
+
+class SentenceChunker:
+    def __init__(self, min_chars: int = 200, max_chars: int = MAX_LINE_TEXT):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buf = ""
+        self._sent_any = False
+
+    def _cut(self) -> Optional[int]:
+        """回傳可以切出去的長度；不到切點回 None。"""
+        need = 1 if not self._sent_any else self.min_chars
+        if len(self._buf) >= self.max_chars:
+            end = max(self._buf.rfind(c, 0, self.max_chars) for c in SENTENCE_ENDS)
+            return end + 1 if end > 0 else self.max_chars
+        if len(self._buf) < need:
+            return None
+        end = max(self._buf.rfind(c) for c in SENTENCE_ENDS)
+        if end + 1 >= need:
+            return end + 1
+        return None
+
+    def feed(self, text: str) -> List[str]:
+        self._buf += text
+        out = []
+        while True:
+            n = self._cut()
+            if n is None:
+                return out
+            seg, self._buf = self._buf[:n].strip(), self._buf[n:]
+            if seg:
+                out.append(seg)
+                self._sent_any = True
+
+    def flush(self) -> List[str]:
+        rest, self._buf = self._buf.strip(), ""
+        return [rest[i:i + self.max_chars] for i in range(0, len(rest), self.max_chars)]
+
+
+class PushBudget:
+    """固定視窗計數：user → (視窗起點, 已用次數)。"""
+
+    def __init__(self, limit: int = 5, window: float = 60.0, max_users: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_users = max_users
+        self._used: Dict[str, Tuple[float, int]] = {}
+        self.denied = 0
+
+    def remaining(self, user_id: str) -> int:
+        start, used = self._used.get(user_id, (0.0, 0))
+        if time.monotonic() - start >= self.window:
+            return self.limit
+        return max(0, self.limit - used)
+
+    def take(self, user_id: str) -> bool:
+        now = time.monotonic()
+        start, used = self._used.get(user_id, (now, 0))
+        if now - start >= self.window:
+            start, used = now, 0
+        if used >= self.limit:
+            self.denied += 1
+            return False
+        if user_id not in self._used and len(self._used) >= self.max_users:
+            self._used = {u: v for u, v in self._used.items() if now - v[0] < self.window}
+        self._used[user_id] = (start, used + 1)
+        return True
+
+
+Send = Callable[[List[str]], Awaitable[None]]
+
+
+class StreamResult(NamedTuple):
+    sent: int      # 實際送出的則數
+    unsent: str    # 額度不夠而沒送出去的文字（全部送出時是空字串）
+
+
+async def stream_to_user(chunks: AsyncIterator[str], send: Send, *, user_id: str,
+                         budget: PushBudget, chunker: Optional[SentenceChunker] = None) -> StreamResult:
+    """
+    把串流 chunk 依句切段後陸續送出（send 收到的是文字清單，一次呼叫 = 一則 push）。
+    額度只剩一則時先停止送出，把後面全部累積到最後一則（超過上限就截斷並註明）。
+    最後一則也拿不到額度（一開始就用完，或被同一位使用者的其他請求用掉）時，
+    沒送出的文字放在 unsent 回傳。
+    """
+    chunker = chunker or SentenceChunker()
+    sent = 0
+    held: List[str] = []
+
+    async for chunk in chunks:
+        for seg in chunker.feed(chunk):
+            if not held and budget.remaining(user_id) > 1 and budget.take(user_id):
+                await send([seg])
+                sent += 1
+            else:
+                held.append(seg)
+
+    held.extend(chunker.flush())
+    if not held:
+        return StreamResult(sent, "")
+    rest = "\n".join(held)
+    if not budget.take(user_id):
+        return StreamResult(sent, rest)
+    if len(rest) > MAX_LINE_TEXT:
+        rest = rest[:MAX_LINE_TEXT - 20] + "\n…（內容過長已截斷）"
+    await send([rest])
+    return StreamResult(sent + 1, "")
+
+
+async def replay(text: str) -> AsyncIterator[str]:
+    """把完整文字（例如快取命中）當成只有一個 chunk 的串流。"""
+    yield text
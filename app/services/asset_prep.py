@@ -0,0 +1,228 @@
+# app/services/asset_prep.py
+"""
+imagemap 素材準備：從 GCS 同步六張類別小圖、合成 1040 網格，全部移出開機的關鍵路徑。
+
+- 下載並行（ThreadPoolExecutor）；每張圖先讀 blob metadata，generation 與本機 manifest 相同且檔案還在就跳過
+- 網格以「各來源圖內容的 sha256 + 版面參數」為 key：內容沒變就沿用上次的輸出，
+  各尺寸縮圖（derive）也只在網格真的換了或缺檔時才重產
+- lifespan 只呼叫 start()，伺服器立刻接流量；ready（準備完成且成功）與 error 顯示在 /healthz，
+  圖片 endpoint 在準備結束前用 until_ready() 等待（有上限，不卡 event loop）；
+  準備失敗時等待一樣會結束，請求改用現有檔案，但 ready 維持 False
+- client 可注入（測試 / bench 用本機假 GCS）
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from app.services.imagemap_layout import CATEGORY_GRID
+
+log = logging.getLogger(__name__)
+
+MANIFEST = ".gcs_manifest.json"
+GRID_NAME = "categories_1040_grid.png"
+# 版面變了（例如格子尺寸）也要重建：把它算進 key
+GRID_LAYOUT_KEY = CATEGORY_GRID.key
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}.{threading.get_ident()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def sync_tiles(client: Any, bucket_name: str, prefix: str, files: Sequence[str], local_dir: Path,
+               concurrency: int = 6) -> Dict[str, int]:
+    """
+    並行同步 GCS 上的 prefix/files 到 local_dir。
+    generation 與上次下載時相同（記在 local_dir/.gcs_manifest.json）且檔案存在就不重抓。
+    """
+    local_dir = Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = local_dir / MANIFEST
+    manifest = _read_json(manifest_path)
+    bucket = client.bucket(bucket_name)
+    lock = threading.Lock()
+    counts = {"downloaded": 0, "skipped": 0, "missing": 0}
+
+    def one(fn: str) -> None:
+        blob = bucket.get_blob(f"{prefix}/{fn}".strip("/"))
+        if blob is None:
+            with lock:
+                counts["missing"] += 1
+            log.warning("[assets] gs://%s/%s/%s not found", bucket_name, prefix, fn)
+            return
+        meta = {"generation": str(blob.generation), "etag": getattr(blob, "etag", None)}
+        dst = local_dir / fn
+        if dst.exists() and manifest.get(fn) == meta:
+            with lock:
+                counts["skipped"] += 1
+            return
+        tmp = dst.with_name(dst.name + f".tmp{os.getpid()}")
+        blob.download_to_filename(str(tmp))
+        os.replace(tmp, dst)
+        with lock:
+            manifest[fn] = meta
+            counts["downloaded"] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(files))),
+                            thread_name_prefix="assets-sync") as ex:
+        list(ex.map(one, files))  # 任一張失敗就把例外往上丟
+
+    if counts["downloaded"]:
+        _write_atomic(manifest_path, json.dumps(manifest, sort_keys=True).encode("utf-8"))
+    return counts
+
+
+def tiles_digest(base_dir: Path, files: Sequence[str]) -> str:
+    h = hashlib.sha256(GRID_LAYOUT_KEY.encode("utf-8"))
+    for fn in files:
+        h.update(fn.encode("utf-8") + b"\0")
+        h.update((Path(base_dir) / fn).read_bytes())
+    return h.hexdigest()
+
+
+def compose_grid_cached(base_dir: Path, files: Sequence[str], compose: Callable[[str, str, list], Any],
+                        derived: Sequence[str] = ()) -> bool:
+    """
+    依來源內容 hash 決定要不要重組網格；回傳 True 代表有重建。
+    重建時一併刪掉 derived（由網格縮出來的檔），讓它們下次依新網格重產。
+    """
+    base_dir = Path(base_dir)
+    out = base_dir / GRID_NAME
+    stamp = out.with_suffix(".sha256")
+    digest = tiles_digest(base_dir, files)
+    try:
+        if out.exists() and stamp.read_text().strip() == digest:
+            return False
+    except OSError:
+        pass
+
+    tmp = out.with_name(f"{out.stem}.tmp{os.getpid()}{out.suffix}")
+    compose(str(tmp), str(base_dir), list(files))
+    os.replace(tmp, out)
+    for name in derived:
+        try:
+            (base_dir / name).unlink()
+        except FileNotFoundError:
+            pass
+    _write_atomic(stamp, digest.encode("ascii"))
+    return True
+
+
+def _default_compose(output_path: str, base_path: str, categories: list) -> Any:
+    from app.services.image_compose import make_category_grid_image
+    return make_category_grid_image(output_path=output_path, base_path=base_path, categories=categories)
+
+
+class AssetPreparer:
+    def __init__(self, local_dir: str, files: Sequence[str], *, bucket: Optional[str] = None,
+                 prefix: str = "", client_factory: Optional[Callable[[], Any]] = None,
+                 compose: Callable[[str, str, list], Any] = _default_compose,
+                 derived: Sequence[str] = (), derive: Optional[Callable[[Path, bool], Any]] = None,
+                 concurrency: int = 6):
+        self.local_dir = Path(local_dir)
+        self.files = list(files)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client_factory = client_factory
+        self.compose = compose
+        self.derived = list(derived)
+        self.derive = derive
+        self.concurrency = concurrency
+        self._done = threading.Event()   # 準備流程結束（成功或失敗）
+        self._task: Optional[asyncio.Task] = None
+
+        # metrics
+        self.error: Optional[str] = None
+        self.sync: Dict[str, int] = {}
+        self.rebuilt: Optional[bool] = None
+        self.derivatives: Any = None
+        self.timings_ms: Dict[str, float] = {}
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        """素材已準備好（流程結束且沒有錯誤）。"""
+        return self._done.is_set() and self.error is None
+
+    @property
+    def failed(self) -> bool:
+        return self._done.is_set() and self.error is not None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等準備流程結束；回傳是否在 timeout 內結束（失敗也算結束，看 ready / error 區分）。"""
+        return self._done.wait(timeout)
+
+    async def until_ready(self, timeout: Optional[float] = None) -> bool:
+        """async route 用：流程已結束直接回傳，否則在 thread 裡等，不卡 event loop。"""
+        if self._done.is_set():
+            return True
+        return await asyncio.to_thread(self._done.wait, timeout)
+
+    def prepare(self) -> None:
+        """同步 + 合成（阻塞版；start() 會丟到 thread 跑）。失敗也會結束等待，讓請求改走現有檔案。"""
+        t0 = time.perf_counter()
+        try:
+            if self.bucket:
+                client = self.client_factory() if self.client_factory else _gcs_client()
+                self.sync = sync_tiles(client, self.bucket, self.prefix, self.files,
+                                       self.local_dir, self.concurrency)
+            else:
+                log.error("ASSETS_BUCKET 未設定，將跳過同步（服務仍會啟動）")
+            t1 = time.perf_counter()
+            self.timings_ms["sync"] = round((t1 - t0) * 1000, 1)
+
+            self.rebuilt = compose_grid_cached(self.local_dir, self.files, self.compose, self.derived)
+            t2 = time.perf_counter()
+            self.timings_ms["compose"] = round((t2 - t1) * 1000, 1)
+
+            if self.derive:
+                self.derivatives = self.derive(self.local_dir, self.rebuilt)
+                self.timings_ms["derive"] = round((time.perf_counter() - t2) * 1000, 1)
+            log.info("[assets] ready under %s sync=%s rebuilt=%s %s",
+                     self.local_dir, self.sync, self.rebuilt, self.timings_ms)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            log.exception("[assets] prepare assets failed: %s", e)
+        finally:
+            self.timings_ms["total"] = round((time.perf_counter() - t0) * 1000, 1)
+            self._done.set()
+
+    def start(self) -> asyncio.Task:
+        """在背景準備素材，不阻塞 lifespan。"""
+        if self._task is None:
+            self._task = asyncio.create_task(asyncio.to_thread(self.prepare), name="asset-prep")
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            # thread 無法中斷；等它自然結束，避免關機時留下寫一半的暫存檔
+            await asyncio.shield(self._task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "done": self.done, "error": self.error, "sync": self.sync,
+                "rebuilt": self.rebuilt, "derivatives": self.derivatives, "ms": self.timings_ms}
+
+
+def _gcs_client():
+    from google.cloud import storage
+    return storage.Client()
@@ -0,0 +1,183 @@
+# app/services/event_dedup.py
+"""
+Webhook 冪等：記住處理過的 webhookEventId，LINE 重送（deliveryContext.isRedelivery）時直接略過。
+
+- 精確視窗：最近 exact_ttl 秒的 id（OrderedDict，依到達順序；頭端過期就丟，上限 exact_max）
+- 輪替 Bloom filter：把較長的 window 切成幾個時間桶，每桶一個 bit 陣列，過期的桶整個清空重用；
+  記憶體固定（預設每桶 10 萬筆、誤判率 1e-4 約 240 KB）
+- 判斷：精確視窗命中 → 重複；只有 Bloom 命中時，事件本身標記為重送才算重複
+  （第一次送達的事件不可能是重複，所以 Bloom 的誤判不會吃掉正常事件）
+- 設定 WEBHOOK_DEDUP_REDIS_URL 時再用 Redis 的 SET NX 跨 instance 搶同一個 id（需要安裝 redis 套件）；
+  Redis 出錯就只靠本機判斷，照常處理
+- 事件一收到就記下（重送的起因是我們回得慢，不是處理失敗）；沒有 webhookEventId 的事件一律處理
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from app.config.settings import settings
+
+log = logging.getLogger(__name__)
+
+
+def webhook_event_id(ev: Any) -> Optional[str]:
+    if isinstance(ev, dict):
+        return ev.get("webhookEventId")
+    return getattr(ev, "webhook_event_id", None)
+
+
+def is_redelivery(ev: Any) -> bool:
+    if isinstance(ev, dict):
+        return bool((ev.get("deliveryContext") or {}).get("isRedelivery"))
+    return bool(getattr(getattr(ev, "delivery_context", None), "is_redelivery", False))
+
+
+class RotatingBloom:
+    def __init__(self, capacity: int = 100_000, fp_rate: float = 1e-4, buckets: int = 6,
+                 bucket_seconds: float = 600.0, clock: Callable[[], float] = time.time):
+        self.bits = max(64, math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self._arrays: List[bytearray] = [bytearray((self.bits + 7) // 8) for _ in range(buckets)]
+        self._epochs: List[int] = [-1] * buckets
+        self._counts: List[int] = [0] * buckets
+
+    def _positions(self, key: str) -> List[int]:
+        # 兩個 64-bit 雜湊做 double hashing
+        d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        m = self.bits
+        return [(h1 + i * h2) % m for i in range(self.hashes)]
+
+    def _live(self, now: float) -> List[int]:
+        """回傳還在 window 內的桶；目前這一桶如果是舊的就清空重用。"""
+        epoch = int(now // self.bucket_seconds)
+        n = len(self._arrays)
+        cur = epoch % n
+        if self._epochs[cur] != epoch:
+            self._arrays[cur][:] = bytes(len(self._arrays[cur]))
+            self._epochs[cur] = epoch
+            self._counts[cur] = 0
+        return [i for i in range(n) if epoch - n < self._epochs[i] <= epoch]
+
+    def add(self, key: str) -> None:
+        now = self.clock()
+        self._live(now)
+        cur = int(now // self.bucket_seconds) % len(self._arrays)
+        arr = self._arrays[cur]
+        for p in self._positions(key):
+            arr[p >> 3] |= 1 << (p & 7)
+        self._counts[cur] += 1
+
+    def __contains__(self, key: str) -> bool:
+        pos = self._positions(key)
+        for i in self._live(self.clock()):
+            arr = self._arrays[i]
+            if all(arr[p >> 3] & (1 << (p & 7)) for p in pos):
+                return True
+        return False
+
+    def stats(self) -> dict:
+        live = self._live(self.clock())
+        return {"buckets": len(live), "items": sum(self._counts[i] for i in live),
+                "bytes": sum(len(a) for a in self._arrays), "hashes": self.hashes}
+
+
+class RedisClaims:
+    """多個 instance 共用：SET NX 搶到的那個處理，其他當重複。"""
+
+    def __init__(self, url: str, ttl: float, prefix: str = "wh:"):
+        import redis.asyncio as redis  # 可選依賴
+        self._r = redis.from_url(url, decode_responses=True)
+        self.ttl = max(1, int(ttl))
+        self._prefix = prefix
+
+    async def claim(self, event_id: str) -> bool:
+        return bool(await self._r.set(self._prefix + event_id, "1", nx=True, ex=self.ttl))
+
+
+class EventDeduper:
+    def __init__(self, bloom: Optional[RotatingBloom] = None, exact_ttl: float = 300.0,
+                 exact_max: int = 50_000, shared: Optional[RedisClaims] = None,
+                 clock: Callable[[], float] = time.time):
+        self.bloom = bloom if bloom is not None else RotatingBloom(clock=clock)
+        self.exact_ttl = exact_ttl
+        self.exact_max = exact_max
+        self.shared = shared
+        self.clock = clock
+        self._recent: "OrderedDict[str, float]" = OrderedDict()  # id → 收到的時間
+        self.checked = 0
+        self.dropped = 0
+        self.dropped_by = {"exact": 0, "bloom": 0, "shared": 0}
+        self.redeliveries = 0
+        self.errors = 0
+
+    def _seen_locally(self, event_id: str, redelivery: bool, now: float) -> Optional[str]:
+        recent = self._recent
+        while recent:
+            if now - next(iter(recent.values())) < self.exact_ttl and len(recent) <= self.exact_max:
+                break
+            recent.popitem(last=False)
+        if event_id in recent:
+            return "exact"
+        if redelivery and event_id in self.bloom:
+            return "bloom"
+        return None
+
+    def _remember(self, event_id: str, now: float) -> None:
+        self._recent[event_id] = now
+        self.bloom.add(event_id)
+
+    async def is_duplicate(self, ev: Any) -> bool:
+        """第一次看到回 False（並記下）；重複回 True。只看事件本身，不查資料、不打外部 API（Redis 除外）。"""
+        event_id = webhook_event_id(ev)
+        if not event_id:
+            return False
+        self.checked += 1
+        redelivery = is_redelivery(ev)
+        self.redeliveries += redelivery
+        now = self.clock()
+        hit = self._seen_locally(event_id, redelivery, now)
+        if hit is None and self.shared is not None:
+            try:
+                if not await self.shared.claim(event_id):
+                    hit = "shared"
+            except Exception as e:
+                self.errors += 1
+                log.warning("[dedup] shared claim failed: %s", e)
+        if hit != "exact":
+            self._remember(event_id, now)
+        if hit is None:
+            return False
+        self.dropped += 1
+        self.dropped_by[hit] += 1
+        log.info("[dedup] drop duplicate webhookEventId=%s via=%s redelivery=%s", event_id, hit, redelivery)
+        return True
+
+    def stats(self) -> dict:
+        return {"backend": "redis" if self.shared is not None else "memory", "checked": self.checked,
+                "dropped": self.dropped, "dropped_by": dict(self.dropped_by),
+                "redeliveries": self.redeliveries, "errors": self.errors,
+                "exact_size": len(self._recent), "bloom": self.bloom.stats()}
+
+
+def build_deduper(redis_url: Optional[str], window: float, exact_ttl: float, capacity: int) -> EventDeduper:
+    buckets = 6
+    bloom = RotatingBloom(capacity=capacity, buckets=buckets, bucket_seconds=window / buckets)
+    shared = None
+    if redis_url:
+        try:
+            shared = RedisClaims(redis_url, ttl=window)
+        except ImportError:
+            log.error("WEBHOOK_DEDUP_REDIS_URL 已設定但未安裝 redis 套件，只在本機去重")
+    return EventDeduper(bloom, exact_ttl=exact_ttl, shared=shared)
+
+
+DEDUP = build_deduper(settings.webhook_dedup_redis_url, settings.webhook_dedup_window,
+                      settings.webhook_dedup_exact_ttl, settings.webhook_dedup_capacity)
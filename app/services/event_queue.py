@@ -0,0 +1,167 @@
+# app/services/event_queue.py
+"""
+Webhook 事件的背景處理：webhook 驗完簽章就把事件交出去並立即回 200，由背景 task 處理。
+
+- 每個 userId 一條自己的事件鏈（deque），同一人的事件依到達順序一則一則處理；
+  不同使用者各跑各的，全站同時執行中的 handler 數由 semaphore 限制在 workers 個
+  （一位使用者的慢請求，例如 /ai，只會卡住他自己的後續事件）
+- 沒有 userId 的事件各自獨立處理
+- 所有尚未處理完的事件合計上限 queue_size；滿了就丟掉並記 log，絕不在 webhook 裡同步處理
+  （同步處理會讓後到的事件插隊到同一人還在排隊的事件前面，也拖慢過載時的 200）
+- stats() 提供積壓數、執行中 handler 數、使用率與每則事件處理時間
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+def event_user_id(ev: Any) -> Optional[str]:
+    if isinstance(ev, dict):
+        return (ev.get("source") or {}).get("userId")
+    return getattr(getattr(ev, "source", None), "user_id", None)
+
+
+class EventDispatcher:
+    def __init__(self, handler: Handler, workers: int = 4, queue_size: int = 1000,
+                 latency_window: int = 1000):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self._chains: Dict[Any, Deque[Tuple[float, Any]]] = {}   # key → 還沒處理完的事件（含執行中那則）
+        self._tasks: Set[asyncio.Task] = set()
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._running = False
+        self._anon = itertools.count()
+        self._pending = 0
+
+        # metrics
+        self._busy = 0
+        self._busy_time = 0.0
+        self._started_at: Optional[float] = None
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._sem = asyncio.Semaphore(self.workers)
+        self._running = True
+        self._started_at = time.perf_counter()
+        log.info("[events] started: %d concurrent handlers, backlog %d", self.workers, self.queue_size)
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """不再收新事件，盡量把積壓處理完再取消（Cloud Run 收到 SIGTERM 時有寬限時間）。"""
+        if not self._running:
+            return
+        self._running = False
+        if self._tasks:
+            _, left = await asyncio.wait(set(self._tasks), timeout=drain_timeout)
+            if left:
+                log.warning("[events] drain timeout, %d events dropped", self.depth)
+                for t in left:
+                    t.cancel()
+                await asyncio.gather(*left, return_exceptions=True)
+
+    def _key(self, ev: Any) -> Any:
+        return event_user_id(ev) or ("anon", next(self._anon))
+
+    def submit(self, ev: Any) -> bool:
+        """
+        接到該使用者事件鏈的尾端，回傳 True；未啟動回傳 False（呼叫端自行同步處理）。
+        積壓已滿時丟掉事件、記 log 並回傳 False，呼叫端不可改成同步處理。
+        """
+        if not self._running:
+            return False
+        if self._pending >= self.queue_size:
+            self.rejected += 1
+            log.warning("[events] backlog full (%d), dropped %s event of user=%s",
+                        self._pending, _event_type(ev), event_user_id(ev))
+            return False
+        key = self._key(ev)
+        chain = self._chains.get(key)
+        self._pending += 1
+        self.enqueued += 1
+        if chain is not None:
+            chain.append((time.perf_counter(), ev))   # 該使用者的 task 還在跑，處理完前一則就會接著處理
+            return True
+        self._chains[key] = deque([(time.perf_counter(), ev)])
+        task = asyncio.create_task(self._drain(key), name=f"webhook-chain-{key}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _drain(self, key: Any) -> None:
+        chain = self._chains[key]
+        try:
+            while chain:
+                _, ev = chain[0]
+                async with self._sem:
+                    await self._handle(ev)
+                chain.popleft()
+                self._pending -= 1
+        finally:
+            # 檢查 chain 與刪除之間沒有 await，submit 不會在這中間把事件接到即將消失的鏈上
+            self._pending -= len(chain)
+            del self._chains[key]
+
+    async def _handle(self, ev: Any) -> None:
+        self._busy += 1
+        t0 = time.perf_counter()
+        try:
+            await self.handler(ev)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            log.exception("[events] handler failed: %s", e)
+        finally:
+            dt = time.perf_counter() - t0
+            self._busy -= 1
+            self._busy_time += dt
+            self._latencies.append(dt)
+
+    @property
+    def depth(self) -> int:
+        return self._pending
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        uptime = (time.perf_counter() - self._started_at) if self._started_at else 0.0
+
+        def _pct(p: float) -> Optional[float]:
+            return round(lat[min(len(lat) - 1, int(len(lat) * p))] * 1000, 2) if lat else None
+
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "utilisation": round(self._busy_time / (uptime * self.workers), 4) if uptime else 0.0,
+            "queue_depth": self.depth,
+            "queue_capacity": self.queue_size,
+            "active_users": len(self._chains),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "event_ms_p50": _pct(0.50),
+            "event_ms_p99": _pct(0.99),
+        }
+
+
+def _event_type(ev: Any) -> Optional[str]:
+    return ev.get("type") if isinstance(ev, dict) else getattr(ev, "type", None)
@@ -1,8 +1,13 @@
 # app/services/gemini.py
 import os
 import asyncio
+from typing import AsyncIterator, Optional
 import google.generativeai as genai
 from app.config.settings import settings
+from app.services.ai_cache import AI_CACHE, cache_key
+from app.services.gpt import Mode, _system_by_mode
+from app.services.ai_stream import iterate_in_thread, replay
+from app.services.model_pool import ModelPool
 import logging
 
 # 設定日誌
@@ -25,23 +30,87 @@ genai.configure(api_key=API_KEY)
 # SDK 慣例用 "model_name"；且多數情況不需要 "models/" 前綴
 MODEL_NAME = (settings.gemini_model or "gemini-1.5-flash").strip()
 
-async def generate_text(prompt: str) -> str:
+# 模型物件只建一次（依 system instruction），呼叫走專用 executor + semaphore
+POOL: Optional[ModelPool] = None
+
+def _new_model(system: Optional[str]):
+    return genai.GenerativeModel(model_name=MODEL_NAME, system_instruction=system)
+
+def start_pool() -> ModelPool:
+    """lifespan 啟動時呼叫；預先建好預設模型。"""
+    global POOL
+    if POOL is None:
+        POOL = ModelPool(_new_model, concurrency=settings.gemini_concurrency,
+                         max_waiting=settings.gemini_max_waiting, name="gemini")
+        POOL.model(None)
+        logging.info("Gemini pool ready: model=%s concurrency=%d", MODEL_NAME, POOL.concurrency)
+    return POOL
+
+def shutdown_pool() -> None:
+    global POOL
+    if POOL is not None:
+        POOL.shutdown()
+        POOL = None
+
+def get_pool() -> ModelPool:
+    return POOL or start_pool()
+
+async def generate_text(prompt: str, mode: Mode = None) -> str:
     """
     最小測試版本：直接把使用者輸入交給 Gemini，回傳生成文字。
+    mode（summary / translate / rewrite）會帶對應的 system instruction；
+    相同 (model, mode, system, 正規化 prompt) 走 AI_CACHE，不重複呼叫。
     """
-    model = genai.GenerativeModel(model_name=MODEL_NAME)
-
-    try:
-        # SDK 同步 → 丟到 thread 執行，避免阻塞
-        resp = await asyncio.to_thread(model.generate_content, prompt)
+    system = _system_by_mode(mode) if mode else None
 
+    async def _call() -> str:
+        pool = get_pool()
+        # SDK 同步 → 丟到專用 executor 執行，避免阻塞
+        resp = await pool.run(pool.model(system).generate_content, prompt)
         # 安全擷取文字
         text = getattr(resp, "text", None) or ""
         return text.strip()
 
+    try:
+        return await AI_CACHE.get_or_generate(cache_key(MODEL_NAME, mode, system, prompt), _call)
+
     except Exception as e:
         # 回傳可讀錯誤，並在 server log 另行記錄完整堆疊
         # 由於您回報的錯誤帶有 'generativelanguage.googleapis.com' 服務名稱，
         # 即使程式碼使用 google-genai SDK (API Key)，它仍可能在內部被覆寫為 Vertex AI 的驗證路徑。
         logging.error(f"Gemini 呼叫失敗，完整錯誤：{e}", exc_info=True)
         return f"Gemini 呼叫失敗：{e!s}"
+
+
+async def cached_text(prompt: str, mode: Mode = None) -> Optional[str]:
+    """只查 AI_CACHE、不呼叫模型（被限流時拿之前的答案回覆）；沒有回 None。"""
+    system = _system_by_mode(mode) if mode else None
+    return await AI_CACHE.get(cache_key(MODEL_NAME, mode, system, prompt))
+
+
+async def stream_text(prompt: str, mode: Mode = None) -> AsyncIterator[str]:
+    """
+    串流版：generate_content(stream=True) 逐段產出文字。
+    快取命中時整段回放；串流完成後把全文寫回 AI_CACHE，失敗時直接往上拋。
+    """
+    system = _system_by_mode(mode) if mode else None
+    key = cache_key(MODEL_NAME, mode, system, prompt)
+    cached = await AI_CACHE.get(key)
+    if cached is not None:
+        async for chunk in replay(cached):
+            yield chunk
+        return
+
+    pool = get_pool()
+    model = pool.model(system)
+
+    def _chunks():
+        for resp in model.generate_content(prompt, stream=True):
+            yield getattr(resp, "text", None) or ""
+
+    parts = []
+    async with pool.slot():
+        async for chunk in iterate_in_thread(_chunks, executor=pool.executor):
+            parts.append(chunk)
+            yield chunk
+    await AI_CACHE.put(key, "".join(parts).strip())
@@ -0,0 +1,183 @@
+# app/services/geo_index.py
+"""
+開機時建好的經緯度網格索引（依 type 分區），給位置訊息查「最近的 k 筆」與「半徑內」。
+網格以固定度數切格，查詢由使用者所在格往外一圈一圈擴張（只看落在資料範圍內的那一段），
+一旦下一圈的最短可能距離已大於目前第 k 名就停止，只維持大小 k 的 heap，不做全排序。
+查詢點離資料範圍比資料本身的寬度還遠（例如人在國外）時不走網格，直接掃該 type 的所有點：
+成本只跟資料量有關，不會隨距離變大，也不必依賴經度差很大時不可靠的距離下界。
+"""
+from __future__ import annotations
+
+import heapq
+from collections import defaultdict
+from math import radians, sin, cos, asin, sqrt, floor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+EARTH_R_KM = 6371.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    dlat, dlon = radians(lat2 - lat1), radians(lon2 - lon1)
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
+    return 2 * EARTH_R_KM * asin(sqrt(a))  # km
+
+
+def _latlng(p: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    g = p.get("geo") or {}
+    lat, lng = g.get("lat"), g.get("lng")
+    if lat is None or lng is None:
+        return None
+    try:
+        return float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+
+
+class GeoIndex:
+    """
+    type → {(格 x, 格 y) → [(lat, lng, place), ...]}
+    cell_deg 預設 0.01 度（約 1.1 km），對市區景點密度來說每格只會有個位數～數十筆。
+    """
+
+    def __init__(self, places: Iterable[Dict[str, Any]], cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self._grid: Dict[str, Dict[Tuple[int, int], List[Tuple[float, float, Dict[str, Any]]]]] = defaultdict(dict)
+        self._points: Dict[str, List[Tuple[float, float, Dict[str, Any]]]] = defaultdict(list)
+        self._bounds: Dict[str, Tuple[int, int, int, int]] = {}
+        self._span: Dict[str, int] = {}
+        self.size = 0
+
+        max_abs_lat = 0.0
+        for p in places:
+            ll = _latlng(p)
+            if ll is None:
+                continue
+            lat, lng = ll
+            key = self._cell(lat, lng)
+            pt = (lat, lng, p)
+            self._grid[p.get("type")].setdefault(key, []).append(pt)
+            self._points[p.get("type")].append(pt)
+            max_abs_lat = max(max_abs_lat, abs(lat))
+            self.size += 1
+
+        for t, cells in self._grid.items():
+            xs = [k[0] for k in cells]
+            ys = [k[1] for k in cells]
+            self._bounds[t] = (min(xs), max(xs), min(ys), max(ys))
+            self._span[t] = max(max(xs) - min(xs), max(ys) - min(ys)) + 1
+        self._grid = dict(self._grid)
+        self._points = dict(self._points)
+        self._max_abs_lat = max_abs_lat
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return floor(lng / self.cell_deg), floor(lat / self.cell_deg)
+
+    def types(self) -> List[str]:
+        return list(self._grid)
+
+    @staticmethod
+    def _ring_range(bounds: Tuple[int, int, int, int], cx: int, cy: int) -> Tuple[int, int]:
+        """有資料的格子分布在第幾圈到第幾圈之間（圈數 = 與使用者所在格的 Chebyshev 距離）。"""
+        x0, x1, y0, y1 = bounds
+        r_min = max(0, x0 - cx, cx - x1, y0 - cy, cy - y1)
+        r_max = max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1))
+        return r_min, r_max
+
+    def _is_far(self, t: str, r_min: int) -> bool:
+        # 離資料範圍比資料本身的寬度還遠：一圈圈擴過去不划算，而且經度差大時下界估計也不再可靠
+        return r_min > self._span[t]
+
+    def _cos_floor(self, lat: float) -> float:
+        # 經度 1 度的實際寬度隨緯度變窄；查詢點與資料中緯度絕對值較大者最窄，用它估下界才保守
+        return cos(radians(min(max(abs(lat), self._max_abs_lat), 89.0)))
+
+    def _gap_km(self, r: int, c: float) -> float:
+        """經度或緯度方向至少差 r 格的兩點之間的大圓距離下界（c 為 _cos_floor）。"""
+        return 2 * EARTH_R_KM * c * sin(radians(min(r * self.cell_deg, 180.0)) / 2)
+
+    @staticmethod
+    def _ring(cells, bounds: Tuple[int, int, int, int], cx: int, cy: int, r: int):
+        """第 r 圈上、落在資料範圍 bounds 內的格子。"""
+        if r == 0:
+            pts = cells.get((cx, cy))
+            if pts:
+                yield pts
+            return
+        x0, x1, y0, y1 = bounds
+        dx_lo, dx_hi = max(-r, x0 - cx), min(r, x1 - cx)
+        for dy in (-r, r):
+            if y0 <= cy + dy <= y1:
+                for dx in range(dx_lo, dx_hi + 1):
+                    pts = cells.get((cx + dx, cy + dy))
+                    if pts:
+                        yield pts
+        dy_lo, dy_hi = max(-r + 1, y0 - cy), min(r - 1, y1 - cy)
+        for dx in (-r, r):
+            if x0 <= cx + dx <= x1:
+                for dy in range(dy_lo, dy_hi + 1):
+                    pts = cells.get((cx + dx, cy + dy))
+                    if pts:
+                        yield pts
+
+    def _scan(self, t: str, lat: float, lng: float) -> List[Tuple[float, Dict[str, Any]]]:
+        return [(haversine(lat, lng, plat, plng), p) for plat, plng, p in self._points[t]]
+
+    def nearest(self, t: str, lat: float, lng: float, k: int = 1) -> List[Tuple[float, Dict[str, Any]]]:
+        """回傳該 type 最近的 k 筆 [(距離 km, place), ...]，由近到遠。"""
+        cells = self._grid.get(t)
+        if not cells or k <= 0:
+            return []
+        cx, cy = self._cell(lat, lng)
+        bounds = self._bounds[t]
+        r_min, r_max = self._ring_range(bounds, cx, cy)
+        if self._is_far(t, r_min):
+            return heapq.nsmallest(k, self._scan(t, lat, lng), key=lambda x: x[0])
+
+        c = self._cos_floor(lat)
+        heap: List[Tuple[float, int, Dict[str, Any]]] = []  # (-dist, 序號, place)：大小 k 的 max-heap
+        seq = 0
+        for r in range(r_min, r_max + 1):
+            for pts in self._ring(cells, bounds, cx, cy, r):
+                for plat, plng, p in pts:
+                    d = haversine(lat, lng, plat, plng)
+                    seq += 1
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, seq, p))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, seq, p))
+            # 下一圈最近也至少 r 格遠；已經湊滿 k 筆且都比它近就不用再擴
+            if len(heap) == k and -heap[0][0] <= self._gap_km(r, c):
+                break
+
+        return [(-nd, p) for nd, _, p in sorted(heap, reverse=True)]
+
+    def nearest_one(self, t: str, lat: float, lng: float) -> Optional[Dict[str, Any]]:
+        hit = self.nearest(t, lat, lng, k=1)
+        return hit[0][1] if hit else None
+
+    def within(self, t: str, lat: float, lng: float, radius_km: float,
+               limit: Optional[int] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        """半徑 radius_km 內的該 type 景點，由近到遠；給 limit 時只保留最近的 limit 筆。"""
+        cells = self._grid.get(t)
+        if not cells or radius_km < 0:
+            return []
+        cx, cy = self._cell(lat, lng)
+        bounds = self._bounds[t]
+        r_min, r_max = self._ring_range(bounds, cx, cy)
+        hits = []
+        if self._is_far(t, r_min):
+            hits = [(d, p) for d, p in self._scan(t, lat, lng) if d <= radius_km]
+        else:
+            c = self._cos_floor(lat)
+            for r in range(r_min, r_max + 1):
+                if r and self._gap_km(r - 1, c) > radius_km:
+                    break
+                for pts in self._ring(cells, bounds, cx, cy, r):
+                    for plat, plng, p in pts:
+                        d = haversine(lat, lng, plat, plng)
+                        if d <= radius_km:
+                            hits.append((d, p))
+        if limit is not None:
+            return heapq.nsmallest(limit, hits, key=lambda x: x[0])
+        hits.sort(key=lambda x: x[0])
+        return hits
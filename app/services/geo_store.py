@@ -0,0 +1,151 @@
+# app/services/geo_store.py
+"""
+PLACES 的欄式（columnar）座標表：lat / lng / type / category 各存成一條 numpy 陣列，
+距離用向量化 haversine 一次算完，支援一個或多個使用者位置。
+沒有座標（geo 為 null）的資料以遮罩處理，距離一律視為 inf，不做逐筆判斷。
+
+單一位置找最近 1 筆仍走 GeoIndex（網格，次線性）；這裡負責
+「每個類別最近 N 筆」與推播用的批次排序這種整批運算。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.geo_index import EARTH_R_KM
+from app.utils.category import to_category
+
+# 批次計算時距離矩陣的元素上限（約 32 MB float64），超過就切塊
+_MAX_MATRIX_CELLS = 4_000_000
+
+
+def haversine_np(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """向量化 haversine（度 → km），參數可為純量或可廣播的陣列。"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_R_KM * np.arcsin(np.sqrt(a))
+
+
+def _to_float(v) -> float:
+    try:
+        return float(v) if v is not None and str(v).strip() != "" else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class GeoStore:
+    """與 places 同順序的欄式座標表；第 i 列對應 places[i]。"""
+
+    def __init__(self, places: Iterable[Dict[str, Any]]):
+        self.places: List[Dict[str, Any]] = list(places)
+        n = len(self.places)
+
+        self.lat = np.empty(n, dtype=np.float64)
+        self.lng = np.empty(n, dtype=np.float64)
+        type_ids: Dict[str, int] = {}
+        cat_ids: Dict[str, int] = {}
+        self.type_code = np.empty(n, dtype=np.int16)
+        self.cat_code = np.empty(n, dtype=np.int16)
+
+        for i, p in enumerate(self.places):
+            g = p.get("geo") or {}
+            self.lat[i] = _to_float(g.get("lat"))
+            self.lng[i] = _to_float(g.get("lng"))
+            self.type_code[i] = type_ids.setdefault(p.get("type") or "", len(type_ids))
+            self.cat_code[i] = cat_ids.setdefault(to_category(p), len(cat_ids))
+
+        self.type_ids = type_ids
+        self.cat_ids = cat_ids
+        self.valid = ~(np.isnan(self.lat) | np.isnan(self.lng))
+
+        # 預先算好弧度與 cos(lat)，每次查詢只剩使用者那一側的運算
+        self._rlat = np.radians(self.lat)
+        self._rlng = np.radians(self.lng)
+        self._coslat = np.cos(self._rlat)
+
+    @property
+    def size(self) -> int:
+        return int(self.valid.sum())
+
+    def _mask(self, types: Optional[Sequence[str]] = None, categories: Optional[Sequence[str]] = None) -> np.ndarray:
+        m = self.valid
+        if types is not None:
+            codes = [self.type_ids[t] for t in types if t in self.type_ids]
+            m = m & np.isin(self.type_code, codes)
+        if categories is not None:
+            codes = [self.cat_ids[c] for c in categories if c in self.cat_ids]
+            m = m & np.isin(self.cat_code, codes)
+        return m
+
+    def distances(self, lats, lngs, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        回傳距離矩陣 (m 位使用者, n 筆景點)，單位 km；被遮罩或無座標的位置為 inf。
+        lats / lngs 給純量時回傳一維 (n,)。
+        """
+        scalar = np.ndim(lats) == 0
+        ulat = np.radians(np.atleast_1d(np.asarray(lats, dtype=np.float64)))[:, None]
+        ulng = np.radians(np.atleast_1d(np.asarray(lngs, dtype=np.float64)))[:, None]
+
+        a = (np.sin((self._rlat - ulat) / 2) ** 2
+             + np.cos(ulat) * self._coslat * np.sin((self._rlng - ulng) / 2) ** 2)
+        with np.errstate(invalid="ignore"):
+            d = 2 * EARTH_R_KM * np.arcsin(np.sqrt(a))
+        d[:, ~(self.valid if mask is None else mask)] = np.inf
+        return d[0] if scalar else d
+
+    @staticmethod
+    def _top_k(d: np.ndarray, k: int) -> np.ndarray:
+        """一維距離的前 k 小索引（argpartition + 只排 k 筆），排除 inf。"""
+        k = min(k, int(np.isfinite(d).sum()))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        idx = np.argpartition(d, k - 1)[:k] if k < d.size else np.arange(d.size)
+        return idx[np.argsort(d[idx], kind="stable")]
+
+    def nearest(self, lat: float, lng: float, k: int = 1,
+                types: Optional[Sequence[str]] = None,
+                categories: Optional[Sequence[str]] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        d = self.distances(lat, lng, self._mask(types, categories))
+        return [(float(d[i]), self.places[i]) for i in self._top_k(d, k)]
+
+    def nearest_per_category(self, lat: float, lng: float, n: int = 3,
+                             categories: Optional[Sequence[str]] = None) -> Dict[str, List[Tuple[float, Dict[str, Any]]]]:
+        """每個類別最近的 n 筆；距離只算一次，各類別再以遮罩挑選。"""
+        d = self.distances(lat, lng)
+        out: Dict[str, List[Tuple[float, Dict[str, Any]]]] = {}
+        for cat, code in self.cat_ids.items():
+            if categories is not None and cat not in categories:
+                continue
+            dc = np.where(self.cat_code == code, d, np.inf)
+            hits = self._top_k(dc, n)
+            if hits.size:
+                out[cat] = [(float(dc[i]), self.places[i]) for i in hits]
+        return out
+
+    def rank_many(self, lats: Sequence[float], lngs: Sequence[float], k: int = 5,
+                  types: Optional[Sequence[str]] = None,
+                  categories: Optional[Sequence[str]] = None) -> List[List[int]]:
+        """
+        批次排序（推播活動用）：對每個使用者位置回傳最近 k 筆的列索引（對應 self.places）。
+        使用者數量大時依 _MAX_MATRIX_CELLS 切塊，避免一次建立過大的距離矩陣。
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        mask = self._mask(types, categories)
+        n = len(self.places)
+        if n == 0 or lats.size == 0:
+            return [[] for _ in range(lats.size)]
+
+        kk = min(k, int(mask.sum()))
+        out: List[List[int]] = []
+        step = max(1, _MAX_MATRIX_CELLS // n)
+        for s in range(0, lats.size, step):
+            d = self.distances(lats[s:s + step], lngs[s:s + step], mask)
+            if kk <= 0:
+                out.extend([] for _ in range(d.shape[0]))
+                continue
+            part = np.argpartition(d, kk - 1, axis=1)[:, :kk] if kk < n else np.tile(np.arange(n), (d.shape[0], 1))
+            order = np.argsort(np.take_along_axis(d, part, axis=1), axis=1, kind="stable")
+            out.extend(np.take_along_axis(part, order, axis=1).tolist())
+        return out
@@ -1,8 +1,10 @@
 # app/services/ai.py
 from __future__ import annotations
 import os, asyncio
-from typing import Literal, Optional
+from typing import AsyncIterator, Literal, Optional
 from openai import OpenAI
+from app.services.ai_cache import AI_CACHE, cache_key
+from app.services.ai_stream import iterate_in_thread, replay
 
 
 # 可從環境或外部注入
@@ -47,9 +49,14 @@ async def generate_text(
             ],
         )
 
-    try:
+    async def _generate() -> str:
         resp = await asyncio.to_thread(_call)
-        text = (getattr(resp, "output_text", None) or "").strip() or "我在，請再說一次～"
+        return (getattr(resp, "output_text", None) or "").strip()
+
+    try:
+        # 相同 (model, mode, system, 正規化文字) 共用快取；失敗不寫入
+        text = await AI_CACHE.get_or_generate(cache_key(model, mode, system, user_text), _generate) \
+            or "我在，請再說一次～"
     except Exception as e:
         # 這裡可加 logger
         text = "目前有點塞車，稍後再試一次～"
@@ -58,3 +65,52 @@ async def generate_text(
     if len(text) > _MAX_LINE_TEXT:
         text = text[:_MAX_LINE_TEXT] + "\n…（內容過長已截斷）"
     return text
+
+
+
+async def stream_text(
+    user_text: str,
+    mode: Mode = None,
+    *,
+    model: str = "gpt-5",
+    system_override: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    串流版（介面同 gemini.stream_text）：逐段產出 Responses API 的 output_text delta。
+    快取命中時整段回放；串流完成後把全文寫回 AI_CACHE，失敗時直接往上拋。
+    """
+    if not _client:
+        yield "尚未設定 OPENAI_API_KEY，暫時無法使用 GPT 功能。"
+        return
+
+    system = system_override or _system_by_mode(mode)
+    key = cache_key(model, mode, system, user_text)
+    cached = await AI_CACHE.get(key)
+    if cached is not None:
+        async for chunk in replay(cached):
+            yield chunk
+        return
+
+    def _deltas():
+        events = _client.responses.create(
+            model=model,
+            input=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user_text},
+            ],
+            stream=True,
+        )
+        try:
+            for ev in events:
+                if getattr(ev, "type", "") == "response.output_text.delta":
+                    yield getattr(ev, "delta", "") or ""
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()  # 提早結束時關掉 HTTP 串流
+
+    parts = []
+    async for chunk in iterate_in_thread(_deltas):
+        parts.append(chunk)
+        yield chunk
+    await AI_CACHE.put(key, "".join(parts).strip())
@@ -1,31 +1,40 @@
 # app/services/image_compose.py
 from pathlib import Path
-from PIL import Image
+from io import BytesIO
+from PIL import Image, ImageChops, ImageStat
 from fastapi import HTTPException
 from fastapi.responses import FileResponse
-import os, time
+import os, threading, time
+from typing import Optional
 
-GRID_W, GRID_H = 1040, 1040
-CELL_W, CELL_H = 520, 346
-COORDS = [(0,0), (520,0), (0,346), (520,346), (0,692), (520,692)]
+from app.services.imagemap_layout import CATEGORY_GRID, ImagemapLayout
 
 STATIC_IMAGEMAP_DIR = Path("app/static/imagemeps")
 SRC_1040 = STATIC_IMAGEMAP_DIR / "categories_1040_grid.png"
-ALLOWED_SIZES = {1040, 700, 460}
+# LINE 會依裝置向 baseUrl/{寬度} 取這五種寬度
+LADDER_SIZES = (1040, 700, 460, 300, 240)
+ALLOWED_SIZES = set(LADDER_SIZES)
+GRID_NAME = "categories_1040_grid.png"
+# 有損候選（調色盤 PNG / JPEG）與原圖的 RMS 誤差（0–255）上限，超過就不採用
+MAX_LOSSY_RMS = 3.0
+JPEG_QUALITY = 90
+_LADDER_LOCK = threading.Lock()
 
 
-def make_category_grid_image(output_path: str, base_path: str, categories: list[str]) -> str:
+def make_category_grid_image(output_path: str, base_path: str, categories: Optional[list[str]] = None,
+                             layout: ImagemapLayout = CATEGORY_GRID) -> str:
     """
-    將六張類別圖合成到 1040x1040 的網格圖。
+    依版面（imagemap_layout）把各類別小圖合成到網格圖；座標與訊息 action 用的是同一份定義。
+    categories 可覆寫來源檔名（依格子順序），沒給就用版面裡的。
     回傳輸出的實際路徑字串。
     """
     out = Path(output_path)
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    grid = Image.new("RGB", (GRID_W, GRID_H), (255, 255, 255))  # 白底
-    for (x, y), fname in zip(COORDS, categories):
-        img = Image.open(Path(base_path) / fname).resize((CELL_W, CELL_H))
-        grid.paste(img, (x, y))
+    grid = Image.new("RGB", (layout.width, layout.height), (255, 255, 255))  # 白底
+    for tile, fname in zip(layout.tiles, categories or layout.sources):
+        img = Image.open(Path(base_path) / fname).resize((tile.width, tile.height))
+        grid.paste(img, (tile.x, tile.y))
 
     grid.save(out)
     return str(out)
@@ -42,31 +51,112 @@ def build_if_needed(output_path: str, base_path: str, categories: list[str]) ->
         return make_category_grid_image(output_path, base_path, categories)
     return str(out)
 
-# 下面是新的確保縮圖：從 base_dir 讀 grid，輸出到 base_dir
-def ensure_resized(size: int, base_dir: str = "/tmp/imagemeps") -> str:
+def _rms(a: Image.Image, b: Image.Image) -> float:
+    stat = ImageStat.Stat(ImageChops.difference(a, b.convert("RGB")))
+    return max(stat.rms)
+
+
+def _encode_best(im: Image.Image) -> tuple[bytes, str, dict]:
     """
-    確保存在 {base_dir}/categories_{size}.png，若無就從 {base_dir}/categories_1040_grid.png 重產
-    回傳檔案路徑
+    同一張圖試幾種編碼，取最小且品質在門檻內的：
+    最佳化 PNG（無損，一定合格）、256 色調色盤 PNG、JPEG。回傳 (bytes, 副檔名, 各候選大小)。
     """
+    cands: list[tuple[int, bytes, str, str]] = []
+
+    buf = BytesIO()
+    im.save(buf, format="PNG", optimize=True)
+    cands.append((len(buf.getvalue()), buf.getvalue(), "png", "png"))
+
+    pal = im.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    if _rms(im, pal) <= MAX_LOSSY_RMS:
+        buf = BytesIO()
+        pal.save(buf, format="PNG", optimize=True)
+        cands.append((len(buf.getvalue()), buf.getvalue(), "png", "palette"))
+
+    buf = BytesIO()
+    im.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    if _rms(im, Image.open(BytesIO(buf.getvalue()))) <= MAX_LOSSY_RMS:
+        cands.append((len(buf.getvalue()), buf.getvalue(), "jpg", "jpeg"))
+
+    size, data, ext, _ = min(cands, key=lambda c: c[0])
+    return data, ext, {kind: n for n, _, _, kind in cands}
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.tmp{os.getpid()}.{threading.get_ident()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)  # 讀取端（含其他 worker）只會看到完整的舊檔或新檔
+
+
+def derivative_path(size: int, base_dir: str = "/tmp/imagemeps") -> str:
+    """已產生的 categories_{size}.(png|jpg)；不做任何影像處理，沒有就丟 FileNotFoundError。"""
+    if size not in ALLOWED_SIZES:
+        raise FileNotFoundError(f"unsupported imagemap size {size}")
     base = Path(base_dir)
-    base.mkdir(parents=True, exist_ok=True)
-    out_path = base / f"categories_{size}.png"
-    if out_path.exists():
-        return str(out_path)
-
-    src = base / "categories_1040_grid.png"
-    if not src.exists():
-        raise FileNotFoundError(f"Missing {src}")
-
-    im = Image.open(src)
-    if size != im.width:
-        ratio = size / im.width
-        new_h = int(round(im.height * ratio))
-        im = im.resize((size, new_h), Image.LANCZOS)
-    if im.mode != "RGB":
-        im = im.convert("RGB")
-    im.save(out_path, format="PNG")
-    return str(out_path)
+    for ext in ("png", "jpg"):
+        p = base / f"categories_{size}.{ext}"
+        if p.exists():
+            return str(p)
+    raise FileNotFoundError(f"Missing {base}/categories_{size}.*")
+
+
+def generate_derivatives(base_dir: str = "/tmp/imagemeps", sizes=LADDER_SIZES, force: bool = False) -> dict:
+    """
+    從 {base_dir}/categories_1040_grid.png 一次產生整組尺寸：
+    - 由大到小逐級縮（1040→700→460→300→240），每級從上一級縮，不必每次從原圖算
+    - 每個尺寸挑最小的合格編碼，寫暫存檔再 rename；換了副檔名就刪掉舊的另一種
+    - 全部都在且 force=False 時直接略過
+    回傳報表：每個尺寸的格式與大小，以及相對「未最佳化 PNG」省下的 bytes。
+    """
+    base = Path(base_dir)
+    with _LADDER_LOCK:
+        if not force:
+            try:
+                for s in sizes:
+                    derivative_path(s, base_dir)
+                return {"skipped": True}
+            except FileNotFoundError:
+                pass
+
+        src = base / GRID_NAME
+        if not src.exists():
+            raise FileNotFoundError(f"Missing {src}")
+        t0 = time.perf_counter()
+        report: dict = {"sizes": {}, "baseline_bytes": 0, "bytes": 0}
+        with Image.open(src) as grid:
+            im = grid.convert("RGB")
+        for size in sorted(sizes, reverse=True):
+            if size != im.width:
+                im = im.resize((size, int(round(im.height * size / im.width))), Image.LANCZOS)
+            data, ext, cands = _encode_best(im)
+
+            plain = BytesIO()
+            im.save(plain, format="PNG")  # 舊版 ensure_resized 的輸出，作為比較基準
+            _write_atomic(base / f"categories_{size}.{ext}", data)
+            other = base / f"categories_{size}.{'png' if ext == 'jpg' else 'jpg'}"
+            other.unlink(missing_ok=True)
+
+            report["sizes"][size] = {"format": ext, "bytes": len(data), "candidates": cands}
+            report["baseline_bytes"] += len(plain.getvalue())
+            report["bytes"] += len(data)
+        report["saved_bytes"] = report["baseline_bytes"] - report["bytes"]
+        report["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        return report
+
+
+def ensure_resized(size: int, base_dir: str = "/tmp/imagemeps") -> str:
+    """
+    確保存在 {base_dir}/categories_{size}.*；缺的話整組尺寸一次產生（有鎖，不會多個請求同時重做）。
+    請求路徑請用 derivative_path（只查檔），這個給背景準備 / 離線工具用。
+    """
+    try:
+        return derivative_path(size, base_dir)
+    except FileNotFoundError:
+        if size not in ALLOWED_SIZES:
+            raise
+    Path(base_dir).mkdir(parents=True, exist_ok=True)
+    generate_derivatives(base_dir)
+    return derivative_path(size, base_dir)
 
 
 def imagemap_categories(size: int):
@@ -0,0 +1,129 @@
+# app/services/image_pool.py
+"""
+影像處理專用的小型 process pool：PIL 的合成 / 縮圖 / 編碼是 CPU 密集且握著 GIL，
+放在 thread 裡跑會拖慢同一個 worker 的 webhook 回應；丟到獨立 process 就不會搶 GIL。
+
+- 同一個 key（通常是輸出路徑）同時只會有一份工作在跑，其他呼叫者共用同一個 future（single-flight）
+- run() 給 async route 用（await 不阻塞 event loop）；run_sync() 給背景 thread（AssetPreparer）用
+- workers <= 0 時改用單一 thread 執行（開發 / 測試環境，不另開 process）
+- 子 process 用 spawn 啟動，不繼承父 process 的 thread 與鎖；第一次使用時才建立
+- worker 死掉（OOM、Pillow segfault）後整個 ProcessPoolExecutor 會變成 broken：丟掉換一個新的，
+  當下那份工作重跑一次；再失敗才把 BrokenProcessPool 交給呼叫者。換了幾次記在 stats()["restarts"]
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ImageWorkPool:
+    def __init__(self, workers: int = 1, name: str = "image"):
+        self.workers = workers
+        self.name = name
+        self._executor: Optional[Executor] = None
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # metrics
+        self.submitted = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.restarts = 0
+        self._last_ms: Dict[str, float] = {}
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.name}-inline")
+        return self._executor
+
+    def _restart(self, broken: Executor) -> None:
+        """丟掉已經 broken 的 executor；下一次 _pool() 會建新的。好幾份工作同時失敗時只換一次。"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+            self.restarts += 1
+        log.warning("[%s] worker process died, restarting pool (restarts=%d)", self.name, self.restarts)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Future:
+        """key 相同且仍在執行中就回傳同一個 future；fn 與參數必須可 pickle（模組層級函式）。"""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut
+            fut = Future()
+            # 標成執行中：共用這個 future 的其中一位呼叫者取消等待時，不會連帶取消其他人
+            fut.set_running_or_notify_cancel()
+            self._inflight[key] = fut
+            self.submitted += 1
+        t0 = time.perf_counter()
+        label = getattr(fn, "__name__", str(fn))
+
+        def _settle(inner: Optional[Future], error: Optional[BaseException] = None) -> None:
+            with self._lock:
+                if self._inflight.get(key) is fut:
+                    del self._inflight[key]
+            if inner is not None and inner.cancelled():
+                error = CancelledError()
+            elif inner is not None:
+                error = inner.exception()
+            if error is not None:
+                self.failed += 1
+                fut.set_exception(error)
+            else:
+                fut.set_result(inner.result())
+            self._last_ms[label] = round((time.perf_counter() - t0) * 1000, 1)
+
+        def _start(retry: bool) -> None:
+            with self._lock:
+                pool = self._pool()
+            try:
+                inner = pool.submit(fn, *args)
+            except BrokenProcessPool as e:   # 上一份工作就把 pool 弄壞了
+                self._restart(pool)
+                if retry:
+                    return _start(False)
+                return _settle(None, e)
+            except RuntimeError as e:        # 已經 shutdown
+                return _settle(None, e)
+            inner.add_done_callback(lambda f: _done(f, pool, retry))
+
+        def _done(inner: Future, pool: Executor, retry: bool) -> None:
+            if not inner.cancelled() and isinstance(inner.exception(), BrokenProcessPool):
+                self._restart(pool)
+                if retry:
+                    return _start(False)
+            _settle(inner)
+
+        _start(True)
+        return fut
+
+    def run_sync(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        return self.submit(key, fn, *args).result()
+
+    async def run(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(key, fn, *args))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "in_flight": len(self._inflight), "submitted": self.submitted,
+                "coalesced": self.coalesced, "failed": self.failed, "restarts": self.restarts,
+                "last_ms": dict(self._last_ms)}
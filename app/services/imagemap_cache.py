@@ -0,0 +1,120 @@
+# app/services/imagemap_cache.py
+"""
+imagemap 圖片的記憶體快取：每個尺寸只讀檔 / 編碼一次，之後請求直接回 bytes。
+
+- key 是尺寸；命中時只 stat 一次來源檔（mtime/size 沒變就直接用），網格重建後自動重讀
+- ETag 是內容 sha256 的前 32 字（strong），搭配 If-None-Match 回 304
+- 同一尺寸第一次載入時上鎖，並發的第一批請求只會有一個去讀檔
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+# 版本化路徑（/v{ver}/）內容不會變；未版本化路徑只給短暫快取、過期要重新驗證
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "public, max-age=60, must-revalidate"
+
+
+class EncodedImage(NamedTuple):
+    data: bytes
+    etag: str
+    path: str
+    mtime_ns: int
+    size: int
+    media_type: str = "image/png"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 比對（弱比較：忽略 W/ 前綴，支援逗號分隔的多個值與 *）。"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def media_type_of(data: bytes) -> str:
+    return "image/jpeg" if data[:3] == b"\xff\xd8\xff" else "image/png"
+
+
+def _image_bytes(path: str) -> bytes:
+    """
+    generate_derivatives 產出的 PNG（RGB / 調色盤）或 JPEG 都原樣使用；
+    其他模式（例如帶 alpha 的 PNG）才轉一次 RGB 重新編碼（只在載入時做）。
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:3] == b"\xff\xd8\xff":
+        return data
+    # PNG IHDR 的 color type 在第 25 byte：2 = RGB、3 = 調色盤
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) > 25 and data[25] in (2, 3):
+        return data
+    from io import BytesIO
+    from PIL import Image
+
+    with Image.open(BytesIO(data)) as im:
+        buf = BytesIO()
+        im.convert("RGB").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class EncodedImageCache:
+    def __init__(self, resolve: Callable[[int], str], encode: Callable[[str], bytes] = _image_bytes):
+        self._resolve = resolve
+        self._encode = encode
+        self._entries: Dict[int, EncodedImage] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def _fresh(self, e: EncodedImage) -> bool:
+        try:
+            st = os.stat(e.path)
+        except OSError:
+            return False
+        return st.st_mtime_ns == e.mtime_ns and st.st_size == e.size
+
+    def peek(self, size: int) -> Optional[EncodedImage]:
+        """只查記憶體（外加一次 stat），不讀檔；沒有或已過期回 None。async route 直接在 event loop 上呼叫。"""
+        e = self._entries.get(size)
+        if e is not None and self._fresh(e):
+            self.hits += 1
+            return e
+        return None
+
+    def get(self, size: int) -> EncodedImage:
+        e = self.peek(size)
+        if e is not None:
+            return e
+        with self._guard:
+            lock = self._locks.setdefault(size, threading.Lock())
+        with lock:
+            e = self._entries.get(size)
+            if e is not None and self._fresh(e):
+                self.hits += 1
+                return e
+            path = self._resolve(size)
+            st = os.stat(path)
+            data = self._encode(path)
+            e = EncodedImage(data, f'"{hashlib.sha256(data).hexdigest()[:32]}"', path, st.st_mtime_ns, st.st_size,
+                             media_type_of(data))
+            self._entries[size] = e
+            self.loads += 1
+            return e
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"sizes": sorted(self._entries), "bytes": sum(len(e.data) for e in self._entries.values()),
+                "hits": self.hits, "loads": self.loads}
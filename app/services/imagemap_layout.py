@@ -0,0 +1,107 @@
+# app/services/imagemap_layout.py
+"""
+類別 imagemap 的版面登錄表：每種版面只定義一次（每格的類別、來源小圖、座標），
+網格合成（image_compose）與訊息 action（replies）都從這裡讀，不再各自寫死座標。
+
+- ImagemapLayout.message() 回傳 LINE API 的 imagemap dict（LineClient 直接收 dict）；
+  baseSize / area / 每格的 payload 前後綴在建立版面時就算好，每次請求只組 city|district 那段
+- 新增 8 格、9 格版面：grid_layout() 產生座標後 register_layout()，圖與 action 自動一致
+- 這個模組不依賴 PIL 與 LINE SDK，請求路徑上可以放心 import
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+from app.utils.category import CATEGORY_LABELS
+
+
+class Tile(NamedTuple):
+    category: str
+    source: str   # 來源小圖檔名（相對於素材目錄）
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+@dataclass(frozen=True)
+class ImagemapLayout:
+    name: str
+    tiles: Tuple[Tile, ...]
+    width: int = 1040
+    height: int = 1040
+    # 預先算好的 JSON 片段：(area dict, payload 前綴, payload 後綴)，每次請求共用、不可修改
+    _actions: Tuple[Tuple[Dict[str, int], str, str], ...] = field(init=False, repr=False, compare=False)
+    _base_size: Dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        for t in self.tiles:
+            if t.x < 0 or t.y < 0 or t.x + t.width > self.width or t.y + t.height > self.height:
+                raise ValueError(f"tile {t.category} out of {self.width}x{self.height} in layout {self.name}")
+        actions = tuple(({"x": t.x, "y": t.y, "width": t.width, "height": t.height},
+                         "CAT|", f"|{t.category}|1") for t in self.tiles)
+        object.__setattr__(self, "_actions", actions)
+        object.__setattr__(self, "_base_size", {"width": self.width, "height": self.height})
+
+    @property
+    def categories(self) -> List[str]:
+        return [t.category for t in self.tiles]
+
+    @property
+    def sources(self) -> List[str]:
+        return [t.source for t in self.tiles]
+
+    @property
+    def key(self) -> str:
+        """版面指紋（尺寸 + 每格座標）；網格快取把它算進 hash，版面一改就重建。"""
+        cells = ";".join(f"{t.x},{t.y},{t.width}x{t.height}" for t in self.tiles)
+        return f"{self.name}:{self.width}x{self.height}:{cells}"
+
+    def message(self, city: str, district: str, base_url: str) -> Dict[str, Any]:
+        area = f"{city}|{district}"
+        return {
+            "type": "imagemap",
+            "baseUrl": base_url,
+            "altText": f"{city}{district}｜請選擇類別",
+            "baseSize": self._base_size,
+            "actions": [{"type": "message", "area": box, "text": pre + area + suf}
+                        for box, pre, suf in self._actions],
+        }
+
+
+def grid_layout(name: str, cells: Sequence[Tuple[str, str]], cols: int,
+                cell_w: int, cell_h: int, width: int = 1040, height: int = 1040) -> ImagemapLayout:
+    """cells 依列優先（左→右、上→下）排成 cols 欄的等大格子；cells 是 (類別, 來源檔名)。"""
+    tiles = tuple(Tile(cat, src, (i % cols) * cell_w, (i // cols) * cell_h, cell_w, cell_h)
+                  for i, (cat, src) in enumerate(cells))
+    return ImagemapLayout(name, tiles, width, height)
+
+
+LAYOUTS: Dict[str, ImagemapLayout] = {}
+
+
+def register_layout(layout: ImagemapLayout) -> ImagemapLayout:
+    unknown = [c for c in layout.categories if c not in CATEGORY_LABELS]
+    if unknown:
+        raise ValueError(f"layout {layout.name} has unknown categories {unknown}")
+    LAYOUTS[layout.name] = layout
+    return layout
+
+
+def get_layout(name: str = "categories") -> ImagemapLayout:
+    try:
+        return LAYOUTS[name]
+    except KeyError:
+        raise KeyError(f"unknown imagemap layout {name!r}") from None
+
+
+# 目前上線的 2x3 版面：六張分類小圖（檔名不變），每格 520x346
+CATEGORY_GRID = register_layout(grid_layout("categories", [
+    ("landmark", "categories_1040_0.png"),
+    ("museum", "categories_1040_1.png"),
+    ("park_walk", "categories_1040_2.png"),
+    ("food_market", "categories_1040_3.png"),
+    ("temple_history", "categories_1040_4.png"),
+    ("family_fun", "categories_1040_5.png"),
+], cols=2, cell_w=520, cell_h=346))
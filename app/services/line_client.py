@@ -0,0 +1,169 @@
+# app/services/line_client.py
+"""
+非同步 LINE Messaging API 客戶端（httpx，keep-alive 連線池）。
+
+- reply / push 都是 await，不再卡住 uvicorn 的 event loop
+- 429 / 5xx 以指數退避 + full jitter 重試（有 Retry-After 就照它）
+- 同一個 reply token 在同一輪 event loop 內的多次 reply 會合併成一次請求（LINE 一次最多 5 則）；
+  超過 5 則的部分在有 userId 時改用 push 補送；沒有 userId 就只送前 5 則並記 log
+  （不在送出後才丟例外，否則呼叫端會拿已用掉的 token 重試）
+- base_url 可指向本機 stub（測試用）
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+MAX_MESSAGES_PER_REQUEST = 5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LineApiError(Exception):
+    def __init__(self, status: int, body: str = ""):
+        super().__init__(f"LINE API {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+    @property
+    def invalid_reply_token(self) -> bool:
+        return self.status == 400 and "Invalid reply token" in self.body
+
+
+def message_to_dict(m: Any) -> Dict[str, Any]:
+    """SDK 的 Message 物件（TextMessage / FlexMessage / ImagemapMessage…）或 dict 一律轉成 API JSON。"""
+    if isinstance(m, dict):
+        return m
+    return m.to_dict()
+
+
+@dataclass
+class _PendingReply:
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    user_id: Optional[str] = None
+    done: Optional[asyncio.Future] = None
+    task: Optional[asyncio.Task] = None
+
+
+class LineClient:
+    def __init__(self, access_token: str, base_url: str = "https://api.line.me", *,
+                 max_retries: int = 3, backoff_base: float = 0.2, backoff_cap: float = 5.0,
+                 timeout: float = 10.0, max_connections: int = 20,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {access_token or ''}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+        self._pending: Dict[str, _PendingReply] = {}
+
+        # metrics
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    # ---------- 低階：送出 + 重試 ----------
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def _post(self, path: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                resp = await self._client.post(path, json=payload, headers=headers)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    self.errors += 1
+                    raise LineApiError(0, str(e)) from e
+                status, body, retry_after = 0, str(e), None
+            else:
+                if resp.status_code < 300:
+                    return resp.json() if resp.content else {}
+                status, body, retry_after = resp.status_code, resp.text, resp.headers.get("Retry-After")
+                if status not in RETRY_STATUS or attempt >= self.max_retries:
+                    self.errors += 1
+                    raise LineApiError(status, body)
+
+            self.retries += 1
+            delay = self._backoff(attempt, retry_after)
+            log.warning("[line] %s -> %s, retry %d in %.2fs", path, status, attempt + 1, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    # ---------- reply（同 token 合併） ----------
+    async def reply(self, reply_token: str, messages: Sequence[Any], user_id: Optional[str] = None) -> None:
+        pending = self._pending.get(reply_token)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = _PendingReply(done=loop.create_future())
+            self._pending[reply_token] = pending
+            # 送出排在下一輪 event loop；這一輪內同 token 的 reply 都會併進來
+            pending.task = loop.create_task(self._flush_reply(reply_token))
+        else:
+            self.coalesced += 1
+        pending.messages.extend(message_to_dict(m) for m in messages)
+        pending.user_id = pending.user_id or user_id
+        await asyncio.shield(pending.done)
+
+    async def _flush_reply(self, reply_token: str) -> None:
+        pending = self._pending.pop(reply_token)
+        head = pending.messages[:MAX_MESSAGES_PER_REQUEST]
+        rest = pending.messages[MAX_MESSAGES_PER_REQUEST:]
+        if rest and not pending.user_id:
+            # 送出前就決定：reply token 只能用一次，送完再報錯只會讓呼叫端拿用過的 token 重試
+            self.dropped += len(rest)
+            log.warning("[line] reply has %d messages over the limit and no userId to push, dropping them",
+                        len(rest))
+            rest = []
+        try:
+            await self._post("/v2/bot/message/reply", {"replyToken": reply_token, "messages": head})
+            if rest:
+                await self.push(pending.user_id, rest)
+        except Exception as e:
+            pending.done.set_exception(e)
+        else:
+            pending.done.set_result(None)
+
+    # ---------- push（分批，每批 ≤ 5） ----------
+    async def push(self, to: str, messages: Sequence[Any]) -> None:
+        items = [message_to_dict(m) for m in messages]
+        for i in range(0, len(items), MAX_MESSAGES_PER_REQUEST):
+            # X-Line-Retry-Key：重試時 LINE 會去重，避免重送造成重複推播
+            await self._post("/v2/bot/message/push",
+                             {"to": to, "messages": items[i:i + MAX_MESSAGES_PER_REQUEST]},
+                             headers={"X-Line-Retry-Key": str(uuid.uuid4())})
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "pending_replies": len(self._pending),
+        }
@@ -0,0 +1,98 @@
+# app/services/model_pool.py
+"""
+AI 模型客戶端池：模型物件只建一次（依 system instruction 快取），
+同步 SDK 呼叫一律丟到專用、有上限的 ThreadPoolExecutor，
+前面再加一道 semaphore 控制同時進行的呼叫數，並記錄排隊時間。
+
+這樣 AI 流量再多也只會占用固定數量的 thread，不會吃光預設 executor、拖慢其他回覆。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+
+class PoolBusy(RuntimeError):
+    """排隊的請求已達上限，直接拒絕而不是無限等待。"""
+
+
+class ModelPool:
+    def __init__(self, factory: Callable[[Optional[str]], Any], *, concurrency: int = 4,
+                 max_waiting: int = 64, name: str = "ai", latency_window: int = 1000):
+        self.factory = factory
+        self.concurrency = max(1, concurrency)
+        self.max_waiting = max_waiting
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"{name}-pool")
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._models: Dict[Optional[str], Any] = {}
+
+        # metrics
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.rejected = 0
+        self._queue_ms: Deque[float] = deque(maxlen=latency_window)
+        self._call_ms: Deque[float] = deque(maxlen=latency_window)
+
+    def model(self, system: Optional[str] = None) -> Any:
+        m = self._models.get(system)
+        if m is None:
+            m = self._models[system] = self.factory(system)
+        return m
+
+    @asynccontextmanager
+    async def slot(self):
+        """取得一個執行名額；排隊超過 max_waiting 時丟 PoolBusy。"""
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise PoolBusy(f"{self.name} pool busy ({self.waiting} waiting)")
+        t0 = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        t1 = time.perf_counter()
+        self._queue_ms.append((t1 - t0) * 1000)
+        self.in_flight += 1
+        self.calls += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._call_ms.append((time.perf_counter() - t1) * 1000)
+            self._sem.release()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        def _pct(xs, p):
+            xs = sorted(xs)
+            return round(xs[min(len(xs) - 1, int(len(xs) * p))], 2) if xs else None
+
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "models": len(self._models),
+            "queue_ms_p50": _pct(self._queue_ms, 0.50),
+            "queue_ms_p99": _pct(self._queue_ms, 0.99),
+            "call_ms_p50": _pct(self._call_ms, 0.50),
+            "call_ms_p99": _pct(self._call_ms, 0.99),
+        }
@@ -0,0 +1,261 @@
+# app/services/place_prep.py
+"""
+離線資料前處理：把 gmaps 正規化、圖片網址驗證這些工作從開機 / 請求路徑移到部署前。
+
+    python -m app.services.place_prep                       # app/data/*.json + *.csv → app/data/prepared/
+    python -m app.services.place_prep a.json b.csv -o out/  # 指定輸入 / 輸出目錄
+
+每筆處理：
+- gmaps：有 place_id 或座標就直接產生 place_id / lat,lng 連結；否則把舊連結（短鏈等）正規化
+- image_url：http 升級成 https；不是 https 絕對網址就移除（執行時用備援圖）
+- 輸出檔名與來源相同（a.json → a.json、a.csv → a.csv），輸出目錄可以直接當 PLACES_DIR：
+  JSON 寫成一筆一行的 JSON array；CSV 照原本的攤平格式（tags0..N、lat / lng）寫回 CSV
+
+輸入輸出都是串流：JSON array 逐筆解析、一筆一行寫出（仍是合法的 JSON array）；
+CSV 的欄位要先掃過一次才知道，來源讀兩次。記憶體只跟單筆大小有關。輸出的 gmaps 都是正式連結，PlaceStore 載入時只剩字首比對；
+再跑一次 place_prep 結果不變。
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from app.utils.links import build_gmaps_url, https_image_url, normalize_existing_gmaps
+
+CHUNK_SIZE = 1 << 16
+_WS = " \t\r\n"
+
+
+def iter_json_array(f: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """逐筆解析最外層是 array 的 JSON 檔，不把整個檔案讀進記憶體。"""
+    dec = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_ws() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WS:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    skip_ws()
+    if pos < len(buf) and buf[pos] == "]":
+        return
+    while True:
+        skip_ws()
+        while True:
+            try:
+                item, end = dec.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof or not fill():
+                    raise
+                continue
+            # 數字等值剛好切在 chunk 邊界時會被截斷，確認後面還有分隔字元才算完整
+            if end >= len(buf) and not eof and fill():
+                continue
+            break
+        pos = end
+        yield item
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        if buf[pos] != ",":
+            raise ValueError(f"expected ',' or ']' at offset {pos}")
+        pos += 1
+
+
+def iter_csv_rows(f: TextIO) -> Iterator[Dict[str, Any]]:
+    """taipei.csv 格式：tags0..tagsN 攤平成欄、lat/lng 分欄 → 與 JSON 相同的 dict。"""
+    for r in csv.DictReader(f):
+        row: Dict[str, Any] = {k: v for k, v in r.items()
+                               if k and not k.startswith("tags") and k not in ("lat", "lng") and v != ""}
+        row["tags"] = [v for k, v in r.items() if k and k.startswith("tags") and v]
+        lat, lng = (r.get("lat") or "").strip(), (r.get("lng") or "").strip()
+        row["geo"] = {"lat": float(lat) if lat else None, "lng": float(lng) if lng else None}
+        yield row
+
+
+def iter_source(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8", newline="") as f:
+        rows = iter_csv_rows(f) if path.suffix.lower() == ".csv" else iter_json_array(f)
+        for row in rows:
+            if isinstance(row, dict):
+                yield row
+
+
+def _to_float(v: Any) -> Optional[float]:
+    try:
+        s = str(v).strip() if v is not None else ""
+        return float(s) if s else None
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class PrepStats:
+    rows: int = 0
+    gmaps_rewritten: int = 0
+    images_upgraded: int = 0
+    images_dropped: int = 0
+    seconds: float = 0.0
+    files: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"rows={self.rows} gmaps_rewritten={self.gmaps_rewritten} "
+                f"images_upgraded={self.images_upgraded} images_dropped={self.images_dropped} "
+                f"{self.seconds * 1000:.1f} ms ({self.rows_per_s:,.0f} rows/s)")
+
+
+def prepare_place(p: Dict[str, Any], stats: Optional[PrepStats] = None) -> Dict[str, Any]:
+    """單筆前處理；回傳新的 dict，欄位順序保持原樣。"""
+    row = dict(p)
+    g = p.get("geo") if isinstance(p.get("geo"), dict) else {}
+    lat, lng = _to_float(g.get("lat")), _to_float(g.get("lng"))
+    name, place_id = p.get("name"), p.get("place_id")
+
+    # place_id / 座標是最可靠的依據，有就直接產生；否則才從舊連結挖
+    if place_id or (lat is not None and lng is not None):
+        gmaps = build_gmaps_url(name=name, lat=lat, lng=lng, place_id=place_id)
+    else:
+        gmaps = normalize_existing_gmaps(p.get("gmaps"), name=name, lat=lat, lng=lng, place_id=place_id)
+    row["gmaps"] = gmaps
+
+    img = None
+    if "image_url" in p:
+        raw = p.get("image_url")
+        img = https_image_url(raw) if isinstance(raw, str) else None   # 數字、list 之類的一律當無效
+        if img is None:
+            del row["image_url"]
+        else:
+            row["image_url"] = img
+
+    if stats is not None:
+        stats.rows += 1
+        stats.gmaps_rewritten += gmaps != p.get("gmaps")
+        if "image_url" in p:
+            stats.images_dropped += img is None and bool(str(raw or "").strip())
+            stats.images_upgraded += img is not None and img != raw
+    return row
+
+
+def write_json_rows(rows: Iterable[Dict[str, Any]], path: Path) -> int:
+    """一筆一行寫成 JSON array，先寫暫存檔再 rename。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    n = 0
+    with tmp.open("w", encoding="utf-8") as out:
+        out.write("[")
+        for row in rows:
+            out.write(",\n" if n else "\n")
+            out.write(json.dumps(row, ensure_ascii=False))
+            n += 1
+        out.write("\n]\n" if n else "]\n")
+    os.replace(tmp, path)
+    return n
+
+
+def _csv_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    """iter_csv_rows 的反向：tags list 攤回 tags0..N、geo 拆成 lat / lng。"""
+    out = {k: v for k, v in row.items() if k not in ("tags", "geo")}
+    for i, t in enumerate(row.get("tags") or ()):
+        out[f"tags{i}"] = t
+    g = row.get("geo") if isinstance(row.get("geo"), dict) else {}
+    out["lat"], out["lng"] = g.get("lat"), g.get("lng")
+    return out
+
+
+def csv_columns(rows: Iterable[Dict[str, Any]], extra: Iterable[str] = ()) -> List[str]:
+    """掃一次資料列決定 CSV 欄位：一般欄位依出現順序，再來 tags0..N 與 lat / lng。"""
+    keys: Dict[str, None] = {}
+    max_tags = 0
+    for row in rows:
+        keys.update(dict.fromkeys(k for k in row if k not in ("tags", "geo")))
+        max_tags = max(max_tags, len(row.get("tags") or ()))
+    keys.update(dict.fromkeys(extra))
+    return list(keys) + [f"tags{i}" for i in range(max_tags)] + ["lat", "lng"]
+
+
+def write_csv_rows(rows: Iterable[Dict[str, Any]], path: Path, columns: List[str]) -> int:
+    """照 iter_csv_rows 讀得回來的格式寫 CSV（沒有值的欄位留空），先寫暫存檔再 rename。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    n = 0
+    with tmp.open("w", encoding="utf-8", newline="") as out:
+        w = csv.DictWriter(out, fieldnames=columns, restval="")
+        w.writeheader()
+        for row in rows:
+            w.writerow({k: "" if v is None else v for k, v in _csv_record(row).items()})
+            n += 1
+    os.replace(tmp, path)
+    return n
+
+
+def prepare_files(sources: Iterable[Path], out_dir: Path) -> PrepStats:
+    """每個來源寫一個同名檔到 out_dir（JSON → JSON、CSV → CSV），loader 讀輸出目錄跟讀來源一樣。"""
+    stats = PrepStats()
+    t0 = time.perf_counter()
+    for src in sources:
+        src = Path(src)
+        dst = Path(out_dir) / src.name
+        if src.suffix.lower() == ".csv":
+            # 前處理只會補上 gmaps、拿掉無效的 image_url，欄位用來源的就夠
+            columns = csv_columns(iter_source(src), extra=("gmaps",))
+            write_csv_rows((prepare_place(p, stats) for p in iter_source(src)), dst, columns)
+        else:
+            write_json_rows((prepare_place(p, stats) for p in iter_source(src)), dst)
+        stats.files.append(str(dst))
+    stats.seconds = time.perf_counter() - t0
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="normalize place data offline (gmaps links, image URLs)")
+    ap.add_argument("inputs", nargs="*", type=Path, help="JSON array / CSV files (default: PLACES_DIR)")
+    ap.add_argument("-o", "--out-dir", type=Path, default=None)
+    args = ap.parse_args(argv)
+
+    inputs, out_dir = args.inputs, args.out_dir
+    if not inputs or out_dir is None:
+        from app.config.settings import settings
+        if not inputs:
+            inputs = list(settings.iter_place_files())
+        if out_dir is None:
+            out_dir = settings.places_dir / "prepared"
+
+    stats = prepare_files(inputs, out_dir)
+    print(f"[place_prep] {stats}")
+    for fp in stats.files:
+        print(f"  wrote {fp}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,212 @@
+# app/services/place_record.py
+"""
+精簡的景點紀錄：取代「每筆一個 dict + geo dict + tags list」。
+
+- PlaceRecord 用 __slots__，沒有每筆一個 __dict__
+- city / district / type / hours / cost 這類重複度高的字串一律 intern，整個 process 只留一份
+- tags 存成對照 TagVocab 的 bitmask（int），讀取時才解回 tuple；來源順序和 bit 順序不同時
+  另存一份來源順序的 tuple（字串與 TagVocab 共用），p["tags"] 一律照來源順序
+- 座標存成 (lat, lng) tuple；沒有座標的資料共用同一個 _NO_GEO
+- 仍是唯讀 Mapping：p.get("name") / p["tags"] / p.get("geo") / dict(p) 都照舊，
+  bubble_from_place、to_category、GeoIndex/GeoStore 不必改
+
+原始資料裡沒出現的欄位維持「不存在」（p.get(k, default) 回 default），
+少見的欄位（例如 place_id）放在 _extra，不額外佔 slot。
+"""
+from __future__ import annotations
+
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_MISSING: Any = object()
+_NO_GEO = (None, None)
+
+# 直接放 slot 的欄位（其餘欄位進 _extra）
+_TEXT_FIELDS = ("name", "type", "city", "district", "description", "hours", "cost", "gmaps", "image_url")
+# 這些欄位的值重複度高，intern 後所有紀錄共用同一個字串物件
+_INTERNED = frozenset({"type", "city", "district", "hours", "cost"})
+
+
+def _intern(v: Any) -> Any:
+    return sys.intern(v) if type(v) is str else v
+
+
+class TagVocab:
+    """tag ↔ bit 位置的對照表；第一次看到的 tag 分配下一個 bit。"""
+
+    __slots__ = ("_bit", "_names")
+
+    def __init__(self, tags: Iterable[str] = ()):
+        self._bit: Dict[str, int] = {}
+        self._names: List[str] = []
+        for t in tags:
+            self.add(t)
+
+    def add(self, tag: str) -> int:
+        b = self._bit.get(tag)
+        if b is None:
+            b = self._bit[tag] = len(self._names)
+            self._names.append(sys.intern(tag))
+        return b
+
+    def encode(self, tags: Iterable[str]) -> int:
+        m = 0
+        for t in tags:
+            m |= 1 << self.add(t)
+        return m
+
+    def encode_ordered(self, tags: Iterable[str]) -> Tuple[int, Optional[Tuple[str, ...]]]:
+        """(bitmask, 來源順序)；來源順序和 decode 出來的一樣時第二項是 None，不多佔記憶體。"""
+        bits = [self.add(t) for t in tags]
+        m = 0
+        for b in bits:
+            m |= 1 << b
+        if all(a < b for a, b in zip(bits, bits[1:])):
+            return m, None
+        return m, tuple(self._names[b] for b in bits)
+
+    def mask(self, tags: Iterable[str]) -> int:
+        """查詢用：不認得的 tag 直接略過，不會長出新的 bit。"""
+        m = 0
+        for t in tags:
+            b = self._bit.get(t)
+            if b is not None:
+                m |= 1 << b
+        return m
+
+    def decode(self, m: int) -> Tuple[str, ...]:
+        names = self._names
+        out = []
+        i = 0
+        while m:
+            if m & 1:
+                out.append(names[i])
+            m >>= 1
+            i += 1
+        return tuple(out)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, tag: object) -> bool:
+        return tag in self._bit
+
+
+class PlaceRecord(Mapping):
+    __slots__ = _TEXT_FIELDS + ("_geo", "_tags", "_tag_order", "_vocab", "_extra")
+
+    def __init__(self, vocab: TagVocab, *, geo: Any = _MISSING, tags: Optional[int] = None,
+                 tag_order: Optional[Tuple[str, ...]] = None,
+                 extra: Optional[Dict[str, Any]] = None, **fields: Any):
+        for k in _TEXT_FIELDS:
+            v = fields.get(k, _MISSING)
+            object.__setattr__(self, k, _intern(v) if k in _INTERNED else v)
+        object.__setattr__(self, "_geo", geo)
+        object.__setattr__(self, "_tags", tags)
+        object.__setattr__(self, "_tag_order", tag_order)
+        object.__setattr__(self, "_vocab", vocab)
+        object.__setattr__(self, "_extra", extra or None)
+
+    @classmethod
+    def from_dict(cls, p: Mapping, vocab: TagVocab) -> "PlaceRecord":
+        fields = {k: p[k] for k in _TEXT_FIELDS if k in p}
+        extra = {k: v for k, v in p.items() if k not in fields and k not in ("geo", "tags")}
+
+        geo: Any = _MISSING
+        g = p.get("geo", _MISSING)
+        if g is not _MISSING:
+            if isinstance(g, Mapping) and set(g) <= {"lat", "lng"}:
+                lat, lng = g.get("lat"), g.get("lng")
+                geo = _NO_GEO if lat is None and lng is None else (lat, lng)
+            else:
+                extra["geo"] = g  # 非標準格式原樣保留
+
+        tags = order = None
+        if "tags" in p:
+            t = p["tags"]
+            if isinstance(t, (list, tuple)) and all(type(x) is str for x in t) and len(set(t)) == len(t):
+                tags, order = vocab.encode_ordered(t)
+            else:
+                extra["tags"] = t  # 有重複或非字串時保留原樣，避免讀回來不一致
+
+        return cls(vocab, geo=geo, tags=tags, tag_order=order, extra=extra, **fields)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("PlaceRecord is read-only")
+
+    # --- 特殊欄位 ---
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        if self._tags is None:
+            return ()
+        return self._tag_order or self._vocab.decode(self._tags)
+
+    @property
+    def tag_bits(self) -> int:
+        return self._tags or 0
+
+    def has_tags(self, mask: int) -> bool:
+        """mask 內的 tag 全部都有（用 TagVocab.mask 產生）。"""
+        return (self.tag_bits & mask) == mask
+
+    @property
+    def lat(self) -> Any:
+        return None if self._geo is _MISSING else self._geo[0]
+
+    @property
+    def lng(self) -> Any:
+        return None if self._geo is _MISSING else self._geo[1]
+
+    # --- Mapping 介面 ---
+    def __getitem__(self, key: str) -> Any:
+        if key in _SLOT_SET:
+            v = getattr(self, key)
+            if v is _MISSING:
+                raise KeyError(key)
+            return v
+        if key == "geo" and self._geo is not _MISSING:
+            return MappingProxyType({"lat": self._geo[0], "lng": self._geo[1]})
+        if key == "tags" and self._tags is not None:
+            return self._tag_order or self._vocab.decode(self._tags)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]  # type: ignore[index]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        for k in _TEXT_FIELDS:
+            if getattr(self, k) is not _MISSING:
+                yield k
+        if self._geo is not _MISSING:
+            yield "geo"
+        if self._tags is not None:
+            yield "tags"
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    # Mapping 預設會依內容比較與 hash=None；這裡以物件身分為準，才能放進 set / 當 dict key
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __repr__(self) -> str:
+        return f"PlaceRecord(name={self.get('name')!r}, city={self.get('city')!r}, district={self.get('district')!r})"
+
+
+_SLOT_SET = frozenset(_TEXT_FIELDS)
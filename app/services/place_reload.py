@@ -0,0 +1,202 @@
+# app/services/place_reload.py
+"""
+景點資料熱更新：不重新部署就能換上新資料。
+
+- 背景 task 每 interval 秒檢查一次資料檔（快照 + JSON/CSV 的 mtime/size）；
+  有設 PLACES_GCS_PREFIX 時先把 GCS 上內容不同（md5）的檔案下載到 PLACES_DIR
+- 有變更就在 thread 裡建新的 PlaceStore 並 warm（索引、座標表、路由表都先建好），
+  最後只換一個參考（swap_store）。處理中的請求握著舊 store，不受影響
+- 同一時間只會有一個 reload；admin endpoint 觸發時若已有 reload 在跑，直接回 busy
+- stats()：reload 次數、失敗次數、最近幾次 reload 耗時（ms）與目前資料版本
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from base64 import b64encode
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+Fingerprint = Tuple[Tuple[str, int, int], ...]
+
+
+def files_fingerprint(paths: Iterable[Path]) -> Fingerprint:
+    """(路徑, mtime_ns, size)；檔案不存在就不列入（刪檔也算變更）。"""
+    out = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        out.append((str(p), st.st_mtime_ns, st.st_size))
+    return tuple(sorted(out))
+
+
+def _md5_b64(path: Path) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return b64encode(hashlib.md5(f.read()).digest()).decode("ascii")
+    except OSError:
+        return None
+
+
+def sync_places_from_gcs(bucket_name: str, prefix: str, local_dir: Path) -> int:
+    """把 GCS prefix 下的 .json/.csv/.snap 同步到 local_dir；只下載 md5 不同的檔案，回傳下載數。"""
+    from google.cloud import storage
+
+    bucket = storage.Client().bucket(bucket_name)
+    local_dir = Path(local_dir)
+    local_dir.mkdir(parents=True, exist_ok=True)
+    n = 0
+    for blob in bucket.list_blobs(prefix=prefix.strip("/") + "/"):
+        name = blob.name.rsplit("/", 1)[-1]
+        if not name.endswith((".json", ".csv", ".snap")):
+            continue
+        dst = local_dir / name
+        if blob.md5_hash and blob.md5_hash == _md5_b64(dst):
+            continue
+        tmp = dst.with_name(dst.name + f".tmp{os.getpid()}")
+        blob.download_to_filename(str(tmp))
+        os.replace(tmp, dst)  # 讀取端不會看到寫一半的檔
+        n += 1
+    return n
+
+
+class PlaceReloader:
+    def __init__(self, load: Callable[[], Any], swap: Callable[[Any], Any],
+                 fingerprint: Callable[[], Any], *, sync: Optional[Callable[[], Any]] = None,
+                 interval: float = 0.0, latency_window: int = 50):
+        self._load = load
+        self._swap = swap
+        self._fingerprint_fn = fingerprint
+        self._sync = sync
+        self.interval = interval
+        self._fingerprint: Any = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # metrics
+        self.reloads = 0
+        self.failures = 0
+        self.unchanged = 0
+        self.version: Any = None
+        self.last_error: Optional[str] = None
+        self.last_reload_at: Optional[float] = None
+        self._reload_ms: Deque[float] = deque(maxlen=latency_window)
+
+    @classmethod
+    def from_settings(cls) -> "PlaceReloader":
+        from app.config.settings import settings
+        from app.services.places import PlaceStore, swap_store
+
+        def paths():
+            yield from settings.iter_place_files()
+            if settings.snapshot_path:
+                yield settings.snapshot_path
+
+        sync = None
+        if settings.places_gcs_prefix and settings.assets_bucket:
+            sync = lambda: sync_places_from_gcs(settings.assets_bucket, settings.places_gcs_prefix,
+                                                settings.places_dir)
+        return cls(
+            load=lambda: PlaceStore.from_settings().warm(),
+            swap=swap_store,
+            fingerprint=lambda: files_fingerprint(paths()),
+            sync=sync,
+            interval=settings.places_reload_interval,
+        )
+
+    # ---------- 同步核心（在 thread 裡跑）----------
+    def reload_now(self, force: bool = False) -> Dict[str, Any]:
+        if not self._lock.acquire(blocking=False):
+            return {"status": "busy", "version": self.version}
+        try:
+            if self._sync:
+                self._sync()
+            fp = self._fingerprint_fn()
+            if not force and fp == self._fingerprint:
+                self.unchanged += 1
+                return {"status": "unchanged", "version": self.version}
+
+            t0 = time.perf_counter()
+            store = self._load()  # 建索引、warm 都在這裡，不在請求路徑上
+            self._swap(store)
+            ms = (time.perf_counter() - t0) * 1000
+
+            self._fingerprint = fp
+            self.version = getattr(store, "version", None)
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_at = time.time()
+            self._reload_ms.append(ms)
+            log.info("[places] reloaded version=%s size=%s in %.1f ms",
+                     self.version, len(store) if hasattr(store, "__len__") else "?", ms)
+            return {"status": "reloaded", "version": self.version, "ms": round(ms, 1)}
+        except Exception as e:
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            log.exception("[places] reload failed, keeping version %s", self.version)
+            return {"status": "failed", "version": self.version, "error": self.last_error}
+        finally:
+            self._lock.release()
+
+    # ---------- asyncio 介面 ----------
+    async def reload(self, force: bool = False) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.reload_now, force)
+
+    def mark_loaded(self, store: Any) -> None:
+        """開機載入完成後記下目前的檔案狀態與版本，第一次輪詢才不會重載同一份資料。"""
+        self._fingerprint = self._fingerprint_fn()
+        self.version = getattr(store, "version", None)
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="places-reloader")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.reload()
+
+    def stats(self) -> Dict[str, Any]:
+        ms = sorted(self._reload_ms)
+        return {
+            "version": self.version,
+            "interval_s": self.interval,
+            "running": self._task is not None,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "unchanged": self.unchanged,
+            "last_error": self.last_error,
+            "last_reload_at": self.last_reload_at,
+            "last_reload_ms": round(self._reload_ms[-1], 1) if ms else None,
+            "p50_reload_ms": round(ms[len(ms) // 2], 1) if ms else None,
+            "max_reload_ms": round(ms[-1], 1) if ms else None,
+        }
+
+
+_RELOADER: Optional[PlaceReloader] = None
+
+
+def get_reloader() -> PlaceReloader:
+    global _RELOADER
+    if _RELOADER is None:
+        _RELOADER = PlaceReloader.from_settings()
+    return _RELOADER
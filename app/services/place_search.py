@@ -0,0 +1,284 @@
+# app/services/place_search.py
+"""
+景點全文搜尋：name / description / tags 的中文二字詞（bigram）倒排索引，BM25 計分。
+
+- 斷詞：NFKC + 小寫；連續中文取相鄰兩字（「台北夜景」→ 台北 / 北夜 / 夜景），英數取整個字
+- 欄位加權：name ×3、tags ×2、description ×1（算進詞頻，BM25 的文件長度也用加權後的長度）
+- 每個詞的 posting 依「分數貢獻」由高到低排好，分數在建索引時就算完（idf × tf 正規化）；
+  單詞查詢照順序掃、湊滿 limit 就停。多詞查詢先用 set 交集取候選，候選少就全部算分，
+  多的話用 threshold algorithm：順著 posting 往下掃，每筆用正向索引（該筆的詞頻表）算總分，
+  第 limit 名已不低於「還沒看到的最高可能分數」就停
+- 多詞查詢的結果另有 LRU（熱門查詢重複率高；索引跟著 store 換版，快取自然失效）
+- city / district / category 篩選直接在 posting 上比對（每筆的城市、行政區、類別各一個 list）
+- 增量建置：每筆的斷詞結果以 (name, description, tags) 為 key 留著，
+  熱更新時內容沒變的資料直接沿用，只重算 posting 與分數
+"""
+from __future__ import annotations
+
+import heapq
+import re
+import time
+import unicodedata
+from array import array
+from itertools import combinations
+from collections import Counter, OrderedDict, defaultdict
+from math import log
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+FIELD_WEIGHTS = {"name": 3, "tags": 2, "description": 1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+RESULT_CACHE_SIZE = 1024
+# AND 候選在這個數量以內就直接全部算分
+EXHAUSTIVE_MAX = 512
+
+_RUNS = re.compile(r"[㐀-鿿豈-﫿]+|[0-9a-z]+")
+
+
+def tokenize(text: str) -> List[str]:
+    out: List[str] = []
+    for run in _RUNS.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if run[0].isascii() or len(run) == 1:
+            out.append(run)
+        else:
+            out.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return out
+
+
+DocKey = Tuple[str, str, Tuple[str, ...]]
+# 攤平的 (詞, 加權詞頻, 詞, 加權詞頻, ...)；比 tuple of tuples 省一層物件
+DocTerms = Tuple[Any, ...]
+
+
+def _doc_key(p: Any) -> DocKey:
+    tags = p.get("tags") or ()
+    return (p.get("name") or "", p.get("description") or "",
+            tuple(t if type(t) is str else str(t) for t in tags))
+
+
+def _doc_terms(key: DocKey) -> DocTerms:
+    name, desc, tags = key
+    w = FIELD_WEIGHTS
+    tf: Counter = Counter()
+    for tok in tokenize(name):
+        tf[tok] += w["name"]
+    for tag in tags:
+        for tok in tokenize(tag):
+            tf[tok] += w["tags"]
+    for tok in tokenize(desc):
+        tf[tok] += w["description"]
+    return tuple(x for tok, n in tf.items() for x in (tok, n))
+
+
+def _tf(terms: DocTerms, tok: str) -> int:
+    # 詞頻都是 int，tuple.index 找字串只會落在「詞」的位置
+    try:
+        return terms[terms.index(tok) + 1]
+    except ValueError:
+        return 0
+
+
+class SearchHit(NamedTuple):
+    score: float
+    place: Any
+
+
+class PlaceSearchIndex:
+    def __init__(self, rows: Sequence[Any], categories: Sequence[str],
+                 previous: Optional["PlaceSearchIndex"] = None):
+        t0 = time.perf_counter()
+        self.rows = rows
+        self._city = [p.get("city") for p in rows]
+        self._district = [p.get("district") for p in rows]
+        self._category = list(categories)
+
+        cache = previous._terms if previous is not None else {}
+        terms: Dict[DocKey, DocTerms] = {}
+        raw: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        forward: List[DocTerms] = []
+        lengths = array("i")
+        self.reused = 0
+        for d, p in enumerate(rows):
+            key = _doc_key(p)
+            t = terms.get(key)
+            if t is None:
+                t = cache.get(key)
+                if t is None:
+                    t = _doc_terms(key)
+                else:
+                    self.reused += 1
+                terms[key] = t
+            forward.append(t)
+            dl = 0
+            for i in range(0, len(t), 2):
+                raw[t[i]].append((d, t[i + 1]))
+                dl += t[i + 1]
+            lengths.append(dl)
+        self._terms = terms
+        self._forward = forward
+
+        n = len(rows)
+        avgdl = (sum(lengths) / n) if n else 1.0
+        norm = self._norm = array("d", (BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl) for dl in lengths))
+        self._idf: Dict[str, float] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        for tok, plist in raw.items():
+            idf = self._idf[tok] = log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            scored = sorted(((idf * tf * (BM25_K1 + 1) / (tf + norm[d]), d) for d, tf in plist),
+                            key=lambda x: (-x[0], x[1]))
+            self._postings[tok] = (array("i", [d for _, d in scored]), array("d", [s for s, _ in scored]))
+        self._results: "OrderedDict[tuple, List[SearchHit]]" = OrderedDict()
+        self.cache_hits = 0
+        self.build_ms = (time.perf_counter() - t0) * 1000
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _filter(self, city: Optional[str], district: Optional[str],
+                category: Optional[str]) -> Optional[Callable[[int], bool]]:
+        conds = [(col, v) for col, v in ((self._city, city), (self._district, district),
+                                         (self._category, category)) if v]
+        if not conds:
+            return None
+        if len(conds) == 1:
+            col, v = conds[0]
+            return lambda d: col[d] == v
+        return lambda d: all(col[d] == v for col, v in conds)
+
+    def _score(self, d: int, toks: List[str]) -> float:
+        terms, norm = self._forward[d], self._norm[d]
+        score = 0.0
+        for tok in toks:
+            tf = _tf(terms, tok)
+            if tf:
+                score += self._idf[tok] * tf * (BM25_K1 + 1) / (tf + norm)
+        return score
+
+    def _candidates(self, toks: List[str]) -> set:
+        """AND 的候選：由短到長取交集（set 交集是 C 迴圈，不必逐筆算分）。"""
+        cand = set(self._postings[toks[0]][0])
+        for tok in toks[1:]:
+            cand.intersection_update(self._postings[tok][0])
+            if not cand:
+                break
+        return cand
+
+    def _relax(self, toks: List[str]) -> Tuple[List[str], set]:
+        """
+        全部的詞都有交集就用全部；否則在「少一個詞」的組合裡挑交集最大的，
+        都沒有就捨棄最罕見的詞（多半是跨詞的雜訊，例如「台北車站」的「北車」）再試。
+        剩一個詞時回傳空集合，由呼叫端走單詞查詢。
+        """
+        while len(toks) > 1:
+            cand = self._candidates(toks)
+            if cand:
+                return toks, cand
+            best, sub = max(((self._candidates(list(c)), list(c)) for c in combinations(toks, len(toks) - 1)),
+                            key=lambda x: len(x[0]))
+            if best:
+                return sub, best
+            toks = toks[1:]
+        return toks, set()
+
+    def _top(self, toks: List[str], cand: set, limit: int) -> List[Tuple[float, int]]:
+        """
+        候選不多就全部算分；否則用 threshold algorithm：各詞的 posting 同步往下掃（不是候選的跳過），
+        每筆用正向索引算總分；還沒看到的文件最多只能拿到「各條目前位置的分數和」，
+        第 limit 名已不低於它就停。
+        """
+        if len(cand) <= EXHAUSTIVE_MAX:
+            return heapq.nlargest(limit, ((self._score(d, toks), d) for d in cand), key=lambda x: (x[0], -x[1]))
+
+        scan = [self._postings[t] for t in toks]
+        heap: List[Tuple[float, int]] = []  # (分數, -doc)，最小堆
+        seen: set = set()
+        pos = 0
+        while True:
+            bound, active = 0.0, False
+            for docs, imps in scan:
+                if pos >= len(docs):
+                    continue
+                active = True
+                bound += imps[pos]
+                d = docs[pos]
+                if d in seen or d not in cand:
+                    continue
+                seen.add(d)
+                s = self._score(d, toks)
+                if len(heap) < limit:
+                    heapq.heappush(heap, (s, -d))
+                elif (s, -d) > heap[0]:
+                    heapq.heapreplace(heap, (s, -d))
+            if not active or (len(heap) >= limit and heap[0][0] >= bound):
+                break
+            pos += 1
+        return [(s, -nd) for s, nd in sorted(heap, reverse=True)]
+
+    def _scan_one(self, tok: str, ok: Optional[Callable[[int], bool]], limit: int) -> List[Tuple[float, int]]:
+        docs, imps = self._postings[tok]
+        out: List[Tuple[float, int]] = []
+        for d, s in zip(docs, imps):
+            if ok is None or ok(d):
+                out.append((s, d))
+                if len(out) >= limit:
+                    break
+        return out
+
+    def search(self, query: str, *, city: Optional[str] = None, district: Optional[str] = None,
+               category: Optional[str] = None, limit: int = 10) -> List[SearchHit]:
+        """
+        所有（索引裡有的）詞都要命中；沒有文件同時包含全部的詞時，改用命中詞數最多的組合（見 _relax）。
+        """
+        toks = [t for t in dict.fromkeys(tokenize(query)) if t in self._postings]
+        if not toks or limit <= 0:
+            return []
+        ok = self._filter(city, district, category)
+        if len(toks) == 1:
+            return self._hits(self._scan_one(toks[0], ok, limit))
+
+        key = (tuple(toks), city, district, category, limit)
+        hits = self._results.get(key)
+        if hits is not None:
+            self._results.move_to_end(key)
+            self.cache_hits += 1
+            return list(hits)
+
+        toks.sort(key=lambda t: len(self._postings[t][0]))
+        toks, cand = self._relax(toks)
+        if len(toks) == 1:
+            scored = self._scan_one(toks[0], ok, limit)
+        else:
+            if ok is not None:
+                cand = {d for d in cand if ok(d)}
+            scored = self._top(toks, cand, limit)
+        hits = self._hits(scored)
+        self._results[key] = hits
+        while len(self._results) > RESULT_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return list(hits)
+
+    def _hits(self, scored: List[Tuple[float, int]]) -> List[SearchHit]:
+        rows = self.rows
+        return [SearchHit(round(s, 4), rows[d]) for s, d in scored]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"docs": len(self.rows), "terms": len(self._postings),
+                "postings": sum(len(d) for d, _ in self._postings.values()),
+                "reused": self.reused, "build_ms": round(self.build_ms, 1),
+                "cached_queries": len(self._results), "cache_hits": self.cache_hits}
+
+
+# 上一版的索引（只為了沿用斷詞結果）；換版後舊 store 的索引仍可被握著它的請求使用
+_LAST: Optional[PlaceSearchIndex] = None
+
+
+def _build(store: Any) -> PlaceSearchIndex:
+    global _LAST
+    idx = PlaceSearchIndex(store.rows, store.index.categories, previous=_LAST)
+    _LAST = idx
+    return idx
+
+
+def search_index(store: Any) -> PlaceSearchIndex:
+    """這份資料的搜尋索引（store.derived 快取；搭配 register_warmer 在換版前建好）。"""
+    return store.derived("search_index", _build)
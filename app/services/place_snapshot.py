@@ -0,0 +1,356 @@
+# app/services/place_snapshot.py
+"""
+景點資料的二進位快照：開機時 mmap 讀取，取代逐檔 json.load。
+
+建置（部署前 / Docker build 時跑一次）：
+
+    python -m app.services.place_snapshot                 # settings.iter_place_files() → settings.snapshot_path
+    python -m app.services.place_snapshot -o /tmp/p.snap  # 指定輸出
+
+檔案格式（little-endian）：
+
+    [8s magic][u32 format version][u32 header 長度][header JSON][payload]
+
+header 記錄筆數、欄位、各 section 在 payload 內的 (offset, length)、payload 的 crc32
+與來源檔的 sha256。payload 的 section 都對齊 8 bytes：
+
+- str_offsets / str_blob：去重後的字串表（utf-8），其餘欄位都只存字串編號
+- col_<field>：每個文字欄位一個 u32 欄，NONE 代表該筆沒有這個欄位
+  （category 是預先算好的 to_category，gmaps 是已正規化的連結）
+- flags：u8，bit0 = 有 geo、bit1 = 有 tags
+- lat / lng：f64，None 存成 NaN
+- tag_offsets / tag_ids：每筆的 tag 字串編號（CSR 格式，照來源順序）
+- extra：其餘欄位（place_id 以外的少見欄位、非標準 geo/tags）以 JSON 字串存放
+
+讀取時同一個字串只 decode 一次，所有紀錄共用同一個物件。
+
+範圍：快照省的是 JSON 解析、to_category 與 gmaps 正規化。每個 worker process 仍各自把
+整份快照 decode 成 PlaceRecord，再用快照裡的 category 重建 PlaceIndex；檔案裡沒有
+bucket / category 的 offset 表，紀錄與索引都是 process 自己的 Python 物件，
+worker 之間不共享記憶體分頁（mmap 只在讀取這一次用到，page cache 只讓第二個 worker 讀檔較快）。
+
+驗證失敗（magic / 版本 / crc / 範圍 / 來源檔增減或內容已變更）一律丟 SnapshotError，
+由呼叫端退回讀 JSON。來源清單與 JSON 退路共用 settings.iter_place_files()，兩條路讀的是同一份資料。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.place_record import _MISSING, _NO_GEO, _TEXT_FIELDS, PlaceRecord, TagVocab
+
+MAGIC = b"TGWSNAP\0"
+FORMAT_VERSION = 2   # 2：tag_ids 改存來源順序
+NONE = 0xFFFFFFFF
+
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 8
+# 字串欄：PlaceRecord 的 slot 欄位 + place_id + 預先算好的類別
+_COLUMNS = _TEXT_FIELDS + ("place_id", "category")
+_HAS_GEO = 1
+_HAS_TAGS = 2
+
+
+class SnapshotError(ValueError):
+    """快照不存在、格式不符、內容損毀或已過期。"""
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------- 寫入 ----------
+class _StringTable:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def id(self, s: Any) -> int:
+        if s is _MISSING:
+            return NONE
+        i = self._ids.get(s)
+        if i is None:
+            i = self._ids[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+
+def _extra_of(r: PlaceRecord) -> Optional[str]:
+    """不適合放進字串欄的內容（少見欄位、非字串值）以 JSON 保留。"""
+    extra = {k: v for k, v in (r._extra or {}).items() if k != "place_id"}
+    for k in _TEXT_FIELDS:
+        v = getattr(r, k)
+        if v is not _MISSING and type(v) is not str:
+            extra[k] = v
+    pid = (r._extra or {}).get("place_id", _MISSING)
+    if pid is not _MISSING and type(pid) is not str:
+        extra["place_id"] = pid
+    return json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else None
+
+
+def encode_snapshot(records: Sequence[PlaceRecord], categories: Sequence[str],
+                    sources: Iterable[Path] = ()) -> bytes:
+    if len(records) != len(categories):
+        raise ValueError("records / categories length mismatch")
+    n = len(records)
+    table = _StringTable()
+    cols = {f: array("I") for f in _COLUMNS}
+    flags = bytearray(n)
+    lat, lng = array("d"), array("d")
+    tag_offsets, tag_ids = array("I", [0]), array("I")
+    extra = array("I")
+
+    for i, (r, cat) in enumerate(zip(records, categories)):
+        for f in _TEXT_FIELDS:
+            v = getattr(r, f)
+            cols[f].append(table.id(v) if type(v) is str else NONE)
+        pid = (r._extra or {}).get("place_id", _MISSING)
+        cols["place_id"].append(table.id(pid) if type(pid) is str else NONE)
+        cols["category"].append(table.id(cat))
+
+        g = r._geo
+        if g is not _MISSING:
+            flags[i] |= _HAS_GEO
+        la, ln = _NO_GEO if g is _MISSING else g
+        lat.append(math.nan if la is None else float(la))
+        lng.append(math.nan if ln is None else float(ln))
+
+        if r._tags is not None:
+            flags[i] |= _HAS_TAGS
+            tag_ids.extend(table.id(t) for t in r.tags)   # 來源順序
+        tag_offsets.append(len(tag_ids))
+
+        ex = _extra_of(r)
+        extra.append(NONE if ex is None else table.id(ex))
+
+    blob = bytearray()
+    str_offsets = array("I", [0])
+    for s in table.strings:
+        blob += s.encode("utf-8")
+        str_offsets.append(len(blob))
+
+    parts: List[Tuple[str, bytes]] = [("str_offsets", str_offsets.tobytes()), ("str_blob", bytes(blob))]
+    parts += [(f"col_{f}", cols[f].tobytes()) for f in _COLUMNS]
+    parts += [("flags", bytes(flags)), ("lat", lat.tobytes()), ("lng", lng.tobytes()),
+              ("tag_offsets", tag_offsets.tobytes()), ("tag_ids", tag_ids.tobytes()),
+              ("extra", extra.tobytes())]
+
+    payload = bytearray()
+    sections: Dict[str, List[int]] = {}
+    for name, data in parts:
+        payload += b"\0" * (-len(payload) % _ALIGN)
+        sections[name] = [len(payload), len(data)]
+        payload += data
+
+    header = {
+        "rows": n,
+        "strings": len(table.strings),
+        "columns": list(_COLUMNS),
+        "sections": sections,
+        "crc32": zlib.crc32(payload),
+        "sources": {Path(p).name: file_digest(Path(p)) for p in sources},
+        "built_at": int(time.time()),
+    }
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    head += b" " * (-(_PREFIX.size + len(head)) % _ALIGN)  # payload 從 8 的倍數開始
+    return _PREFIX.pack(MAGIC, FORMAT_VERSION, len(head)) + head + bytes(payload)
+
+
+def write_snapshot(path: Path, records: Sequence[PlaceRecord], categories: Sequence[str],
+                   sources: Iterable[Path] = ()) -> int:
+    """寫到暫存檔再 rename，正在 mmap 舊檔的 worker 不受影響。回傳檔案大小。"""
+    data = encode_snapshot(records, categories, sources)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+# ---------- 讀取 ----------
+class Snapshot:
+    """讀回來的結果：唯讀紀錄、預先算好的類別、共用的 TagVocab 與 header。"""
+
+    __slots__ = ("rows", "categories", "tag_vocab", "header")
+
+    def __init__(self, rows: tuple, categories: List[str], tag_vocab: TagVocab, header: dict):
+        self.rows = rows
+        self.categories = categories
+        self.tag_vocab = tag_vocab
+        self.header = header
+
+
+def _u32(mv: memoryview) -> List[int]:
+    with mv.cast("I") as c:
+        return c.tolist()
+
+
+def _f64(mv: memoryview) -> List[float]:
+    with mv.cast("d") as c:
+        return c.tolist()
+
+
+def read_snapshot(path: Path, sources: Optional[Iterable[Path]] = None) -> Snapshot:
+    """
+    mmap 讀入快照並組回 PlaceRecord。
+    sources（目前的來源檔清單）有給時，檔案組合與 header 記錄的不同（新增或移除），
+    或任一檔內容已變，都視為過期。
+    """
+    if sys.byteorder != "little":
+        raise SnapshotError("snapshot is little-endian only")
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        raise SnapshotError(f"cannot open snapshot: {e}") from e
+    with f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # 空檔
+            raise SnapshotError(f"cannot map snapshot: {e}") from e
+    # 不主動 close：驗證失敗時 traceback 仍握著切片，交給參考計數在最後一個 view 消失時釋放
+    return _decode(memoryview(mm), None if sources is None else [Path(p) for p in sources])
+
+
+def _check_sources(recorded: Dict[str, str], sources: List[Path]) -> None:
+    current = {p.name: p for p in sources}
+    if set(current) != set(recorded):
+        added, removed = sorted(set(current) - set(recorded)), sorted(set(recorded) - set(current))
+        raise SnapshotError(f"stale: source files changed (added {added}, removed {removed})")
+    for name, digest in recorded.items():
+        if file_digest(current[name]) != digest:
+            raise SnapshotError(f"stale: {name} changed since build")
+
+
+def _decode(mv: memoryview, sources: Optional[List[Path]]) -> Snapshot:
+    if len(mv) < _PREFIX.size:
+        raise SnapshotError("truncated snapshot")
+    magic, version, head_len = _PREFIX.unpack_from(mv)
+    if magic != MAGIC:
+        raise SnapshotError("not a place snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    start = _PREFIX.size + head_len
+    if start > len(mv):
+        raise SnapshotError("truncated header")
+    try:
+        header = json.loads(bytes(mv[_PREFIX.size:start]))
+        n, n_str, sections = header["rows"], header["strings"], header["sections"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise SnapshotError(f"bad header: {e}") from e
+    if header.get("columns") != list(_COLUMNS):
+        raise SnapshotError("column layout changed")
+
+    payload = mv[start:]
+    if zlib.crc32(payload) != header.get("crc32"):
+        raise SnapshotError("checksum mismatch")
+
+    if sources is not None:
+        _check_sources(header.get("sources") or {}, sources)
+
+    def sec(name: str, itemsize: int, count: int) -> memoryview:
+        try:
+            off, length = sections[name]
+        except (KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"missing section {name}") from e
+        if length != itemsize * count or off < 0 or off + length > len(payload):
+            raise SnapshotError(f"bad section {name}")
+        return payload[off:off + length]
+
+    str_offsets = _u32(sec("str_offsets", 4, n_str + 1))
+    blob_len = sections.get("str_blob", [0, -1])[1]
+    blob = sec("str_blob", 1, blob_len)
+    if str_offsets[-1] != blob_len or any(a > b for a, b in zip(str_offsets, str_offsets[1:])):
+        raise SnapshotError("bad string table")
+    try:
+        strings = [str(blob[a:b], "utf-8") for a, b in zip(str_offsets, str_offsets[1:])]
+    except UnicodeDecodeError as e:
+        raise SnapshotError(f"bad string table: {e}") from e
+    strings.append(_MISSING)  # NONE 之外的編號都要在範圍內，先換成 index -1 對到 _MISSING
+
+    def strcol(name: str) -> List[int]:
+        ids = _u32(sec(name, 4, n))
+        for i, x in enumerate(ids):
+            if x == NONE:
+                ids[i] = -1
+            elif x >= n_str:
+                raise SnapshotError(f"string id out of range in {name}")
+        return ids
+
+    cols = {f: strcol(f"col_{f}") for f in _COLUMNS}
+    extra_ids = strcol("extra")
+    flags = bytes(sec("flags", 1, n))
+    lat, lng = _f64(sec("lat", 8, n)), _f64(sec("lng", 8, n))
+    tag_offsets = _u32(sec("tag_offsets", 4, n + 1))
+    tag_ids = _u32(sec("tag_ids", 4, tag_offsets[-1] if tag_offsets else 0))
+    if tag_offsets[0] != 0 or any(a > b for a, b in zip(tag_offsets, tag_offsets[1:])) \
+            or any(x >= n_str for x in tag_ids):
+        raise SnapshotError("bad tag table")
+
+    vocab = TagVocab()
+    rows = []
+    text_cols = [(f, cols[f]) for f in _TEXT_FIELDS]
+    pid_col, cat_col = cols["place_id"], cols["category"]
+    for i in range(n):
+        fields = {f: strings[c[i]] for f, c in text_cols}
+        extra: Dict[str, Any] = {}
+        if pid_col[i] >= 0:
+            extra["place_id"] = strings[pid_col[i]]
+        if extra_ids[i] >= 0:
+            for k, v in json.loads(strings[extra_ids[i]]).items():
+                (fields if k in fields else extra)[k] = v
+
+        fl = flags[i]
+        geo: Any = _MISSING
+        if fl & _HAS_GEO:
+            la, ln = lat[i], lng[i]
+            la = None if la != la else la  # NaN → None
+            ln = None if ln != ln else ln
+            geo = _NO_GEO if la is None and ln is None else (la, ln)
+        tags = order = None
+        if fl & _HAS_TAGS:
+            tags, order = vocab.encode_ordered(strings[t] for t in tag_ids[tag_offsets[i]:tag_offsets[i + 1]])
+
+        # _MISSING 的欄位在 PlaceRecord 裡維持「不存在」
+        rows.append(PlaceRecord(vocab, geo=geo, tags=tags, tag_order=order, extra=extra, **fields))
+
+    categories = [strings[c] if c >= 0 else "landmark" for c in cat_col]
+    return Snapshot(tuple(rows), categories, vocab, header)
+
+
+# ---------- 建置 CLI ----------
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    from app.config.settings import settings
+    from app.services.places import PlaceStore
+
+    ap = argparse.ArgumentParser(description="compile app/data into a binary place snapshot")
+    ap.add_argument("-o", "--output", type=Path, default=settings.snapshot_path)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    files = list(settings.iter_place_files())
+    store = PlaceStore(settings.load_places())   # 與 JSON 退路同一份資料（CSV 重複列以 JSON 為準）
+    size = write_snapshot(args.output, store.rows, store.index.categories, files)
+    print(f"wrote {args.output} rows={len(store)} bytes={size} "
+          f"sources={[p.name for p in files]} in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,36 +1,247 @@
-import json
-from functools import lru_cache
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
+from app.config.settings import settings
 from app.utils.category import to_category
+from app.utils.links import is_canonical_gmaps, normalize_existing_gmaps
+from app.services.place_record import PlaceRecord, TagVocab
+from app.services.place_snapshot import SnapshotError, read_snapshot
 
-@lru_cache
-def load_places():
-    paths = [
-        "app/data/taipei.json",
-        "app/data/newtaipei.json",
-        "app/data/taichung.json",
-        "app/data/kaohsiung.json",
-    ]
-    rows = []
-    for p in paths:
+log = logging.getLogger(__name__)
+
+
+# 每建一次索引就遞增，給下游快取（Flex 等）判斷資料是否換過
+_VERSIONS = itertools.count(1)
+
+
+class PlaceIndex:
+    """
+    載入時一次建好的查詢索引，避免每次請求都掃全部資料。
+    - 每筆資料的類別（to_category）只算一次；快照載入時直接用預先算好的 categories
+    - 依 city / (city, district) / (city, district, category) 分桶，桶內保持原始順序
+    """
+
+    def __init__(self, rows, categories=None):
+        self.rows = rows
+        self.version = next(_VERSIONS)
+        self.categories: list[str] = []
+        by_city: dict[str, list] = defaultdict(list)
+        by_district: dict[tuple, list] = defaultdict(list)
+        by_category: dict[tuple, list] = defaultdict(list)
+
+        for i, x in enumerate(rows):
+            cat = categories[i] if categories is not None else to_category(x)
+            self.categories.append(cat)
+            city, district = x.get("city"), x.get("district")
+            by_city[city].append(x)
+            by_district[(city, district)].append(x)
+            by_category[(city, district, cat)].append(x)
+
+        # (city, district) → 已排序的類別清單
+        cats: dict[tuple, set] = defaultdict(set)
+        for city, district, cat in by_category:
+            cats[(city, district)].add(cat)
+        self.district_categories = {k: tuple(sorted(v)) for k, v in cats.items()}
+
+        # 桶一律轉成 tuple（唯讀），查不到時也不會默默長出空桶
+        self.by_city = {k: tuple(v) for k, v in by_city.items()}
+        self.by_district = {k: tuple(v) for k, v in by_district.items()}
+        self.by_category = {k: tuple(v) for k, v in by_category.items()}
+
+    def bucket(self, city: str, district: str, category: str | None = None) -> tuple:
+        if category:
+            return self.by_category.get((city, district, category), ())
+        return self.by_district.get((city, district), ())
+
+    def categories_of(self, city: str, district: str) -> tuple:
+        return self.district_categories.get((city, district), ())
+
+
+def _to_float(v):
+    try:
+        if v is None:
+            return None
+        s = str(v).strip()
+        return float(s) if s else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _freeze(p: dict, vocab: TagVocab) -> PlaceRecord:
+    """轉成唯讀的精簡紀錄（字串 intern、tags 存 bitmask）。
+
+    place_prep 處理過的資料 gmaps 已是正式連結，這裡只剩字首比對；
+    沒處理過的舊資料才在載入時正規化一次。
+    """
+    if is_canonical_gmaps(p.get("gmaps")):
+        return PlaceRecord.from_dict(p, vocab)
+    g = p.get("geo") or {}
+    row = dict(p)
+    row["gmaps"] = normalize_existing_gmaps(
+        p.get("gmaps"),
+        name=p.get("name"),
+        lat=_to_float(g.get("lat")),
+        lng=_to_float(g.get("lng")),
+        place_id=p.get("place_id"),
+    )
+    return PlaceRecord.from_dict(row, vocab)
+
+
+class PlaceStore:
+    """
+    全站唯一的景點資料來源：載入一次，之後只提供唯讀 view 與索引。
+    main / replies / today_recommend / API router 都從這裡拿資料，每個 worker 只有一份。
+
+    熱更新時整個 store 換成新的一份（swap_store），舊 store 不會被改動；
+    一個請求在開頭取一次 get_store()，處理途中就一直看到同一版資料。
+    """
+
+    def __init__(self, raw_rows: list[dict], sources: Optional[list[str]] = None):
+        t0 = time.perf_counter()
+        vocab = TagVocab()
+        self._setup(tuple(_freeze(p, vocab) for p in raw_rows), vocab, sources, t0)
+
+    def _setup(self, rows: tuple, vocab: TagVocab, sources: Optional[list[str]], t0: float,
+               categories: Optional[list[str]] = None, origin: str = "json"):
+        self.tag_vocab = vocab
+        self.rows = rows
+        self.sources = sources or []
+        self.origin = origin
+        self.index = PlaceIndex(self.rows, categories)
+
+        by_name: dict[str, PlaceRecord] = {}
+        for p in self.rows:
+            name = (p.get("name") or p.get("title") or "").strip()
+            if name:
+                by_name.setdefault(name, p)
+        self.by_name = MappingProxyType(by_name)
+        self._derived: dict[str, Any] = {}
+        self._derived_lock = threading.RLock()  # 衍生物可以依賴別的衍生物（巢狀 derived）
+        self.load_ms = (time.perf_counter() - t0) * 1000
+
+    @classmethod
+    def from_snapshot(cls, path, sources=None) -> "PlaceStore":
+        """從二進位快照載入：gmaps 已正規化、類別已算好，只剩組紀錄與分桶。"""
+        t0 = time.perf_counter()
+        snap = read_snapshot(path, sources=sources)
+        store = cls.__new__(cls)
+        store._setup(snap.rows, snap.tag_vocab, [str(path)], t0,
+                     categories=snap.categories, origin="snapshot")
+        return store
+
+    @classmethod
+    def from_settings(cls) -> "PlaceStore":
+        # 有快照且驗證通過就用快照；缺檔、損毀或來源檔有增減 / 改過則退回逐檔讀 JSON / CSV
+        snap = settings.snapshot_path
+        files = list(settings.iter_place_files())
+        if snap and snap.is_file() and not (settings.places_path and settings.places_path.is_file()):
+            try:
+                return cls.from_snapshot(snap, sources=files)
+            except SnapshotError as e:
+                log.warning("[places] snapshot %s unusable (%s), falling back to JSON", snap, e)
+        return cls(settings.load_places(), sources=[str(p) for p in files])
+
+    @property
+    def version(self) -> int:
+        return self.index.version
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @cached_property
+    def by_category(self) -> Mapping[str, tuple]:
+        """全域的 類別 → 資料（不分城市）。"""
+        out: dict[str, list] = defaultdict(list)
+        for p, cat in zip(self.rows, self.index.categories):
+            out[cat].append(p)
+        return MappingProxyType({k: tuple(v) for k, v in out.items()})
+
+    @cached_property
+    def geo_index(self):
+        from app.services.geo_index import GeoIndex
+        return GeoIndex(self.rows)
+
+    @cached_property
+    def geo_store(self):
+        from app.services.geo_store import GeoStore
+        return GeoStore(self.rows)
+
+    def derived(self, key: str, build: Callable[["PlaceStore"], Any]) -> Any:
+        """
+        依這份資料算出來的衍生物（路由表、搜尋索引、推薦特徵表…）掛在 store 上：
+        資料換版就是換 store，衍生物自然跟著失效，不需要另外比對版本。
+        """
         try:
-            with open(p, "r", encoding="utf-8") as f:
-                chunk = json.load(f)
-                if isinstance(chunk, list):
-                    rows.extend(chunk)
-        except FileNotFoundError:
+            return self._derived[key]
+        except KeyError:
             pass
-    return rows
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+    def warm(self) -> "PlaceStore":
+        """換版前在背景先把 lazy 的索引與已註冊的衍生物建好，請求路徑上不必現算。"""
+        for name in ("by_category", "geo_index", "geo_store"):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                log.warning("[places] warm %s failed: %s", name, e)
+        for fn in _WARMERS:
+            try:
+                fn(self)
+            except Exception as e:
+                log.warning("[places] warmer %s failed: %s", getattr(fn, "__name__", fn), e)
+        return self
+
+    def stats(self) -> dict:
+        return {"size": len(self.rows), "version": self.version, "tags": len(self.tag_vocab),
+                "load_ms": round(self.load_ms, 1), "origin": self.origin, "sources": self.sources}
+
+
+_STORE: Optional[PlaceStore] = None
+_STORE_INIT = threading.Lock()
+_WARMERS: list[Callable[[PlaceStore], Any]] = []
+
+
+def get_store() -> PlaceStore:
+    store = _STORE
+    if store is None:
+        with _STORE_INIT:
+            if _STORE is None:
+                swap_store(PlaceStore.from_settings())
+            store = _STORE
+    return store
+
+def swap_store(store: PlaceStore) -> Optional[PlaceStore]:
+    """換上新版資料（單一參考指派）；回傳舊版。已在處理中的請求仍握著舊版。"""
+    global _STORE
+    old, _STORE = _STORE, store
+    return old
+
+def register_warmer(fn: Callable[[PlaceStore], Any]) -> Callable[[PlaceStore], Any]:
+    """登記換版前要先建好的衍生物（通常是 store.derived(...) 的包裝）。"""
+    _WARMERS.append(fn)
+    return fn
+
+def load_places() -> tuple:
+    return get_store().rows
+
+def get_index() -> PlaceIndex:
+    return get_store().index
 
 def get_categories_by_district(city: str, district: str) -> list[str]:
-    cats = {to_category(x) for x in load_places()
-            if x.get("city")==city and x.get("district")==district}
-    return sorted(cats)
-
-def filter_places(city: str, district: str, category: str|None, page:int=1, page_size:int=6):
-    data = [x for x in load_places() if x.get("city")==city and x.get("district")==district]
-    if category:
-        data = [x for x in data if to_category(x)==category]
+    return list(get_index().categories_of(city, district))
+
+def filter_places(city: str, district: str, category: str|None, page:int=1, page_size:int=6,
+                  store: Optional[PlaceStore] = None):
+    data = (store or get_store()).index.bucket(city, district, category)
     total = len(data)
     start = (page-1)*page_size
     end = start + page_size
-    return {"items": data[start:end], "total": total, "page": page, "has_next": end < total}
+    return {"items": list(data[start:end]), "total": total, "page": page, "has_next": end < total}
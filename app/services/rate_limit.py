@@ -0,0 +1,163 @@
+# app/services/rate_limit.py
+"""
+AI 生成與 LINE push 前面的限流：每種模式（ai / summary / translate / rewrite / fallback / push）
+各有「每位使用者」與「全站」兩個 token bucket，兩個都有 token 才放行（兩個一起扣）。
+
+- bucket 是 [剩餘 token, 上次補充時間] 的 list，取用時才依經過時間補充；不開 thread、不上鎖：
+  所有呼叫都在 event loop 上、中間沒有 await，讀-改-寫不會被其他 coroutine 插隊
+- 被拒絕時立刻回傳是哪一層擋下，不排隊；呼叫端回罐頭訊息或快取的舊答案
+- 使用者 bucket 達到 max_users 時，先丟掉已補滿的（補滿 = 跟沒記錄一樣）；還是太多就從最久沒用的丟起，
+  一次留一成空間，不會每來一位新使用者就整個掃一遍
+- stats()：各模式的放行 / 拒絕次數（分 user / global）、全站 bucket 的填充率、
+  追蹤中的使用者數與目前被擋住（不到 1 個 token）的人數
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from app.config.settings import settings
+
+log = logging.getLogger(__name__)
+
+MODES = ("ai", "summary", "translate", "rewrite", "fallback", "push")
+
+# 被擋時的罐頭回覆
+LIMITED_USER = "你問得有點快，休息一下再問我吧～"
+LIMITED_GLOBAL = "目前使用的人太多，AI 暫時忙不過來，請稍後再試 🙏"
+
+
+class Limit(NamedTuple):
+    user_per_min: float
+    user_burst: int
+    global_per_min: float
+    global_burst: int
+
+
+class _Refill:
+    """補充規則（每秒幾個、上限幾個）；bucket 本身只是 [token, 時間] 的 list。"""
+
+    def __init__(self, per_min: float, burst: int):
+        self.rate = per_min / 60.0
+        self.burst = float(burst)
+
+    def level(self, b: List[float], now: float) -> float:
+        return min(self.burst, b[0] + (now - b[1]) * self.rate)
+
+
+class ModeLimiter:
+    def __init__(self, limit: Limit, max_users: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.max_users = max_users
+        self.clock = clock
+        self._user = _Refill(limit.user_per_min, limit.user_burst)
+        self._global = _Refill(limit.global_per_min, limit.global_burst)
+        self._g: List[float] = [float(limit.global_burst), clock()]
+        self._users: "OrderedDict[str, List[float]]" = OrderedDict()  # 最久沒用的在前面
+        self.allowed = 0
+        self.rejected_user = 0
+        self.rejected_global = 0
+
+    def check(self, user_id: Optional[str], now: float) -> Optional[str]:
+        """不扣 token，只看夠不夠；不夠回 "user" / "global"（被擋也算最近用過，不會先被淘汰）。"""
+        b = self._users.get(user_id) if user_id else None
+        if b is not None and self._user.level(b, now) < 1.0:
+            self._users.move_to_end(user_id)
+            return "user"
+        if self._global.level(self._g, now) < 1.0:
+            return "global"
+        return None
+
+    def consume(self, user_id: Optional[str], now: float) -> None:
+        self._g[0], self._g[1] = self._global.level(self._g, now) - 1.0, now
+        if user_id:
+            b = self._users.get(user_id)
+            if b is None:
+                if len(self._users) >= self.max_users:
+                    self._prune(now)
+                self._users[user_id] = [self._user.burst - 1.0, now]
+            else:
+                b[0], b[1] = self._user.level(b, now) - 1.0, now
+                self._users.move_to_end(user_id)
+        self.allowed += 1
+
+    def reject(self, scope: str) -> None:
+        if scope == "user":
+            self.rejected_user += 1
+        else:
+            self.rejected_global += 1
+
+    def _prune(self, now: float) -> None:
+        users, full = self._users, self._user.burst
+        for u in [u for u, b in users.items() if self._user.level(b, now) >= full]:
+            del users[u]
+        target = self.max_users - max(1, self.max_users // 10)
+        while len(users) > target:
+            users.popitem(last=False)
+
+    def stats(self) -> dict:
+        now = self.clock()
+        g = self._global
+        return {"allowed": self.allowed, "rejected_user": self.rejected_user,
+                "rejected_global": self.rejected_global,
+                "global_fill": round(g.level(self._g, now) / g.burst, 3) if g.burst else 0.0,
+                "users": len(self._users),
+                "users_limited": sum(1 for b in self._users.values() if self._user.level(b, now) < 1.0)}
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Limit], max_users: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.modes = {m: ModeLimiter(lim, max_users, clock) for m, lim in limits.items()}
+
+    def allow(self, user_id: Optional[str], *modes: str) -> Optional[str]:
+        """
+        所有 modes 的 user 與 global bucket 都有 token 才放行並一起扣；回傳 None 代表放行，
+        否則回傳被哪一層擋下（"user" / "global"），不扣任何 token。沒設定的模式不限。
+        """
+        now = self.clock()
+        limiters = [self.modes[m] for m in modes if m in self.modes]
+        for lim in limiters:
+            scope = lim.check(user_id, now)
+            if scope:
+                lim.reject(scope)
+                return scope
+        for lim in limiters:
+            lim.consume(user_id, now)
+        return None
+
+    def stats(self) -> dict:
+        return {m: lim.stats() for m, lim in self.modes.items()}
+
+
+def limited_reply(scope: str) -> str:
+    return LIMITED_USER if scope == "user" else LIMITED_GLOBAL
+
+
+def parse_limits(raw: Optional[str], default: Limit) -> Dict[str, Limit]:
+    """
+    AI_RATE_LIMITS（JSON）可個別覆寫模式：{"ai": [每人每分鐘, 每人突發, 全站每分鐘, 全站突發], ...}；
+    沒列到的模式用預設值，格式錯誤就整份用預設值。
+    """
+    limits = {m: default for m in MODES}
+    if not raw:
+        return limits
+    try:
+        for mode, vals in json.loads(raw).items():
+            limits[mode] = Limit(float(vals[0]), int(vals[1]), float(vals[2]), int(vals[3]))
+    except (ValueError, TypeError, IndexError, AttributeError) as e:
+        log.error("AI_RATE_LIMITS 格式錯誤（%s），改用預設值", e)
+        return {m: default for m in MODES}
+    return limits
+
+
+LIMITER = RateLimiter(
+    parse_limits(settings.ai_rate_limits,
+                 Limit(settings.ai_rate_user_per_min, settings.ai_rate_user_burst,
+                       settings.ai_rate_global_per_min, settings.ai_rate_global_burst)),
+    max_users=settings.ai_rate_max_users,
+)
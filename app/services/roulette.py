@@ -1,6 +1,6 @@
 from __future__ import annotations
 import random
-from typing import Dict, Any
+from typing import Dict, Any, Sequence
 
 # 可日後改成從 DB/設定檔載入
 FOOD_TYPES = [
@@ -9,9 +9,11 @@ FOOD_TYPES = [
     "滷肉飯 🍚", "漢堡 🍔", "咖哩 🍛", "沙拉 🥗",
 ]
 
-def spin_food_roulette(city: str = "台北", district: str = "信義區") -> Dict[str, str]:
-    """回傳本次抽到的餐點類型與 Google 地圖搜尋連結"""
-    choice = random.choice(FOOD_TYPES)
+def spin_food_roulette(city: str = "台北", district: str = "信義區",
+                       recent: Sequence[str] = ()) -> Dict[str, str]:
+    """回傳本次抽到的餐點類型與 Google 地圖搜尋連結；recent（這位使用者最近抽到的）不會再抽到，除非全都抽過了"""
+    pool = [f for f in FOOD_TYPES if f not in recent] if recent else FOOD_TYPES
+    choice = random.choice(pool or FOOD_TYPES)
     # 取去掉 emoji 的關鍵詞（以空格分隔，第一段是文字）
     keyword = choice.split()[0]
     gmaps = f"https://www.google.com/maps/search/{district}+{keyword}"
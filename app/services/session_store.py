@@ -0,0 +1,170 @@
+# app/services/session_store.py
+"""
+每位使用者（LINE userId，取自事件的 source）的短期狀態：最近推薦過什麼、上次看的城市 / 行政區、分頁游標。
+
+- 預設 in-process：OrderedDict 做 LRU，上限 max_users；每次讀寫都把期限往後推 ttl 秒（滑動過期），
+  過期的 session 在讀到時丟掉，LRU 頭端過期的順手清掉；所有操作 O(1)
+- Session 用 __slots__，最近清單是 tuple（每種最多 RECENT_MAX 筆），景點名稱與資料列共用同一個字串物件
+- 設定 SESSION_REDIS_URL 時改用 Redis 共用（多個 instance 看到同一份；需要安裝 redis 套件，沒裝就退回 in-process）
+- 後端出錯只記 log，當作沒有 session（推薦照常，只是可能重複）
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config.settings import settings
+
+log = logging.getLogger(__name__)
+
+RECENT_MAX = 5
+
+
+class Session:
+    __slots__ = ("city", "district", "cursor", "recent", "expires")
+
+    def __init__(self, city: Optional[str] = None, district: Optional[str] = None,
+                 cursor: Optional[Tuple[str, int]] = None, recent: Optional[Dict[str, Tuple[str, ...]]] = None):
+        self.city = city
+        self.district = district
+        self.cursor = cursor  # (類別, 頁碼)：最近一次看的清單
+        self.recent = recent  # 種類（today / food …）→ 名稱，新的在後；用到才建
+        self.expires = 0.0
+
+    def recent_of(self, kind: str) -> Tuple[str, ...]:
+        return self.recent.get(kind, ()) if self.recent else ()
+
+    def remember(self, kind: str, name: str, keep: int = RECENT_MAX) -> None:
+        if self.recent is None:
+            self.recent = {}
+        old = self.recent.get(kind, ())
+        if name in old:
+            old = tuple(x for x in old if x != name)
+        self.recent[kind] = (old + (name,))[-keep:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"city": self.city, "district": self.district,
+                "cursor": list(self.cursor) if self.cursor else None,
+                "recent": {k: list(v) for k, v in (self.recent or {}).items()}}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Session":
+        cursor = d.get("cursor")
+        return cls(d.get("city"), d.get("district"), (cursor[0], int(cursor[1])) if cursor else None,
+                   {k: tuple(v) for k, v in (d.get("recent") or {}).items()} or None)
+
+
+class MemoryBackend:
+    def __init__(self, max_users: int = 100_000):
+        self.max_users = max_users
+        self._data: "OrderedDict[str, Session]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    async def get(self, user_id: str) -> Optional[Session]:
+        s = self._data.get(user_id)
+        if s is None:
+            return None
+        if s.expires < time.monotonic():
+            del self._data[user_id]
+            self.expired += 1
+            return None
+        self._data.move_to_end(user_id)
+        return s
+
+    async def set(self, user_id: str, session: Session, ttl: float) -> None:
+        now = time.monotonic()
+        session.expires = now + ttl
+        self._data[user_id] = session
+        self._data.move_to_end(user_id)
+        # 頭端是最久沒動的：過期的先清（最多幾筆，維持 O(1)），再依上限淘汰
+        for _ in range(2):
+            if not self._data:
+                break
+            head = next(iter(self._data.values()))
+            if head.expires >= now:
+                break
+            self._data.popitem(last=False)
+            self.expired += 1
+        while len(self._data) > self.max_users:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def size(self) -> Optional[int]:
+        return len(self._data)
+
+
+class RedisBackend:
+    """多個 instance 共用；每位使用者一個 JSON 字串，過期交給 Redis 的 EX。"""
+
+    def __init__(self, url: str, prefix: str = "sess:"):
+        import redis.asyncio as redis  # 可選依賴
+        self._r = redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self.expired = 0
+        self.evicted = 0
+
+    async def get(self, user_id: str) -> Optional[Session]:
+        raw = await self._r.get(self._prefix + user_id)
+        return Session.from_dict(json.loads(raw)) if raw else None
+
+    async def set(self, user_id: str, session: Session, ttl: float) -> None:
+        await self._r.set(self._prefix + user_id, json.dumps(session.to_dict(), ensure_ascii=False),
+                          ex=max(1, int(ttl)))
+
+    def size(self) -> Optional[int]:
+        return None  # 不追蹤遠端大小
+
+
+class SessionStore:
+    def __init__(self, backend=None, ttl: float = 6 * 3600.0):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get(self, user_id: Optional[str]) -> Session:
+        """沒有（或沒有 userId、後端出錯）就回一個空的 Session；改完要 save() 才會留下來。"""
+        if not user_id:
+            return Session()
+        try:
+            s = await self.backend.get(user_id)
+        except Exception as e:
+            self.errors += 1
+            log.warning("[session] backend get failed: %s", e)
+            return Session()
+        if s is None:
+            self.misses += 1
+            return Session()
+        self.hits += 1
+        return s
+
+    async def save(self, user_id: Optional[str], session: Session) -> None:
+        if not user_id:
+            return
+        try:
+            await self.backend.set(user_id, session, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            log.warning("[session] backend set failed: %s", e)
+
+    def stats(self) -> dict:
+        b = self.backend
+        return {"backend": type(b).__name__, "size": b.size(), "hits": self.hits, "misses": self.misses,
+                "expired": b.expired, "evicted": b.evicted, "errors": self.errors}
+
+
+def build_sessions(redis_url: Optional[str], max_users: int, ttl: float) -> SessionStore:
+    if redis_url:
+        try:
+            return SessionStore(RedisBackend(redis_url), ttl=ttl)
+        except ImportError:
+            log.error("SESSION_REDIS_URL 已設定但未安裝 redis 套件，改用 in-process session")
+    return SessionStore(MemoryBackend(max_users), ttl=ttl)
+
+
+SESSIONS = build_sessions(settings.session_redis_url, settings.session_max_users, settings.session_ttl)
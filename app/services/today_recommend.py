@@ -1,22 +1,26 @@
 from __future__ import annotations
-import random
-from typing import Dict, Any, List, Optional, Tuple
-from app.services.places import filter_places  # 你現有的過濾函式
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Sequence
+from app.services.places import get_store
+from recommend.engine import RecQuery, get_engine
+
+# 「今日推薦」依 softmax(分數 / 溫度) 抽樣：分數差 1.2（最熱門且營業中 vs 最冷門且沒開）
+# 機率約差 11 倍，整體仍接近均勻，不會老是同幾個熱門景點
+TODAY_TEMPERATURE = 0.5
 
 def pick_today_place(
     city: Optional[str] = None,
     district: Optional[str] = None,
     category: Optional[str] = None,
     limit: int = 1,
+    seen: Sequence[str] = (),
+    now: Optional[datetime] = None,
 ) -> List[Dict[str, Any]]:
     """
-    從既有資料挑出今日推薦景點，預設隨機 1 筆。
-    注意：不要把 limit 傳給 filter_places（它沒有這參數）。
+    從既有資料挑出今日推薦景點，預設 1 筆。
+    交給推薦引擎：候選取預先分好的桶，依 popularity / 營業中的分數帶溫度抽樣，
+    seen（最近推薦過的名稱）排到最後，候選全看過才會重複；只選 limit 筆，不排序整個候選。
     """
-    # 若 filter_places 回傳 generator，先轉成 list；若回傳 list，這行也 OK
-    candidates = list(filter_places(city=city, district=district, category=category))
-    if not candidates:
-        return []
-
-    random.shuffle(candidates)
-    return candidates[: max(1, limit)]
+    q = RecQuery(city=city, district=district, category=category, seen=tuple(seen),
+                 k=max(1, limit), temperature=TODAY_TEMPERATURE)
+    return [r.place for r in get_engine(get_store()).recommend(q, now)]
@@ -4,6 +4,7 @@ from urllib.parse import urlparse, parse_qs, quote_plus
 from typing import Optional
 
 GOOGLE_MAPS_HOSTS = {"www.google.com", "google.com"}
+CANONICAL_GMAPS_PREFIXES = tuple(f"https://{h}/maps" for h in GOOGLE_MAPS_HOSTS)
 SHORTENER_HOSTS = {
     "maps.app.goo.gl", "goo.gl", "g.page", "g.co"
 }
@@ -37,6 +38,24 @@ def build_gmaps_url(name: Optional[str] = None,
     # 實在沒資料就給 Maps 首頁，至少不會炸
     return "https://www.google.com/maps"
 
+def is_canonical_gmaps(url: Optional[str]) -> bool:
+    """已是 https 的 google.com/maps 連結（normalize_existing_gmaps 會原樣回傳），不必再 urlparse。"""
+    return bool(url) and url.startswith(CANONICAL_GMAPS_PREFIXES)
+
+def https_image_url(url: Optional[str]) -> Optional[str]:
+    """LINE 只收 https 圖片：http 升級成 https；空值或不是絕對網址回 None（交給呼叫端用備援圖）。"""
+    url = (url or "").strip()
+    if url.startswith("http://"):
+        url = "https://" + url[len("http://"):]
+    if not url.startswith("https://"):
+        return None
+    try:
+        if not urlparse(url).netloc:
+            return None
+    except ValueError:
+        return None
+    return url
+
 def normalize_existing_gmaps(orig_url: Optional[str],
                              name: Optional[str],
                              lat: Optional[float],
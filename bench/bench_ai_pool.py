@@ -0,0 +1,93 @@
+# bench/bench_ai_pool.py
+"""
+Gemini 呼叫負載測試（假模型，不打網路）：
+  old = 每次 new GenerativeModel + asyncio.to_thread（預設 executor）
+  new = ModelPool（模型只建一次、專用 executor + semaphore）
+
+同時量測 AI 爆量期間、走預設 executor 的一般工作（模擬回覆流量）延遲。
+
+    python -m bench.bench_ai_pool
+    python -m bench.bench_ai_pool 0.05 1 8 32 128   # 假模型延遲(秒) 與 並發數
+"""
+from __future__ import annotations
+import asyncio
+import statistics
+import sys
+import threading
+import time
+
+from app.services.model_pool import ModelPool
+
+SETUP_S = 0.002  # 假模型建構成本（設定、驗證、client 初始化）
+
+
+class FakeModel:
+    def __init__(self, latency: float):
+        time.sleep(SETUP_S)
+        self.latency = latency
+
+    def generate_content(self, prompt: str):
+        time.sleep(self.latency)  # 阻塞式 HTTP 呼叫
+        return prompt
+
+
+def _pcts(xs):
+    xs = sorted(xs)
+    return statistics.median(xs), xs[min(len(xs) - 1, int(len(xs) * 0.99))]
+
+
+async def _reply_probe(stop: asyncio.Event, out: list):
+    """模擬回覆流量：每 5ms 丟一個很小的工作到預設 executor。"""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.to_thread(lambda: None)
+        out.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(0.005)
+
+
+async def run_old(latency: float, n: int):
+    async def one():
+        t0 = time.perf_counter()
+        model = FakeModel(latency)
+        await asyncio.to_thread(model.generate_content, "hi")
+        return (time.perf_counter() - t0) * 1000
+    return await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def run_new(pool: ModelPool, n: int):
+    async def one():
+        t0 = time.perf_counter()
+        await pool.run(pool.model(None).generate_content, "hi")
+        return (time.perf_counter() - t0) * 1000
+    return await asyncio.gather(*(one() for _ in range(n)))
+
+
+async def measure(label: str, coro_factory):
+    stop, probe = asyncio.Event(), []
+    prober = asyncio.create_task(_reply_probe(stop, probe))
+    threads0 = threading.active_count()
+    lat = await coro_factory()
+    threads = threading.active_count() - threads0
+    stop.set()
+    await prober
+    p50, p99 = _pcts(lat)
+    r50, r99 = _pcts(probe) if probe else (0, 0)
+    print(f"  {label:<4} ai p50={p50:8.1f}ms p99={p99:8.1f}ms | reply-probe p50={r50:6.2f}ms p99={r99:7.2f}ms | +threads={threads}")
+
+
+async def main(latency: float, levels):
+    for c in levels:
+        print(f"concurrency={c}")
+        await measure("old", lambda: run_old(latency, c))
+        pool = ModelPool(lambda system: FakeModel(latency), concurrency=8, max_waiting=10_000, name="bench")
+        await measure("new", lambda: run_new(pool, c))
+        s = pool.stats()
+        print(f"       queue p50={s['queue_ms_p50']}ms p99={s['queue_ms_p99']}ms models={s['models']}")
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    latency = float(args[0]) if args else 0.05
+    levels = [int(a) for a in args[1:]] or [1, 8, 32, 128]
+    asyncio.run(main(latency, levels))
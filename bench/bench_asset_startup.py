@@ -0,0 +1,75 @@
+# bench/bench_asset_startup.py
+"""
+冷啟動 time-to-first-request：舊 lifespan（依序下載六張圖、每次刪掉重組網格）
+vs AssetPreparer（背景並行下載、generation / 內容 hash 跳過）。GCS 用 tests/gcs_stub 的本機假實作。
+
+    python -m bench.bench_asset_startup            # 每次下載 150 ms
+    python -m bench.bench_asset_startup 0.3        # 自訂下載延遲（秒）
+"""
+from __future__ import annotations
+import asyncio
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from app.services.asset_prep import AssetPreparer
+from app.services.image_compose import build_if_needed
+from tests.gcs_stub import FakeGCS
+
+FILES = [f"categories_1040_{i}.png" for i in range(6)]
+
+
+def tiles() -> dict:
+    out = {}
+    for i, fn in enumerate(FILES):
+        buf = BytesIO()
+        Image.new("RGB", (1040, 692), (40 * i, 120, 200 - 30 * i)).save(buf, format="PNG")
+        out[f"imagemeps/{fn}"] = buf.getvalue()
+    return out
+
+
+def old_lifespan(gcs: FakeGCS, local: Path):
+    """原本 lifespan 的步驟：全部在 yield 之前同步完成。"""
+    bucket = gcs.bucket("b")
+    local.mkdir(parents=True, exist_ok=True)
+    for fn in FILES:
+        bucket.get_blob(f"imagemeps/{fn}").download_to_filename(str(local / fn))
+    grid = local / "categories_1040_grid.png"
+    if grid.exists():
+        grid.unlink()
+    build_if_needed(output_path=str(grid), base_path=str(local), categories=FILES)
+    for s in (700, 460):
+        (local / f"categories_{s}.png").unlink(missing_ok=True)
+
+
+async def new_lifespan(gcs: FakeGCS, local: Path):
+    assets = AssetPreparer(str(local), FILES, bucket="b", prefix="imagemeps", client_factory=lambda: gcs)
+    t0 = time.perf_counter()
+    assets.start()
+    first_request = time.perf_counter() - t0   # lifespan 到 yield 就能接 webhook
+    await assets.stop()
+    return first_request, time.perf_counter() - t0, assets.stats()
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.15
+    objects = tiles()
+    print(f"download latency={latency * 1000:.0f} ms x {len(FILES)} tiles")
+    with tempfile.TemporaryDirectory() as tmp:
+        for boot in ("cold", "warm"):
+            gcs = FakeGCS(objects, latency=latency)
+            t0 = time.perf_counter()
+            old_lifespan(gcs, Path(tmp) / "old")
+            old = time.perf_counter() - t0
+            first, ready, st = asyncio.run(new_lifespan(FakeGCS(objects, latency=latency), Path(tmp) / "new"))
+            print(f"  {boot}: old first-request {old * 1000:7.1f} ms | "
+                  f"new first-request {first * 1000:6.1f} ms, assets ready {ready * 1000:7.1f} ms "
+                  f"(sync={st['sync']}, rebuilt={st['rebuilt']})")
+
+
+if __name__ == "__main__":
+    main()
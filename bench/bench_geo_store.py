@@ -0,0 +1,58 @@
+# bench/bench_geo_store.py
+"""
+GeoStore 向量化距離 vs 逐筆 haversine。
+
+    python -m bench.bench_geo_store              # 100k 景點、1000 位使用者
+    python -m bench.bench_geo_store 50000 200
+"""
+from __future__ import annotations
+import heapq
+import random
+import sys
+import time
+
+from app.services.geo_index import haversine
+from app.services.geo_store import GeoStore
+from bench.bench_location import synth_geo_places, LAT_RANGE, LNG_RANGE
+
+
+def main(n: int, users: int) -> None:
+    places = synth_geo_places(n)
+    # 約一成資料沒有座標，驗證遮罩
+    for p in places[::10]:
+        p["geo"] = {"lat": None, "lng": None}
+
+    t0 = time.perf_counter()
+    store = GeoStore(places)
+    print(f"n={n} valid={store.size} build={(time.perf_counter() - t0) * 1000:.1f}ms")
+
+    rnd = random.Random(7)
+    lats = [rnd.uniform(*LAT_RANGE) for _ in range(users)]
+    lngs = [rnd.uniform(*LNG_RANGE) for _ in range(users)]
+
+    def py_top(lat, lng, k):
+        cand = ((haversine(lat, lng, p["geo"]["lat"], p["geo"]["lng"]), i)
+                for i, p in enumerate(places) if p["geo"]["lat"] is not None)
+        return [i for _, i in heapq.nsmallest(k, cand)]
+
+    sample = min(users, 20)
+    t0 = time.perf_counter()
+    expect = [py_top(lats[i], lngs[i], 5) for i in range(sample)]
+    py_ms = (time.perf_counter() - t0) / sample * 1000
+
+    t0 = time.perf_counter()
+    got = store.rank_many(lats, lngs, k=5)
+    np_ms = (time.perf_counter() - t0) / users * 1000
+    assert got[:sample] == expect
+
+    print(f"top-5 per user   python={py_ms:8.3f}ms/user  numpy batch={np_ms:8.3f}ms/user  (x{py_ms / np_ms:,.0f})")
+
+    t0 = time.perf_counter()
+    for i in range(sample):
+        store.nearest_per_category(lats[i], lngs[i], n=3)
+    print(f"nearest 3 per category        {(time.perf_counter() - t0) / sample * 1000:8.3f}ms/query")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(args[0] if args else 100_000, args[1] if len(args) > 1 else 1000)
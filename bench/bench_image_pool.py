@@ -0,0 +1,57 @@
+# bench/bench_image_pool.py
+"""
+影像工作在背景跑的時候 webhook 的延遲：同一 process 的 thread（會搶 GIL）vs ImageWorkPool 的子 process。
+「webhook」是每 20 ms 一次、約 1 ms 的純 Python 工作，延遲從它該開始處理的時間算起。
+
+    python -m bench.bench_image_pool            # 背景工作 1500 ms
+    python -m bench.bench_image_pool 3000
+"""
+from __future__ import annotations
+import asyncio
+import sys
+import time
+
+from app.services.image_pool import ImageWorkPool
+
+
+def burn(ms: float) -> int:
+    """模擬 PIL 縮圖：純 CPU、整段握著 GIL。"""
+    end = time.perf_counter() + ms / 1000
+    n = 0
+    while time.perf_counter() < end:
+        n += sum(i * i for i in range(200))
+    return n
+
+
+def webhook_latency(pool: ImageWorkPool, work_ms: float) -> list:
+    async def main():
+        work = asyncio.create_task(pool.run("grid", burn, work_ms))
+        await asyncio.sleep(0.05)
+        lat = []
+        while not work.done():
+            # 從「請求應該開始處理的時間」算起：event loop 搶不到 GIL 的等待也算在內
+            t0 = time.perf_counter() + 0.02
+            await asyncio.sleep(0.02)
+            burn(1)
+            lat.append((time.perf_counter() - t0) * 1000)
+        await work
+        return sorted(lat)
+
+    return asyncio.run(main())
+
+
+def main(work_ms: float) -> None:
+    print(f"background work={work_ms:.0f}ms, webhook every 20ms (~1ms each)")
+    for label, workers in (("thread (same process)", 0), ("process pool", 1)):
+        pool = ImageWorkPool(workers=workers)
+        try:
+            pool.run_sync("warmup", burn, 1)  # 子 process 啟動時間不算進去
+            lat = webhook_latency(pool, work_ms)
+        finally:
+            pool.shutdown()
+        print(f"  {label:<22} n={len(lat):3d}  p50={lat[len(lat) // 2]:6.1f}ms  "
+              f"p95={lat[int(len(lat) * 0.95) - 1]:6.1f}ms  max={lat[-1]:6.1f}ms")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 1500)
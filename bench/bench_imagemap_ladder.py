@@ -0,0 +1,31 @@
+# bench/bench_imagemap_ladder.py
+"""
+imagemap 尺寸組：一次產生 1040/700/460/300/240，列出每個尺寸選到的編碼與相對未最佳化 PNG 省下的 bytes。
+
+    python -m bench.bench_imagemap_ladder                      # 用 repo 內的 app/static/imagemeps 網格
+    python -m bench.bench_imagemap_ladder path/to/grid.png
+"""
+from __future__ import annotations
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from app.services.image_compose import GRID_NAME, STATIC_IMAGEMAP_DIR, generate_derivatives
+
+
+def main():
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else STATIC_IMAGEMAP_DIR / GRID_NAME
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(src, Path(tmp) / GRID_NAME)
+        r = generate_derivatives(tmp, force=True)
+    print(f"source {src} ({r['ms']} ms)")
+    for size, info in sorted(r["sizes"].items(), reverse=True):
+        cands = ", ".join(f"{k}={v / 1024:.1f}K" for k, v in info["candidates"].items())
+        print(f"  {size:>5}: {info['format']:<4} {info['bytes'] / 1024:8.1f} KiB   [{cands}]")
+    print(f"  total {r['bytes'] / 1024:.1f} KiB vs plain PNG {r['baseline_bytes'] / 1024:.1f} KiB "
+          f"(saved {r['saved_bytes'] / 1024:.1f} KiB, {r['saved_bytes'] / r['baseline_bytes'] * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench/bench_imagemap_rps.py
+"""
+圖片 endpoint 每秒請求數：舊版（每次 PIL 開檔 → 轉 RGB → 重新編碼 PNG）
+vs EncodedImageCache（記憶體 bytes + ETag），以及帶 If-None-Match 的 304。
+
+    python -m bench.bench_imagemap_rps            # 每種 2000 次請求
+    python -m bench.bench_imagemap_rps 5000
+"""
+from __future__ import annotations
+import asyncio
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from PIL import Image
+
+from app.services.imagemap_cache import CACHE_IMMUTABLE, EncodedImageCache, etag_matches
+
+
+def build_app(path: Path) -> FastAPI:
+    app = FastAPI()
+    cache = EncodedImageCache(lambda size: str(path))
+
+    @app.get("/old/{size}")
+    def old(size: int):
+        im = Image.open(path)
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        buf = BytesIO()
+        im.save(buf, format="PNG")
+        return Response(buf.getvalue(), media_type="image/png", headers={"Cache-Control": "no-store"})
+
+    @app.get("/new/{size}")
+    def new(size: int, request: Request):
+        img = cache.get(size)
+        headers = {"ETag": img.etag, "Cache-Control": CACHE_IMMUTABLE}
+        if etag_matches(request.headers.get("if-none-match"), img.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(img.data, media_type="image/png", headers=headers)
+
+    return app
+
+
+async def rps(client: httpx.AsyncClient, url: str, n: int, headers=None, concurrency: int = 16) -> float:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            r = await client.get(url, headers=headers)
+            assert r.status_code in (200, 304)
+
+    await one()  # 暖機（新版第一次載入）
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return n / (time.perf_counter() - t0)
+
+
+async def main_async(n: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "categories_1040.png"
+        im = Image.effect_noise((1040, 1040), 64).convert("RGB")
+        im.save(path, format="PNG")
+        transport = httpx.ASGITransport(app=build_app(path))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            etag = (await client.get("/new/1040")).headers["etag"]
+            old = await rps(client, "/old/1040", max(50, n // 20))
+            new = await rps(client, "/new/1040", n)
+            nm = await rps(client, "/new/1040", n, headers={"If-None-Match": etag})
+        print(f"  png {path.stat().st_size / 1024:.0f} KiB")
+        print(f"  old  (PIL re-encode)  {old:9.1f} req/s")
+        print(f"  new  (cached bytes)   {new:9.1f} req/s   x{new / old:.0f}")
+        print(f"  new  (304)            {nm:9.1f} req/s   x{nm / old:.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,92 @@
+# bench/bench_location.py
+"""
+位置訊息延遲：舊版（每個 type 全掃 + haversine + 全排序）vs GeoIndex。
+
+    python -m bench.bench_location          # 100k 筆帶座標景點
+    python -m bench.bench_location 20000
+"""
+from __future__ import annotations
+import random
+import statistics
+import sys
+import time
+
+from app.services.geo_index import GeoIndex, haversine
+
+TYPES = ["walk", "cafe", "spot", "event", "nature", "food"]
+# 台灣本島大致範圍
+LAT_RANGE = (21.9, 25.3)
+LNG_RANGE = (120.0, 122.0)
+
+
+def synth_geo_places(n: int, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    return [{
+        "name": f"place-{i}",
+        "type": rnd.choice(TYPES),
+        "geo": {"lat": rnd.uniform(*LAT_RANGE), "lng": rnd.uniform(*LNG_RANGE)},
+        "gmaps": "https://www.google.com/maps",
+    } for i in range(n)]
+
+
+def old_pick(places, lat, lng):
+    def _dist_km(p):
+        g = p.get("geo") or {}
+        plat, plng = g.get("lat"), g.get("lng")
+        if plat is None or plng is None:
+            return None
+        return haversine(lat, lng, float(plat), float(plng))
+
+    def _top1_by_type(t):
+        cand = [p for p in places if p.get("type") == t]
+        cand = [(p, _dist_km(p)) for p in cand]
+        cand = [(p, d) for p, d in cand if d is not None]
+        cand.sort(key=lambda x: x[1])
+        return cand[0][0] if cand else None
+
+    return _top1_by_type("walk"), _top1_by_type("cafe"), _top1_by_type("spot") or _top1_by_type("event")
+
+
+def new_pick(idx: GeoIndex, lat, lng):
+    return (idx.nearest_one("walk", lat, lng), idx.nearest_one("cafe", lat, lng),
+            idx.nearest_one("spot", lat, lng) or idx.nearest_one("event", lat, lng))
+
+
+def _lat_ms(fn, queries):
+    out = []
+    for lat, lng in queries:
+        t0 = time.perf_counter()
+        fn(lat, lng)
+        out.append((time.perf_counter() - t0) * 1000)
+    out.sort()
+    return statistics.median(out), out[int(len(out) * 0.99) - 1]
+
+
+def main(n: int) -> None:
+    places = synth_geo_places(n)
+    t0 = time.perf_counter()
+    idx = GeoIndex(places)
+    print(f"n={n}  GeoIndex build={(time.perf_counter() - t0) * 1000:.1f}ms")
+
+    rnd = random.Random(7)
+    queries = [(rnd.uniform(*LAT_RANGE), rnd.uniform(*LNG_RANGE)) for _ in range(200)]
+    for lat, lng in queries[:20]:
+        assert old_pick(places, lat, lng) == new_pick(idx, lat, lng)
+
+    o50, o99 = _lat_ms(lambda a, b: old_pick(places, a, b), queries[:30])
+    n50, n99 = _lat_ms(lambda a, b: new_pick(idx, a, b), queries)
+    print(f"old  p50={o50:9.3f}ms p99={o99:9.3f}ms")
+    print(f"new  p50={n50:9.3f}ms p99={n99:9.3f}ms  (p50 x{o50 / n50:,.0f})")
+
+    t0 = time.perf_counter()
+    for lat, lng in queries:
+        idx.nearest("walk", lat, lng, k=10)
+    print(f"k=10 nearest        {(time.perf_counter() - t0) / len(queries) * 1000:.3f}ms/query")
+    t0 = time.perf_counter()
+    for lat, lng in queries:
+        idx.within("cafe", lat, lng, radius_km=3.0)
+    print(f"within 3km          {(time.perf_counter() - t0) / len(queries) * 1000:.3f}ms/query")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,87 @@
+# bench/bench_place_record.py
+"""
+常駐記憶體：list of dict（現行 JSON 載入後的樣子）vs PlaceRecord（__slots__ + intern + tag bitmask）。
+
+    python -m bench.bench_place_record            # 1M 筆
+    python -m bench.bench_place_record 200000     # 自訂筆數
+
+合成資料刻意讓重複字串（城市、營業時間…）各自是獨立物件，模擬 json.load 的結果。
+"""
+from __future__ import annotations
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from app.services.place_record import PlaceRecord, TagVocab
+from bench.bench_places import CITIES, TAGS, TYPES
+
+HOURS = ["依場館或店家為準", "24 小時", "09:00-17:00"]
+COSTS = ["依消費或免費", "免費", "需購票"]
+
+
+def _fresh(s: str) -> str:
+    """複製出一個內容相同、身分不同的字串（json.load 對值不會共用）。"""
+    return ("_" + s)[1:]
+
+
+def synth_dicts(n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    cities = list(CITIES)
+    rows = []
+    for i in range(n):
+        city = rnd.choice(cities)
+        has_geo = rnd.random() < 0.5
+        row = {
+            "name": f"place-{i}",
+            "type": _fresh(rnd.choice(TYPES)),
+            "city": _fresh(city),
+            "district": _fresh(rnd.choice(CITIES[city])),
+            "description": f"描述 {i}",
+            "tags": [_fresh(t) for t in rnd.sample(TAGS, 3)],
+            "hours": _fresh(rnd.choice(HOURS)),
+            "cost": _fresh(rnd.choice(COSTS)),
+            "geo": {"lat": 25.0 + rnd.random() if has_geo else None,
+                    "lng": 121.5 + rnd.random() if has_geo else None},
+            "gmaps": f"https://www.google.com/maps/search/?api=1&query=place-{i}",
+        }
+        if rnd.random() < 0.6:
+            row["image_url"] = f"https://img.example.com/{i}.jpg"
+        rows.append(row)
+    return rows
+
+
+def measure(label: str, build, extra=lambda keep: 0):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    keep = build()
+    ms = (time.perf_counter() - t0) * 1000
+    cur, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cur += extra(keep)
+    print(f"  {label:<24} {cur / 2**20:9.1f} MiB  {cur / len(keep):7.0f} B/place  {ms:9.0f} ms")
+    return keep, cur
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"rows={n}")
+    dicts, a = measure("list[dict]", lambda: synth_dicts(n))
+
+    # 轉換時沿用 dict 裡的 name/description/gmaps/image_url 字串物件（在 list[dict] 那次已量過），
+    # 把它們加回來才是「只留 PlaceRecord」時的常駐量
+    vocab = TagVocab()
+    recs, b = measure(
+        "PlaceRecord",
+        lambda: [PlaceRecord.from_dict(p, vocab) for p in dicts],
+        extra=lambda recs: sum(sys.getsizeof(r[k]) for r in recs
+                               for k in ("name", "description", "gmaps", "image_url") if k in r),
+    )
+    print(f"  saved {(a - b) / 2**20:.1f} MiB ({(1 - b / a) * 100:.1f}%)  tags vocab={len(vocab)}")
+    assert dict(recs[0])["tags"] == tuple(dicts[0]["tags"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# bench/bench_place_search.py
+"""
+景點搜尋：name / description / tags 逐筆子字串掃描 vs 二字詞倒排索引（BM25）。
+語料是 app/data 的實際資料複製到指定筆數（名稱加上編號），查詢含單詞、多詞與篩選。
+
+    python -m bench.bench_place_search            # 100k 筆
+    python -m bench.bench_place_search 20000
+"""
+from __future__ import annotations
+import json
+import sys
+import time
+from pathlib import Path
+
+from app.services.place_search import PlaceSearchIndex
+from app.utils.category import to_category
+
+QUERIES = [("夜景", {}), ("甜點", {"city": "台中"}), ("101", {}), ("老街 美食", {}),
+           ("步道 夜景", {"city": "台北"}), ("台北車站", {}), ("咖啡 拍照", {"city": "台北", "district": "信義區"})]
+
+
+def corpus(n: int) -> list[dict]:
+    base = []
+    for fp in sorted(Path("app/data").glob("*.json")):
+        with fp.open("r", encoding="utf-8") as f:
+            base.extend(json.load(f))
+    return [dict(base[i % len(base)], name=f"{base[i % len(base)]['name']}{i // len(base)}") for i in range(n)]
+
+
+def scan(rows, q, city=None, district=None, limit=10):
+    """沒有索引時的做法：逐筆子字串比對，名稱命中的排前面（要排序就得掃完全部）。"""
+    words = q.split()
+    out = []
+    for p in rows:
+        if (city and p.get("city") != city) or (district and p.get("district") != district):
+            continue
+        text = f"{p.get('name')} {p.get('description')} {' '.join(p.get('tags') or ())}"
+        if all(w in text for w in words):
+            out.append((sum(w in p.get("name", "") for w in words), p))
+    out.sort(key=lambda x: -x[0])
+    return [p for _, p in out[:limit]]
+
+
+def avg_ms(fn, n) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) * 1000 / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = corpus(n)
+    cats = [to_category(p) for p in rows]
+    idx = PlaceSearchIndex(rows, cats)
+    changed = rows[:-100] + [dict(p, description="更新後的介紹") for p in rows[-100:]]
+    again = PlaceSearchIndex(changed, cats, previous=idx)
+    print(f"rows={n}  {idx.stats()}")
+    print(f"  rebuild after 100 edits: {again.build_ms:.0f} ms (reused {again.reused})")
+    print(f"  {'query':<22}{'scan':>10}{'index 1st':>12}{'index hot':>12}")
+    for q, kw in QUERIES:
+        a = avg_ms(lambda: scan(rows, q, **kw), 3)
+        idx._results.clear()  # 第一次查詢（不含結果快取）
+        b = avg_ms(lambda: idx.search(q, **kw), 1)
+        c = avg_ms(lambda: idx.search(q, **kw), 500)
+        label = q + (f" {kw}" if kw else "")
+        print(f"  {label[:22]:<22}{a:9.2f}ms{b:10.3f}ms{c:10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
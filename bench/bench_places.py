@@ -0,0 +1,96 @@
+# bench/bench_places.py
+"""
+filter_places / get_categories_by_district：線性掃描 vs PlaceIndex。
+
+    python -m bench.bench_places            # 500 / 50k / 500k
+    python -m bench.bench_places 1000 20000 # 自訂筆數
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+
+from app.services.places import PlaceIndex
+from app.utils.category import to_category
+
+CITIES = {
+    "台北": ["信義區", "大安區", "中山區", "士林區", "北投區", "內湖區"],
+    "台中": ["西屯區", "南屯區", "北屯區", "中區", "大安區"],
+    "高雄": ["苓雅區", "鼓山區", "左營區", "前鎮區"],
+}
+TYPES = ["spot", "walk", "cafe", "nature", "food", "museum", "shop"]
+TAGS = ["地標", "觀景", "拍照", "夜景", "公園", "步道", "夜市", "小吃", "寺廟", "古蹟", "親子", "展覽", "咖啡"]
+
+
+def synth_places(n: int, seed: int = 42) -> list[dict]:
+    rnd = random.Random(seed)
+    cities = list(CITIES)
+    rows = []
+    for i in range(n):
+        city = rnd.choice(cities)
+        rows.append({
+            "name": f"place-{i}",
+            "type": rnd.choice(TYPES),
+            "city": city,
+            "district": rnd.choice(CITIES[city]),
+            "tags": rnd.sample(TAGS, 3),
+        })
+    return rows
+
+
+# --- 舊版實作（逐筆掃描 + 每次重算類別）---
+def old_filter(rows, city, district, category, page=1, page_size=6):
+    data = [x for x in rows if x.get("city") == city and x.get("district") == district]
+    if category:
+        data = [x for x in data if to_category(x) == category]
+    start = (page - 1) * page_size
+    return data[start:start + page_size]
+
+def old_categories(rows, city, district):
+    return sorted({to_category(x) for x in rows if x.get("city") == city and x.get("district") == district})
+
+
+def _per_call_us(fn, queries, min_seconds=0.2) -> float:
+    calls, t0 = 0, time.perf_counter()
+    while True:
+        for q in queries:
+            fn(*q)
+        calls += len(queries)
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+
+def run(n: int) -> None:
+    rows = synth_places(n)
+    t0 = time.perf_counter()
+    idx = PlaceIndex(rows)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    rnd = random.Random(7)
+    cats = ["landmark", "museum", "park_walk", "food_market", "temple_history", "family_fun"]
+    queries = []
+    for _ in range(20):
+        city = rnd.choice(list(CITIES))
+        queries.append((city, rnd.choice(CITIES[city]), rnd.choice(cats), rnd.randint(1, 3)))
+
+    # 結果一致性
+    for city, district, cat, page in queries:
+        start = (page - 1) * 6
+        assert old_filter(rows, city, district, cat, page) == list(idx.bucket(city, district, cat)[start:start + 6])
+        assert old_categories(rows, city, district) == list(idx.categories_of(city, district))
+
+    old_f = _per_call_us(lambda c, d, k, p: old_filter(rows, c, d, k, p), queries)
+    new_f = _per_call_us(lambda c, d, k, p: idx.bucket(c, d, k)[(p - 1) * 6:p * 6], queries)
+    old_c = _per_call_us(lambda c, d, k, p: old_categories(rows, c, d), queries)
+    new_c = _per_call_us(lambda c, d, k, p: idx.categories_of(c, d), queries)
+
+    print(f"n={n:>7}  build={build_ms:8.1f}ms  "
+          f"filter old={old_f:11.1f}us new={new_f:6.2f}us (x{old_f / new_f:,.0f})  "
+          f"categories old={old_c:11.1f}us new={new_c:6.2f}us (x{old_c / new_c:,.0f})")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [500, 50_000, 500_000]
+    for n in sizes:
+        run(n)
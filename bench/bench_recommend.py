@@ -0,0 +1,73 @@
+# bench/bench_recommend.py
+"""
+推薦引擎延遲：合成 N 筆景點，單一使用者 recommend() 的 p50 / p95，與 recommend_many() 批次的每人成本。
+
+    python -m bench.bench_recommend            # 100k 筆景點、200 位使用者
+    python -m bench.bench_recommend 20000 500
+"""
+from __future__ import annotations
+import random
+import sys
+import time
+from datetime import datetime
+
+from app.utils.category import to_category
+from recommend.engine import Engine, RecQuery
+from recommend.store import FeatureStore
+
+NOON = datetime(2026, 1, 1, 12, 0)
+CITIES = {"台北": ["信義區", "大安區", "中山區", "萬華區"], "台中": ["西區", "南屯區"], "高雄": ["鹽埕區"]}
+TYPES = ["walk", "cafe", "spot", "event", "museum", "food"]
+TAGS = ["夜景", "咖啡", "步道", "親子", "美食", "文化", "拍照", "古蹟", "展覽", "公園"]
+HOURS = ["全天開放", "依場館或店家為準", "09:00–17:00", "18:00–02:00", "05:00–22:00"]
+
+
+def synth_places(n: int, seed: int = 7) -> list[dict]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        city = rnd.choice(list(CITIES))
+        geo = {"lat": 25.0 + rnd.random() * 0.1, "lng": 121.5 + rnd.random() * 0.1} if rnd.random() < 0.6 else {}
+        rows.append({"name": f"place{i}", "city": city, "district": rnd.choice(CITIES[city]),
+                     "type": rnd.choice(TYPES), "tags": rnd.sample(TAGS, rnd.randint(0, 4)),
+                     "hours": rnd.choice(HOURS), "geo": geo, "rating": round(rnd.uniform(2, 5), 1),
+                     "description": "x" if rnd.random() < 0.5 else ""})
+    return rows
+
+
+def synth_queries(n: int, seed: int = 3) -> list[RecQuery]:
+    rnd = random.Random(seed)
+    out = []
+    for u in range(n):
+        geo = rnd.random() < 0.5
+        out.append(RecQuery(user_id=f"U{u}", city=rnd.choice(["台北", "台中", None]),
+                            tags=tuple(rnd.sample(["夜景", "咖啡", "步道", "親子"], rnd.randint(0, 2))),
+                            lat=25.05 if geo else None, lng=121.55 if geo else None,
+                            seen=tuple(f"place{rnd.randrange(2000)}" for _ in range(5)), k=10))
+    return out
+
+
+def main(n: int, users: int) -> None:
+    rows = synth_places(n)
+    t0 = time.perf_counter()
+    e = Engine(FeatureStore(rows, [to_category(p) for p in rows]))
+    qs = synth_queries(users)
+    e.recommend(qs[0], NOON)  # 靜態分數先算好（之後同一分鐘共用）
+    print(f"places={n} users={users} build+warm={(time.perf_counter() - t0) * 1000:.1f}ms")
+
+    lat = []
+    for q in qs:
+        t0 = time.perf_counter()
+        e.recommend(q, NOON)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat.sort()
+    print(f"  single  p50={lat[len(lat) // 2]:7.2f}ms  p95={lat[int(len(lat) * 0.95)]:7.2f}ms")
+
+    t0 = time.perf_counter()
+    e.recommend_many(qs, NOON)
+    print(f"  batch   {(time.perf_counter() - t0) / len(qs) * 1000:7.2f}ms/user")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
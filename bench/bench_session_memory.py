@@ -0,0 +1,67 @@
+# bench/bench_session_memory.py
+"""
+session 常駐記憶體與單次操作成本（tracemalloc）：合成 N 位活躍使用者，
+每人有城市 / 行政區 / 分頁游標與「今日推薦」「輪盤」各 RECENT_MAX 筆最近紀錄（最壞情況）。
+
+    python -m bench.bench_session_memory            # 1,000,000 位
+    python -m bench.bench_session_memory 200000
+"""
+from __future__ import annotations
+
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.services.roulette import FOOD_TYPES
+from app.services.session_store import RECENT_MAX, MemoryBackend, SessionStore
+
+
+async def fill(store: SessionStore, ids, names, full: bool) -> None:
+    for i, u in enumerate(ids):
+        s = await store.get(u)
+        s.city, s.district, s.cursor = "台北", "信義區", ("food_market", 1 + i % 3)
+        for j in range(RECENT_MAX if full else 1):
+            s.remember("today", names[(i + j) % len(names)])
+            if full:
+                s.remember("food", FOOD_TYPES[(i + j) % len(FOOD_TYPES)])
+        await store.save(u, s)
+
+
+def measure(label: str, n: int, full: bool) -> None:
+    ids = [f"U{i:032x}" for i in range(n)]           # LINE userId 是 U + 32 個 hex
+    names = [f"place{i}" for i in range(5000)]        # 景點名稱與資料列共用，不算進 session
+    gc.collect()
+    tracemalloc.start()
+    store = SessionStore(MemoryBackend(max_users=n), ttl=3600)
+    t0 = time.perf_counter()
+    asyncio.run(fill(store, ids, names, full))
+    secs = time.perf_counter() - t0
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<22} {cur / 2**20:8.1f} MiB  {cur / n:6.0f} B/user  "
+          f"(userId 字串另計，約 81 B)  peak {peak / 2**20:8.1f} MiB  {secs / n * 1e6:5.2f} us/user (tracemalloc 下)")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"active users={n}")
+    measure("1 筆最近紀錄", n, full=False)
+    measure(f"各 {RECENT_MAX} 筆（today + food）", n, full=True)
+
+    async def ops():
+        store = SessionStore(MemoryBackend(max_users=n // 2), ttl=3600)
+        ids = [f"U{i:032x}" for i in range(n)]
+        t0 = time.perf_counter()
+        for u in ids:                               # 後半段每次 save 都會淘汰一筆
+            s = await store.get(u)
+            s.remember("today", "x")
+            await store.save(u, s)
+        return (time.perf_counter() - t0) / n
+
+    print(f"  get+remember+save with eviction: {asyncio.run(ops()) * 1e6:.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# bench/bench_snapshot.py
+"""
+開機載入時間：逐檔解析 JSON / CSV + PlaceStore vs mmap 二進位快照。
+
+    python -m bench.bench_snapshot          # 實際資料（app/data）
+    python -m bench.bench_snapshot 100000   # 合成資料（含 tags / 描述 / gmaps）
+"""
+from __future__ import annotations
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.place_prep import iter_source
+from app.services.places import PlaceStore
+from app.services.place_snapshot import write_snapshot
+from bench.bench_places import synth_places
+
+
+def best_ms(fn, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - t0) * 1000)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            n = int(sys.argv[1])
+            rows = synth_places(n)
+            for p in rows:
+                p.update(description=f"{p['name']} 的介紹文字", hours="依場館或店家為準", cost="依消費或免費",
+                         geo={"lat": None, "lng": None}, gmaps=f"https://maps.app.goo.gl/?q={p['name']}")
+            files = [Path(tmp) / "synth.json"]
+            load = None
+            files[0].write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"synthetic rows={n}")
+        else:
+            from app.config.settings import settings
+            files = list(settings.iter_place_files())
+            load = settings.load_places
+            print(f"app/data files={[p.name for p in files]}")
+
+        def from_json():
+            if load is not None:
+                return PlaceStore(load())      # 與執行時的 JSON 退路相同（CSV 重複列以 JSON 為準）
+            return PlaceStore([row for fp in files for row in iter_source(fp)])
+
+        snap = Path(tmp) / "places.snap"
+        store = from_json()
+        size = write_snapshot(snap, store.rows, store.index.categories, files)
+        json_bytes = sum(p.stat().st_size for p in files)
+
+        a = best_ms(from_json)
+        b = best_ms(lambda: PlaceStore.from_snapshot(snap))
+        c = best_ms(lambda: PlaceStore.from_snapshot(snap, sources=files))
+        print(f"  rows={len(store)}  json {json_bytes / 2**10:8.1f} KiB   snapshot {size / 2**10:8.1f} KiB")
+        print(f"  parse sources + PlaceStore      {a:8.1f} ms")
+        print(f"  snapshot (mmap)                 {b:8.1f} ms   x{a / b:.1f}")
+        print(f"  snapshot + source sha256 check  {c:8.1f} ms   x{a / c:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# bench/bench_store_memory.py
+"""
+資料常駐記憶體（tracemalloc）：舊版兩份獨立載入 vs 單一 PlaceStore。
+
+舊版：main 讀一份 settings.load_places() 再原地正規化 gmaps，
+      places.load_places() 另外再讀一份給 filter_places 用（replies 的 PLACES 是空 list）。
+新版：PlaceStore 讀一次，rows / 索引 / 名稱表共用同一批物件。
+
+    python -m bench.bench_store_memory          # 實際資料（app/data）
+    python -m bench.bench_store_memory 200000   # 合成資料
+"""
+from __future__ import annotations
+import copy
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.services.places import PlaceIndex, PlaceStore, _to_float
+from app.utils.links import normalize_existing_gmaps
+from bench.bench_places import synth_places
+
+
+def measure(label: str, build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    keep = build()
+    ms = (time.perf_counter() - t0) * 1000
+    cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} resident {cur / 2**20:8.2f} MiB   peak {peak / 2**20:8.2f} MiB   {ms:8.1f} ms")
+    del keep
+    return cur
+
+
+def main():
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+        base = synth_places(n)
+        load = lambda: copy.deepcopy(base)
+        print(f"synthetic rows={n}")
+    else:
+        from app.config.settings import settings
+        load = settings.load_places
+        print(f"app/data rows={len(load())}")
+
+    def old():
+        main_rows = load()                               # main.PLACES（原地正規化）
+        for p in main_rows:
+            g = p.get("geo") or {}
+            p["gmaps"] = normalize_existing_gmaps(p.get("gmaps"), name=p.get("name"),
+                                                  lat=_to_float(g.get("lat")), lng=_to_float(g.get("lng")),
+                                                  place_id=p.get("place_id"))
+        svc_rows = load()                                # places.load_places() 的第二份
+        return main_rows, svc_rows, PlaceIndex(svc_rows)
+
+    def new():
+        return PlaceStore(load())
+
+    a = measure("old: two loaders + index", old)
+    b = measure("new: PlaceStore", new)
+    print(f"  saved {(a - b) / 2**20:.2f} MiB ({(1 - b / a) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# recommend/engine.py
+"""
+推薦引擎：候選從 FeatureStore 預先分好的桶取，分數是各特徵的加權和，前 k 名用 argpartition 選。
+
+分數 = popularity × w + 現在營業中 × w                （每分鐘算一次、所有人共用）
+     + 命中偏好 tag 的比例 × w                        （只碰到有該 tag 的列）
+     + 偏好類別 × w
+     + exp(-距離 / scale) × w                         （使用者有座標、景點有座標才算）
+     - 這位使用者最近看過 × w                         （novelty）
+     + 隨機擾動 × explore                             （要有變化、但仍以分數為主時才開）
+
+- temperature > 0 時改成抽樣：分數除以 temperature 再加 Gumbel 雜訊取前 k 名，
+  等於依 softmax(分數 / temperature) 不放回抽 k 筆（temperature 越大越接近均勻）；
+  最近看過的直接排到最後，候選全看過才會重複（「今日推薦」用）
+
+- 不做整體排序：argpartition 找出第 k 名的分數，只排不低於它的那幾筆（同分時列號小的在前）
+- recommend_many() 一次算多位使用者：同樣條件的人共用候選與靜態分數，
+  有座標的人一起算一個 (人數, 候選數) 的距離矩陣（分批，控制記憶體）
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recommend.store import FeatureStore, features_for
+
+# 距離矩陣每批最多幾個元素（float64，約 32 MB）
+DIST_BLOCK = 4_000_000
+# 抽樣模式下最近看過的扣分：比任何分數差都大
+SEEN_SAMPLED = 1e6
+
+
+@dataclass(frozen=True)
+class Weights:
+    popularity: float = 1.0
+    open_now: float = 0.6
+    tags: float = 0.8
+    likes: float = 0.5
+    distance: float = 1.2
+    distance_scale_km: float = 3.0
+    novelty: float = 1.0
+
+
+@dataclass(frozen=True)
+class RecQuery:
+    user_id: Optional[str] = None
+    city: Optional[str] = None
+    district: Optional[str] = None
+    category: Optional[str] = None
+    types: Tuple[str, ...] = ()    # 硬條件：只要這些 type
+    tags: Tuple[str, ...] = ()     # 軟條件：偏好的 tag
+    likes: Tuple[str, ...] = ()    # 軟條件：偏好的類別
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    seen: Tuple[str, ...] = ()     # 最近推薦過的景點名稱
+    k: int = 5
+    explore: float = 0.0
+    temperature: float = 0.0       # > 0：依 softmax(分數 / temperature) 抽樣
+    seed: Optional[int] = None
+
+    @property
+    def has_geo(self) -> bool:
+        return self.lat is not None and self.lng is not None
+
+    def candidate_key(self) -> tuple:
+        return self.city, self.district, self.category, self.types
+
+
+class Recommendation(NamedTuple):
+    score: float
+    place: Any
+
+
+class Engine:
+    def __init__(self, features: FeatureStore, weights: Weights = Weights()):
+        self.features = features
+        self.weights = weights
+        self._static: Tuple[int, Optional[np.ndarray]] = (-1, None)
+        self._like_codes: Dict[Tuple[str, ...], np.ndarray] = {}
+        self.queries = 0
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def static_scores(self, now: datetime) -> np.ndarray:
+        """popularity + 營業中；同一分鐘內共用（唯讀，別改它）。"""
+        minute = now.hour * 60 + now.minute
+        cached_minute, arr = self._static
+        if arr is None or cached_minute != minute:
+            w, f = self.weights, self.features
+            arr = w.popularity * f.popularity + w.open_now * f.open_now(minute)
+            arr.setflags(write=False)
+            self._static = (minute, arr)
+        return arr
+
+    def _personal(self, q: RecQuery, rows: np.ndarray, base: np.ndarray,
+                  prox: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        靜態分數加上個人化項（prox 是這位使用者的距離分數）；回傳新的陣列（長度 = 候選數）。
+        距離分數要在除以 temperature 之前加進來，抽樣時才和其他分數一起被縮放。
+        """
+        w, f = self.weights, self.features
+        s = base[rows]
+        if q.tags:
+            share = w.tags / len(q.tags)
+            for t in q.tags:
+                members = f.tag_rows.get(t)
+                if members is not None:
+                    s[f.positions(rows, members)] += share
+        if q.likes:
+            codes = self._like_codes.get(q.likes)
+            if codes is None:
+                codes = self._like_codes[q.likes] = np.asarray(
+                    [f.cat_ids[c] for c in q.likes if c in f.cat_ids], dtype=np.int16)
+            s += w.likes * np.isin(f.cat_code[rows], codes)
+        if prox is not None:
+            s += prox
+        # explore 與 Gumbel 雜訊取自同一個 generator，同一個 seed 才不會抽到相關的兩串亂數
+        rng = np.random.default_rng(q.seed) if q.explore or q.temperature > 0 else None
+        if q.explore:
+            s += q.explore * rng.random(len(rows))
+        if q.temperature > 0:
+            s /= q.temperature
+            s += rng.gumbel(size=len(rows))
+        if q.seen:
+            s[f.positions(rows, f.rows_of(q.seen))] -= SEEN_SAMPLED if q.temperature > 0 else w.novelty
+        return s
+
+    def _proximity(self, d: np.ndarray) -> np.ndarray:
+        w = self.weights
+        return w.distance * np.exp(-d / w.distance_scale_km)  # 沒座標是 inf → 0
+
+    def _select(self, scores: np.ndarray, rows: np.ndarray, k: int) -> List[Recommendation]:
+        n = len(rows)
+        if not n or k <= 0:
+            return []
+        if k < n:
+            # 第 k 名的分數；同分的全部帶進來，才能照列號決定誰留下
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            top = np.flatnonzero(scores >= kth)
+        else:
+            top = np.arange(n)
+        top = top[np.lexsort((rows[top], -scores[top]))][:k]
+        places = self.features.places
+        return [Recommendation(round(float(scores[i]), 4), places[rows[i]]) for i in top]
+
+    def recommend(self, q: RecQuery, now: Optional[datetime] = None) -> List[Recommendation]:
+        self.queries += 1
+        f = self.features
+        rows = f.candidates(q.city, q.district, q.category, q.types)
+        if not len(rows):
+            return []
+        prox = self._proximity(f.distances([q.lat], [q.lng], rows)[0]) if q.has_geo else None
+        s = self._personal(q, rows, self.static_scores(now or datetime.now()), prox)
+        return self._select(s, rows, q.k)
+
+    def recommend_many(self, queries: Sequence[RecQuery],
+                       now: Optional[datetime] = None) -> List[List[Recommendation]]:
+        """批次版：結果順序與 queries 相同。"""
+        self.queries += len(queries)
+        f = self.features
+        base = self.static_scores(now or datetime.now())
+        out: List[List[Recommendation]] = [[] for _ in queries]
+        groups: Dict[tuple, List[int]] = {}
+        for i, q in enumerate(queries):
+            groups.setdefault(q.candidate_key(), []).append(i)
+
+        for key, members in groups.items():
+            rows = f.candidates(*key)
+            if not len(rows):
+                continue
+            step = max(1, DIST_BLOCK // len(rows))
+            for j in range(0, len(members), step):
+                chunk = members[j:j + step]
+                geo = [i for i in chunk if queries[i].has_geo]
+                prox = self._proximity(f.distances([queries[i].lat for i in geo],
+                                                   [queries[i].lng for i in geo], rows)) if geo else None
+                row_of = {i: r for r, i in enumerate(geo)}
+                for i in chunk:
+                    s = self._personal(queries[i], rows, base, prox[row_of[i]] if i in row_of else None)
+                    out[i] = self._select(s, rows, queries[i].k)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        f = self.features
+        return {"places": len(f), "with_geo": int(f.valid_geo.sum()), "tags": len(f.tag_rows),
+                "queries": self.queries}
+
+
+def get_engine(store: Any) -> Engine:
+    """這份資料的推薦引擎（store.derived 快取；搭配 register_warmer 在換版前建好）。"""
+    return store.derived("rec_engine", lambda s: Engine(features_for(s)))
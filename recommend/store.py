@@ -0,0 +1,182 @@
+# recommend/store.py
+"""
+推薦用的欄式特徵表：每版 PlaceStore 建一次（store.derived），第 i 列對應 store.rows[i]。
+
+- 類別 / type 存成 int16 代碼；(城市)、(行政區)、(城市, 行政區)、(城市, 行政區, 類別)、(類別) 的列索引預先分好桶
+- tag → 列索引 的倒排陣列（偏好 tag 的加分只碰到有該 tag 的列）
+- 座標存弧度與 cos(lat)，沒座標的列標記為無效
+- 營業時間從 hours 文字解析成 (開始分鐘, 結束分鐘)；「依店家為準」這類解析不出來的記為未知
+- popularity：資料有 popularity（0–1）/ rating（0–5）/ user_ratings_total 就用，
+  沒有的話用內容完整度（有圖、tag 數、有描述）當先驗，範圍刻意壓在 0.6 以下
+"""
+from __future__ import annotations
+
+import re
+from collections import defaultdict
+from math import log1p
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_R_KM = 6371.0
+DAY_MIN = 24 * 60
+UNKNOWN = -1
+
+_RANGE = re.compile(r"(\d{1,2})[:：](\d{2})\s*[–—~\-至到]\s*(\d{1,2})[:：](\d{2})")
+# 沒寫時刻、只有描述的時段
+_PHRASES: Tuple[Tuple[str, Tuple[int, int]], ...] = (
+    ("全天", (0, DAY_MIN)),
+    ("24小時", (0, DAY_MIN)),
+    ("傍晚至深夜", (17 * 60, DAY_MIN)),
+    ("清晨至中午", (5 * 60, 12 * 60)),
+    ("清晨", (5 * 60, 10 * 60)),
+)
+
+
+def parse_hours(text: Optional[str]) -> Tuple[int, int]:
+    """回傳 (開始, 結束) 分鐘；結束小於開始代表跨夜。解析不出來回 (UNKNOWN, UNKNOWN)。"""
+    if not text:
+        return UNKNOWN, UNKNOWN
+    m = _RANGE.search(text)
+    if m:
+        h1, m1, h2, m2 = (int(x) for x in m.groups())
+        return (h1 * 60 + m1) % DAY_MIN, min(h2 * 60 + m2, DAY_MIN)
+    for phrase, span in _PHRASES:
+        if phrase in text:
+            return span
+    return UNKNOWN, UNKNOWN
+
+
+def _to_float(v: Any) -> Optional[float]:
+    try:
+        return float(v) if v is not None and str(v).strip() != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def popularity(p: Any) -> float:
+    v = _to_float(p.get("popularity"))
+    if v is not None:
+        return min(max(v, 0.0), 1.0)
+    v = _to_float(p.get("rating"))
+    if v is not None:
+        return min(max(v / 5.0, 0.0), 1.0)
+    v = _to_float(p.get("user_ratings_total"))
+    if v is not None:
+        return min(log1p(max(v, 0.0)) / log1p(10_000), 1.0)
+    tags = p.get("tags") or ()
+    return 0.3 * bool(p.get("image_url")) + 0.2 * min(len(tags), 5) / 5 + 0.1 * bool(p.get("description"))
+
+
+def _codes(values: Iterable[Any]) -> Tuple[np.ndarray, Dict[Any, int]]:
+    ids: Dict[Any, int] = {}
+    codes = np.fromiter((ids.setdefault(v, len(ids)) for v in values), dtype=np.int16)
+    return codes, ids
+
+
+class FeatureStore:
+    def __init__(self, places: Sequence[Any], categories: Sequence[str]):
+        self.places = places
+        n = self.n = len(places)
+        self.cat_code, self.cat_ids = _codes(categories)
+        self.type_code, self.type_ids = _codes(p.get("type") or "" for p in places)
+
+        buckets: Dict[tuple, List[int]] = defaultdict(list)
+        tag_rows: Dict[str, List[int]] = defaultdict(list)
+        self.by_name: Dict[str, int] = {}
+        lat = np.full(n, np.nan)
+        lng = np.full(n, np.nan)
+        self.open_start = np.empty(n, dtype=np.int16)
+        self.open_end = np.empty(n, dtype=np.int16)
+        self.popularity = np.empty(n, dtype=np.float64)
+        for i, (p, cat) in enumerate(zip(places, categories)):
+            city, district = p.get("city"), p.get("district")
+            buckets[(city,)].append(i)
+            buckets[(city, district)].append(i)
+            buckets[(city, district, cat)].append(i)
+            buckets[(None, district)].append(i)
+            buckets[(None, None, cat)].append(i)
+            for t in p.get("tags") or ():
+                tag_rows[t].append(i)
+            name = p.get("name")
+            if name:
+                self.by_name.setdefault(name, i)
+            g = p.get("geo") or {}
+            la, ln = _to_float(g.get("lat")), _to_float(g.get("lng"))
+            if la is not None and ln is not None:
+                lat[i], lng[i] = la, ln
+            self.open_start[i], self.open_end[i] = parse_hours(p.get("hours"))
+            self.popularity[i] = popularity(p)
+
+        self.buckets = {k: np.asarray(v, dtype=np.int32) for k, v in buckets.items()}
+        self.tag_rows = {k: np.asarray(v, dtype=np.int32) for k, v in tag_rows.items()}
+        self.all_rows = np.arange(n, dtype=np.int32)
+        self.valid_geo = ~(np.isnan(lat) | np.isnan(lng))
+        self._rlat = np.radians(lat)
+        self._rlng = np.radians(lng)
+        self._coslat = np.cos(self._rlat)
+
+    @classmethod
+    def from_place_store(cls, store: Any) -> "FeatureStore":
+        return cls(store.rows, store.index.categories)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def candidates(self, city: Optional[str] = None, district: Optional[str] = None,
+                   category: Optional[str] = None, types: Optional[Sequence[str]] = None) -> np.ndarray:
+        """依條件從預先分好的桶取列索引（遞增）；沒給的條件視為不限。"""
+        if city and district:
+            rows = self.buckets.get((city, district, category) if category else (city, district))
+        elif city:
+            rows = self.buckets.get((city,))
+            if rows is not None and category:
+                rows = rows[self.cat_code[rows] == self.cat_ids.get(category, -1)]
+        elif district:
+            rows = self.buckets.get((None, district))
+            if rows is not None and category:
+                rows = rows[self.cat_code[rows] == self.cat_ids.get(category, -1)]
+        elif category:
+            rows = self.buckets.get((None, None, category))
+        else:
+            rows = self.all_rows
+        if rows is None:
+            return self.all_rows[:0]
+        if types:
+            rows = rows[np.isin(self.type_code[rows], [self.type_ids[t] for t in types if t in self.type_ids])]
+        return rows
+
+    def open_now(self, minute: int) -> np.ndarray:
+        """每列在 minute（0–1439）時是否營業：1 / 0，未知 0.5。"""
+        s, e = self.open_start, self.open_end
+        same_day = (s <= minute) & (minute < e)
+        overnight = (e < s) & ((minute >= s) | (minute < e))
+        out = np.where(same_day | overnight, 1.0, 0.0)
+        out[s == UNKNOWN] = 0.5
+        return out
+
+    def distances(self, lats: Sequence[float], lngs: Sequence[float], rows: np.ndarray) -> np.ndarray:
+        """(使用者數, len(rows)) 的距離矩陣（km）；沒座標的列為 inf。"""
+        ulat = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+        ulng = np.radians(np.asarray(lngs, dtype=np.float64))[:, None]
+        rlat, rlng = self._rlat[rows], self._rlng[rows]
+        a = np.sin((rlat - ulat) / 2) ** 2 + np.cos(ulat) * self._coslat[rows] * np.sin((rlng - ulng) / 2) ** 2
+        with np.errstate(invalid="ignore"):
+            d = 2 * EARTH_R_KM * np.arcsin(np.sqrt(a))
+        d[:, ~self.valid_geo[rows]] = np.inf
+        return d
+
+    def positions(self, rows: np.ndarray, members: np.ndarray) -> np.ndarray:
+        """members 中屬於 rows（遞增）的那些，在 rows 裡的位置。"""
+        if not len(rows) or not len(members):
+            return np.empty(0, dtype=np.intp)
+        pos = np.minimum(np.searchsorted(rows, members), len(rows) - 1)
+        return pos[rows[pos] == members]
+
+    def rows_of(self, names: Iterable[str]) -> np.ndarray:
+        ids = sorted({self.by_name[n] for n in names if n in self.by_name})
+        return np.asarray(ids, dtype=np.int32)
+
+
+def features_for(store: Any) -> FeatureStore:
+    return store.derived("rec_features", FeatureStore.from_place_store)
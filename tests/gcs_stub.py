@@ -0,0 +1,73 @@
+# tests/gcs_stub.py
+"""
+本機假 GCS：只實作 asset_prep / place_reload 用到的 client.bucket().get_blob() / list_blobs()
+與 blob.download_to_filename()。每次下載可加延遲，模擬 Cloud Run 冷啟動時的網路往返：
+
+    gcs = FakeGCS({"imagemeps/a.png": b"..."}, latency=0.1)
+    sync_tiles(gcs, "bucket", "imagemeps", ["a.png"], "/tmp/x")
+
+put() 會遞增 generation，等同重新上傳；max_active 記錄同時下載數的最高值。
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FakeBlob:
+    def __init__(self, gcs: "FakeGCS", name: str):
+        self._gcs = gcs
+        self.name = name
+        data, gen = gcs.objects[name]
+        self.generation = gen
+        self.etag = f"etag-{gen}"
+        self.md5_hash = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+    def download_to_filename(self, filename: str) -> None:
+        gcs = self._gcs
+        with gcs.lock:
+            gcs.active += 1
+            gcs.max_active = max(gcs.max_active, gcs.active)
+        time.sleep(gcs.latency)
+        with gcs.lock:
+            gcs.active -= 1
+            gcs.downloads.append(self.name)
+        with open(filename, "wb") as f:
+            f.write(self._gcs.objects[self.name][0])
+
+
+class FakeBucket:
+    def __init__(self, gcs: "FakeGCS"):
+        self._gcs = gcs
+
+    def get_blob(self, name: str) -> Optional[FakeBlob]:
+        time.sleep(self._gcs.meta_latency)
+        return FakeBlob(self._gcs, name) if name in self._gcs.objects else None
+
+    def list_blobs(self, prefix: str = "") -> List[FakeBlob]:
+        return [FakeBlob(self._gcs, n) for n in sorted(self._gcs.objects) if n.startswith(prefix)]
+
+
+class FakeGCS:
+    def __init__(self, objects: Optional[Dict[str, bytes]] = None, latency: float = 0.0,
+                 meta_latency: float = 0.0):
+        self.objects: Dict[str, tuple] = {}
+        self.latency = latency
+        self.meta_latency = meta_latency
+        self.downloads: List[str] = []
+        self.active = 0
+        self.max_active = 0          # 同時進行中的下載數最高到多少
+        self.lock = threading.Lock()
+        self._gen = 0
+        for name, data in (objects or {}).items():
+            self.put(name, data)
+
+    def put(self, name: str, data: bytes) -> None:
+        self._gen += 1
+        self.objects[name] = (data, self._gen)
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self)
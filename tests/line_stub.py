@@ -0,0 +1,44 @@
+# tests/line_stub.py
+"""
+本機 LINE Messaging API stub：記錄收到的 reply / push，並可預先排定要回的錯誤狀態碼。
+搭配 httpx.ASGITransport 直接掛給 LineClient，不需要真的開 port：
+
+    stub = LineStub()
+    client = LineClient("token", base_url="http://line-stub", transport=stub.transport())
+
+也可以 `uvicorn tests.line_stub:app --port 9000` 起一個真的 server，
+再把 LINE_API_BASE 指到 http://127.0.0.1:9000 做手動測試。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class LineStub:
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self.failures: List[int] = []  # 依序消耗：下一個請求回這個狀態碼
+        self.app = FastAPI()
+
+        @self.app.post("/v2/bot/message/{kind}")
+        async def message(kind: str, request: Request):
+            body = await request.json()
+            self.calls.append({"kind": kind, "body": body, "headers": dict(request.headers)})
+            if self.failures:
+                status = self.failures.pop(0)
+                msg = "Invalid reply token" if status == 400 else "stub error"
+                return JSONResponse({"message": msg}, status_code=status, headers={"Retry-After": "0"})
+            return JSONResponse({"sentMessages": [{"id": str(i)} for i, _ in enumerate(body.get("messages", []))]})
+
+    def transport(self) -> httpx.ASGITransport:
+        return httpx.ASGITransport(app=self.app)
+
+    def of_kind(self, kind: str) -> List[Dict[str, Any]]:
+        return [c for c in self.calls if c["kind"] == kind]
+
+
+app = LineStub().app
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.services.ai_cache import AICache, MemoryBackend, cache_key, normalize_prompt
+
+
+def producer(calls, value="答案", delay=0.01, error=None):
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return value
+    return produce
+
+
+def test_key_ignores_width_spacing_and_case():
+    assert normalize_prompt("  ＡＩ　推薦\n台北  ") == "ai 推薦 台北"
+    assert cache_key("m", "ai", None, "Hello  World") == cache_key("m", "ai", None, " hello world")
+    assert cache_key("m", "ai", None, "x") != cache_key("m", "summary", None, "x")
+
+
+def test_concurrent_misses_share_one_generation_then_hit():
+    cache, calls = AICache(MemoryBackend()), []
+
+    async def go():
+        results = await asyncio.gather(*(cache.get_or_generate("k", producer(calls)) for _ in range(5)))
+        return results, await cache.get_or_generate("k", producer(calls))
+
+    results, again = asyncio.run(go())
+    assert results == ["答案"] * 5 and again == "答案" and len(calls) == 1
+    s = cache.stats()
+    assert (s["misses"], s["deduped"], s["hits"], s["inflight"], s["size"]) == (1, 4, 1, 0, 1)
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache, calls = AICache(MemoryBackend()), []
+
+    async def go():
+        return await asyncio.gather(*(cache.get_or_generate("k", producer(calls, error=RuntimeError("quota")))
+                                      for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(go())
+    assert all(isinstance(r, RuntimeError) for r in results) and len(calls) == 1
+    assert cache.stats()["errors"] == 1 and cache.stats()["size"] == 0
+    assert asyncio.run(cache.get_or_generate("k", producer(calls))) == "答案" and len(calls) == 2
+
+
+def test_empty_result_is_not_cached():
+    cache, calls = AICache(MemoryBackend()), []
+    assert asyncio.run(cache.get_or_generate("k", producer(calls, value=""))) == ""
+    assert cache.stats()["size"] == 0
+    assert asyncio.run(cache.get_or_generate("k", producer(calls))) == "答案" and len(calls) == 2
+
+
+def test_cancelled_producer_hands_over_to_a_waiter():
+    cache, calls = AICache(MemoryBackend()), []
+
+    async def go():
+        first = asyncio.create_task(cache.get_or_generate("k", producer(calls, delay=0.2)))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_generate("k", producer(calls, value="接手", delay=0.01)))
+                   for _ in range(2)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(go()) == ["接手", "接手"]
+    assert len(calls) == 2 and cache.stats()["inflight"] == 0
+
+
+def test_memory_backend_ttl_and_lru():
+    async def go():
+        b = MemoryBackend(max_entries=2)
+        await b.set("a", "1", ttl=60)
+        await b.set("b", "2", ttl=60)
+        await b.get("a")
+        await b.set("c", "3", ttl=60)           # 淘汰最久沒用的 b
+        lru = [await b.get(k) for k in "abc"]
+        await b.set("d", "4", ttl=-1)            # 已過期
+        return lru, await b.get("d"), b.size()
+
+    assert asyncio.run(go()) == (["1", None, "3"], None, 1)
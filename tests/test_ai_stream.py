@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from app.services import gpt
+from app.services.ai_cache import AICache, MemoryBackend
+from app.services.ai_stream import (
+    MAX_LINE_TEXT, PushBudget, SentenceChunker, iterate_in_thread, stream_to_user,
+)
+
+
+async def fake_model(text: str, step: int = 7, delay: float = 0.0, progress=None):
+    """假的串流模型：每次吐 step 個字；progress 有給時記下已吐出的字數。"""
+    for i in range(0, len(text), step):
+        if delay:
+            await asyncio.sleep(delay)
+        if progress is not None:
+            progress.append(i + step)
+        yield text[i:i + step]
+
+
+def _run(chunks, budget, progress=None):
+    pushed = []
+
+    async def send(texts):
+        pushed.append((progress[-1] if progress else None, texts[0]))
+
+    res = asyncio.run(stream_to_user(chunks, send, user_id="U1", budget=budget))
+    return res, pushed
+
+
+def test_first_sentence_is_pushed_before_stream_ends():
+    text = "第一句很短。" + "後面是比較長的內容，" * 40 + "結束。"
+    progress = []
+    res, pushed = _run(fake_model(text, progress=progress), PushBudget(limit=5), progress)
+    assert pushed[0][1] == "第一句很短。"
+    # 第一則送出時模型才吐了開頭幾個字
+    assert pushed[0][0] < len(text) // 10
+    assert "".join(p for _, p in pushed) == text
+    assert all(len(p) <= MAX_LINE_TEXT for _, p in pushed)
+    assert res == (len(pushed), "")
+
+
+def test_segments_respect_line_limit_and_sentence_boundaries():
+    sentence = "這是一個句子。"
+    chunker = SentenceChunker(min_chars=200)
+    segs = chunker.feed(sentence * 600) + chunker.flush()
+    assert all(len(s) <= MAX_LINE_TEXT for s in segs)
+    assert all(s.endswith("。") for s in segs)
+    assert "".join(segs) == sentence * 600
+
+
+def test_budget_folds_remaining_text_into_last_push():
+    text = "一句話。" * 2000
+    budget = PushBudget(limit=2, window=60)
+    res, pushed = _run(fake_model(text, step=50), budget)
+    assert res == (2, "")
+    assert pushed[-1][1].endswith("（內容過長已截斷）")
+    assert budget.remaining("U1") == 0
+
+
+def test_exhausted_budget_reports_unsent_text():
+    budget = PushBudget(limit=1, window=60)
+    assert budget.take("U1")
+    res, pushed = _run(fake_model("第一句。第二句。"), budget)
+    assert pushed == [] and res == (0, "第一句。\n第二句。")
+    assert budget.denied == 1
+
+
+def test_iterate_in_thread_propagates_errors():
+    def boom():
+        yield "ok"
+        raise RuntimeError("upstream failed")
+
+    async def go():
+        got = []
+        try:
+            async for c in iterate_in_thread(boom):
+                got.append(c)
+        except RuntimeError as e:
+            return got, str(e)
+
+    assert asyncio.run(go()) == (["ok"], "upstream failed")
+
+
+def test_cancelled_consumer_does_not_wait_for_the_stream_and_stops_the_thread():
+    gate, closed = threading.Event(), threading.Event()
+
+    def endless():
+        try:
+            yield "first"
+            while True:
+                gate.wait(5)      # 模擬很慢的上游
+                yield "more"
+        finally:
+            closed.set()
+
+    async def go():
+        got = []
+
+        async def consume():
+            async for c in iterate_in_thread(endless):
+                got.append(c)
+
+        task = asyncio.create_task(consume())
+        while not got:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        # 舊版在 finally 裡等 thread 跑完整段串流，這裡會卡住
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 1)
+        assert not closed.is_set()
+        gate.set()
+        return got
+
+    assert asyncio.run(go()) == ["first"]
+    assert closed.wait(2)      # thread 拿到下一個 chunk 就停下並關閉 iterator
+
+
+class FakeOpenAI:
+    def __init__(self, deltas):
+        self.calls = []
+        self.closed = 0
+        self.responses = SimpleNamespace(create=self._create)
+        self._deltas = deltas
+
+    def _create(self, **kw):
+        self.calls.append(kw)
+        events = [SimpleNamespace(type="response.created")]
+        events += [SimpleNamespace(type="response.output_text.delta", delta=d) for d in self._deltas]
+        events.append(SimpleNamespace(type="response.completed"))
+        fake = self
+
+        class Stream:
+            def __iter__(self):
+                return iter(events)
+
+            def close(self):
+                fake.closed += 1
+        return Stream()
+
+
+def test_gpt_stream_text_streams_deltas_then_replays_from_cache(monkeypatch):
+    client = FakeOpenAI(["台北", "有很多", "景點。"])
+    monkeypatch.setattr(gpt, "_client", client)
+    monkeypatch.setattr(gpt, "AI_CACHE", AICache(MemoryBackend()))
+
+    async def collect(*args, **kw):
+        return [c async for c in gpt.stream_text(*args, **kw)]
+
+    assert asyncio.run(collect("台北好玩嗎", "summary")) == ["台北", "有很多", "景點。"]
+    call = client.calls[0]
+    assert call["stream"] is True and call["input"][0]["content"] == gpt._system_by_mode("summary")
+    assert client.closed == 1
+    assert asyncio.run(collect("台北好玩嗎", mode="summary")) == ["台北有很多景點。"]
+    assert len(client.calls) == 1
+
+    res, pushed = _run(gpt.stream_text("台北好玩嗎", "summary"), PushBudget(limit=5))
+    assert res == (1, "") and pushed[0][1] == "台北有很多景點。"
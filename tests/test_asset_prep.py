@@ -0,0 +1,86 @@
+import asyncio
+
+from app.services.asset_prep import AssetPreparer, compose_grid_cached, sync_tiles
+from tests.gcs_stub import FakeGCS
+
+FILES = [f"categories_1040_{i}.png" for i in range(6)]
+
+
+def fake_gcs(latency=0.0):
+    return FakeGCS({f"imagemeps/{fn}": f"tile-{fn}".encode() for fn in FILES}, latency=latency)
+
+
+def fake_compose(calls):
+    def compose(output_path, base_path, categories):
+        calls.append(output_path)
+        with open(output_path, "wb") as f:
+            f.write(b"grid")
+    return compose
+
+
+def test_downloads_run_concurrently_and_skip_unchanged_generations(tmp_path):
+    gcs = fake_gcs(latency=0.1)
+    assert sync_tiles(gcs, "b", "imagemeps", FILES, tmp_path)["downloaded"] == 6
+    assert gcs.max_active > 1  # 不是一張一張依序下載
+
+    assert sync_tiles(gcs, "b", "imagemeps", FILES, tmp_path) == {"downloaded": 0, "skipped": 6, "missing": 0}
+    gcs.put(f"imagemeps/{FILES[2]}", b"new tile")
+    assert sync_tiles(gcs, "b", "imagemeps", FILES, tmp_path)["downloaded"] == 1
+    assert (tmp_path / FILES[2]).read_bytes() == b"new tile"
+
+
+def test_grid_is_rebuilt_only_when_tile_content_changes(tmp_path):
+    for fn in FILES:
+        (tmp_path / fn).write_bytes(fn.encode())
+    (tmp_path / "categories_700.png").write_bytes(b"old")
+    calls = []
+    compose = fake_compose(calls)
+
+    assert compose_grid_cached(tmp_path, FILES, compose, ["categories_700.png"]) is True
+    assert not (tmp_path / "categories_700.png").exists()
+    (tmp_path / "categories_700.png").write_bytes(b"derived from current grid")
+    # mtime 變了但內容一樣 → 不重建、縮圖保留
+    (tmp_path / FILES[0]).write_bytes(FILES[0].encode())
+    assert compose_grid_cached(tmp_path, FILES, compose, ["categories_700.png"]) is False
+    assert (tmp_path / "categories_700.png").exists() and len(calls) == 1
+
+    (tmp_path / FILES[0]).write_bytes(b"changed")
+    assert compose_grid_cached(tmp_path, FILES, compose, ["categories_700.png"]) is True
+    assert len(calls) == 2 and not (tmp_path / "categories_700.png").exists()
+
+
+def test_start_does_not_block_and_sets_ready(tmp_path):
+    gcs = fake_gcs(latency=0.2)
+    derived = []
+    assets = AssetPreparer(str(tmp_path), FILES, bucket="b", prefix="imagemeps",
+                           client_factory=lambda: gcs, compose=fake_compose([]),
+                           derive=lambda base, rebuilt: derived.append(rebuilt) or {"ok": rebuilt})
+
+    async def boot():
+        assets.start()
+        ready_at_start = assets.ready   # 每張下載要 0.2s，start() 回來時不可能已經準備好
+        await assets.stop()
+        return ready_at_start
+
+    assert not asyncio.run(boot())
+    assert assets.ready and assets.error is None and assets.rebuilt is True
+    assert assets.stats()["sync"]["downloaded"] == 6
+    assert derived == [True] and assets.stats()["derivatives"] == {"ok": True}
+
+
+def test_failed_prepare_ends_the_wait_but_is_not_ready(tmp_path):
+    def broken_client():
+        raise ConnectionError("gcs down")
+
+    assets = AssetPreparer(str(tmp_path), FILES, bucket="b", client_factory=broken_client,
+                           compose=fake_compose([]))
+
+    async def boot():
+        assets.start()
+        finished = await assets.until_ready(5)
+        await assets.stop()
+        return finished
+
+    assert asyncio.run(boot())                   # 圖片請求不會一直等下去
+    assert assets.done and not assets.ready and assets.failed
+    assert "gcs down" in assets.error and assets.stats()["ready"] is False
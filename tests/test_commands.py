@@ -0,0 +1,63 @@
+from app.handlers.commands import Route, TextRouter
+
+DISTRICTS = {"台北": ["信義區", "大安區"], "台中": ["西區", "大安區"]}
+PLACES = [
+    {"name": "象山步道", "city": "台北", "district": "信義區"},
+    {"name": "淡水老街", "city": "新北", "district": "淡水"},
+    {"name": "旗津海岸", "city": "高雄", "district": "旗津區"},
+    {"name": "大安森林公園", "city": "台中", "district": "大安區"},
+]
+
+
+def router():
+    return TextRouter(DISTRICTS, PLACES)
+
+
+def test_search_prefixes_need_an_explicit_command():
+    r = router()
+    assert r.route("/search 夜景") == Route("search", ("夜景",))
+    assert r.route("/找夜景") == Route("search", ("夜景",))
+    assert r.route("搜尋 甜點") == Route("search", ("甜點",))
+    assert r.route("找 夜景") == Route("search", ("夜景",))
+    assert r.route("找　咖啡") == Route("search", ("咖啡",))
+    # 以「找」開頭的一般句子維持原本的 GPT 行為
+    assert r.route("找個地方吃飯") == Route("gpt", (None, "找個地方吃飯"))
+    assert r.route("找") == Route("gpt", (None, "找"))
+    assert r.route("/search") == Route("gpt", (None, "/search"))
+
+
+def test_shared_district_names_follow_districts_map_order():
+    r = router()
+    assert r.city_of("大安區") == "台北"            # 台北、台中都有，DISTRICTS 先列台北
+    assert r.route("大安區") == Route("district", ("台北", "大安區"))
+    assert r.route("西區") == Route("district", ("台中", "西區"))
+    # 只出現在資料裡的行政區取資料中的城市
+    assert r.city_of("旗津區") == "高雄" and r.route("旗津區") == Route("district", ("高雄", "旗津區"))
+    reordered = TextRouter({"台中": DISTRICTS["台中"], "台北": DISTRICTS["台北"]}, PLACES)
+    assert reordered.route("大安區") == Route("district", ("台中", "大安區"))
+
+
+def test_unknown_district_like_text_and_data_only_names():
+    r = router()
+    # 看起來像行政區但查不到城市 → 用預設城市
+    assert r.route("中山區") == Route("district", ("台北", "中山區"))
+    assert TextRouter(DISTRICTS, default_city="台中").route("中山區") == Route("district", ("台中", "中山區"))
+    # 不像行政區、只在資料中出現的地名 → 建議
+    assert r.route("淡水") == Route("suggest", ("淡水",))
+    assert TextRouter(DISTRICTS).route("淡水") == Route("gpt", (None, "淡水"))
+    assert r.route("夜市區域推薦") == Route("gpt", (None, "夜市區域推薦"))
+
+
+def test_city_pages_and_command_order():
+    r = router()
+    assert r.route("台北") == Route("city", ("台北", 1))
+    assert r.route("台中#p3") == Route("city", ("台中", 3))
+    assert r.route("台北#p") == Route("gpt", (None, "台北#p"))
+    assert r.route("高雄#p2") == Route("gpt", (None, "高雄#p2"))   # 不在 DISTRICTS 的城市
+    assert r.route("下一頁") == Route("next_page") and r.route("/today") == Route("today")
+    assert r.route("CAT|台北|信義區|museum") == Route("cat", ("CAT|台北|信義區|museum",))
+    assert r.route("下午想喝咖啡放鬆") == Route("cafe_relax")
+    assert r.route("北海岸一日遊") == Route("north_coast")
+    assert r.route("/ai 台北有什麼好玩") == Route("ai", ("台北有什麼好玩",))
+    assert r.route("/ai ") == Route("ai", ("請用繁體中文打招呼。",))
+    assert r.route("/翻譯 hello") == Route("gpt", ("translate", "hello"))
@@ -0,0 +1,183 @@
+import random
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from app.utils.category import to_category
+from recommend.engine import Engine, RecQuery, Weights
+from recommend.store import UNKNOWN, FeatureStore, parse_hours
+
+NOON = datetime(2026, 1, 1, 12, 0)
+NIGHT = datetime(2026, 1, 1, 23, 30)
+
+PLACES = [
+    {"name": "象山步道", "city": "台北", "district": "信義區", "type": "walk", "tags": ["步道", "夜景"],
+     "hours": "全天開放", "geo": {"lat": 25.027, "lng": 121.576}, "description": "看 101 夜景", "image_url": "x"},
+    {"name": "四四南村", "city": "台北", "district": "信義區", "type": "spot", "tags": ["文化"],
+     "hours": "09:00–17:00", "geo": {"lat": 25.031, "lng": 121.561}},
+    {"name": "信義夜咖啡", "city": "台北", "district": "信義區", "type": "cafe", "tags": ["咖啡", "夜景"],
+     "hours": "18:00–02:00", "geo": {"lat": 25.040, "lng": 121.565}},
+    {"name": "大安森林公園", "city": "台北", "district": "大安區", "type": "walk", "tags": ["公園"],
+     "hours": "依場館或店家為準", "rating": 4.8, "geo": {"lat": 25.030, "lng": 121.535}},
+    {"name": "草悟道", "city": "台中", "district": "西區", "type": "walk", "tags": ["步道"],
+     "hours": "依場館或店家為準", "geo": {"lat": None, "lng": None}},
+]
+
+
+def build(rows, **kw):
+    return Engine(FeatureStore(rows, [to_category(p) for p in rows]), **kw)
+
+
+def names(recs):
+    return [r.place["name"] for r in recs]
+
+
+def test_parse_hours():
+    assert parse_hours("全天開放") == (0, 1440)
+    assert parse_hours("05:00–22:00（以現場公告為準）") == (300, 1320)
+    assert parse_hours("18:00-02:00") == (1080, 120)
+    assert parse_hours("依場館或店家為準") == (UNKNOWN, UNKNOWN)
+    assert parse_hours(None) == (UNKNOWN, UNKNOWN)
+
+
+def test_open_now_handles_overnight_and_unknown():
+    f = build(PLACES).features
+    assert f.open_now(12 * 60).tolist() == [1.0, 1.0, 0.0, 0.5, 0.5]
+    assert f.open_now(1 * 60).tolist() == [1.0, 0.0, 1.0, 0.5, 0.5]
+
+
+def test_candidates_come_from_buckets():
+    f = build(PLACES).features
+    assert f.candidates("台北", "信義區").tolist() == [0, 1, 2]
+    assert f.candidates(district="大安區").tolist() == [3]
+    assert f.candidates("台北", types=("walk",)).tolist() == [0, 3]
+    assert f.candidates("高雄").tolist() == []
+
+
+def test_open_now_and_popularity_drive_the_ranking():
+    e = build(PLACES)
+    assert names(e.recommend(RecQuery(city="台北", district="信義區", k=3), NOON))[-1] == "信義夜咖啡"
+    assert names(e.recommend(RecQuery(city="台北", district="信義區", k=3), NIGHT))[-1] == "四四南村"
+    # rating 4.8 勝過只有內容先驗的資料
+    assert names(e.recommend(RecQuery(types=("walk",), k=1), NOON)) == ["大安森林公園"]
+
+
+def test_tag_preference_novelty_and_distance():
+    e = build(PLACES)
+    q = RecQuery(city="台北", district="信義區", tags=("咖啡",), k=1)
+    assert names(e.recommend(q, NIGHT)) == ["信義夜咖啡"]
+    q = RecQuery(city="台北", district="信義區", tags=("咖啡",), seen=("信義夜咖啡",), k=1)
+    assert names(e.recommend(q, NIGHT)) != ["信義夜咖啡"]
+    # 站在大安森林公園旁，距離壓過其他項
+    q = RecQuery(city="台北", lat=25.030, lng=121.535, k=1)
+    assert names(build(PLACES, weights=Weights(distance=5.0)).recommend(q, NOON)) == ["大安森林公園"]
+    # 沒座標的資料不會拿到距離分
+    q = RecQuery(types=("walk",), lat=24.15, lng=120.66, k=4)
+    assert names(e.recommend(q, NOON))[-1] == "草悟道"
+
+
+def _synthetic(n, seed=7):
+    rnd = random.Random(seed)
+    cities = {"台北": ["信義區", "大安區", "中山區", "萬華區"], "台中": ["西區", "南屯區"], "高雄": ["鹽埕區"]}
+    types = ["walk", "cafe", "spot", "event", "museum", "food"]
+    tags = ["夜景", "咖啡", "步道", "親子", "美食", "文化", "拍照", "古蹟", "展覽", "公園"]
+    hours = ["全天開放", "依場館或店家為準", "09:00–17:00", "18:00–02:00", "05:00–22:00"]
+    rows = []
+    for i in range(n):
+        city = rnd.choice(list(cities))
+        geo = {"lat": 25.0 + rnd.random() * 0.1, "lng": 121.5 + rnd.random() * 0.1} if rnd.random() < 0.6 else {}
+        rows.append({"name": f"place{i}", "city": city, "district": rnd.choice(cities[city]),
+                     "type": rnd.choice(types), "tags": rnd.sample(tags, rnd.randint(0, 4)),
+                     "hours": rnd.choice(hours), "geo": geo, "rating": round(rnd.uniform(2, 5), 1),
+                     "description": "x" if rnd.random() < 0.5 else ""})
+    return rows
+
+
+def _full_sort(e, q, now):
+    """對照組：逐筆算分、整體排序。"""
+    f, w = e.features, e.weights
+    minute = now.hour * 60 + now.minute
+    opened = f.open_now(minute)
+    out = []
+    for i in f.candidates(q.city, q.district, q.category, q.types):
+        p = f.places[i]
+        s = w.popularity * f.popularity[i] + w.open_now * opened[i]
+        s += w.tags / len(q.tags) * sum(t in (p.get("tags") or ()) for t in q.tags) if q.tags else 0.0
+        s -= w.novelty if p["name"] in q.seen else 0.0
+        if q.has_geo and f.valid_geo[i]:
+            d = f.distances([q.lat], [q.lng], np.asarray([i]))[0, 0]
+            s += w.distance * np.exp(-d / w.distance_scale_km)
+        out.append((-s, i))
+    return [p["name"] for p in (f.places[i] for _, i in sorted(out)[:q.k])]
+
+
+def _queries(n, seed=3):
+    rnd = random.Random(seed)
+    out = []
+    for u in range(n):
+        geo = rnd.random() < 0.5
+        out.append(RecQuery(user_id=f"U{u}", city=rnd.choice(["台北", "台中", None]),
+                            tags=tuple(rnd.sample(["夜景", "咖啡", "步道", "親子"], rnd.randint(0, 2))),
+                            lat=25.05 if geo else None, lng=121.55 if geo else None,
+                            seen=tuple(f"place{rnd.randrange(2000)}" for _ in range(5)), k=10))
+    return out
+
+
+def test_top_k_matches_full_sort_and_batch_matches_single():
+    e = build(_synthetic(2000))
+    qs = _queries(40)
+    single = [e.recommend(q, NOON) for q in qs]
+    for q, recs in zip(qs, single):
+        assert names(recs) == _full_sort(e, q, NOON)
+        assert all(a.score >= b.score for a, b in zip(recs, recs[1:]))
+    batch = e.recommend_many(qs, NOON)
+    assert [names(r) for r in batch] == [names(r) for r in single]
+
+
+def test_explore_varies_picks_but_is_seedable():
+    e = build(_synthetic(500))
+    q = RecQuery(city="台北", k=1, explore=1.0)
+    picks = {names(e.recommend(q, NOON))[0] for _ in range(30)}
+    assert len(picks) > 3
+    q = RecQuery(city="台北", k=3, explore=1.0, seed=42)
+    assert names(e.recommend(q, NOON)) == names(e.recommend(q, NOON))
+
+
+def test_temperature_sampling_spreads_picks_and_skips_seen():
+    rows = _synthetic(300)
+    for p in rows:
+        p["city"] = "台北"
+    rows[0].update(tags=["a", "b", "c", "d", "e"], description="x", image_url="x", hours="全天開放")
+    e = build(rows)
+    seen = tuple(f"place{i}" for i in range(1, 21))
+    counts = Counter(names(e.recommend(RecQuery(city="台北", k=1, temperature=0.5, seen=seen), NOON))[0]
+                     for _ in range(6000))
+    # 280 筆沒看過的候選，均勻抽樣每筆約 21 次；分數最高的也不會壟斷
+    assert counts.most_common(1)[0][1] < 120
+    assert len(counts) > 270
+    assert not set(seen) & set(counts)
+    q = RecQuery(city="台北", k=3, temperature=0.5, seed=42)
+    assert names(e.recommend(q, NOON)) == names(e.recommend(q, NOON))
+    # 候選全看過才重複
+    small = build(PLACES)
+    q = RecQuery(city="台北", district="信義區", k=1, temperature=0.5, seen=("象山步道", "四四南村"))
+    assert {names(small.recommend(q, NOON))[0] for _ in range(50)} == {"信義夜咖啡"}
+
+
+def test_temperature_scales_distance_with_the_other_scores_and_uses_one_rng():
+    e = build(PLACES, weights=Weights(distance=5.0))
+    # 溫度很低時抽樣幾乎等於照分數排；距離分若在除以溫度之後才加，就會被其他分數蓋過
+    q = RecQuery(city="台北", lat=25.030, lng=121.535, k=1, temperature=0.01)
+    assert {names(e.recommend(q, NOON))[0] for _ in range(20)} == {"大安森林公園"}
+    assert names(e.recommend_many([q], NOON)[0]) == ["大安森林公園"]
+
+    q = RecQuery(city="台北", lat=25.03, lng=121.55, k=4, explore=0.5, temperature=0.5, seed=9)
+    f = e.features
+    rows = f.candidates("台北")
+    rng = np.random.default_rng(9)
+    want = e.static_scores(NOON)[rows] + e._proximity(f.distances([q.lat], [q.lng], rows)[0])
+    want = (want + 0.5 * rng.random(len(rows))) / 0.5 + rng.gumbel(size=len(rows))
+    got = {r.place["name"]: r.score for r in e.recommend(q, NOON)}
+    assert got == {f.places[r]["name"]: round(float(s), 4) for r, s in zip(rows, want)}
+    assert e.recommend_many([q], NOON)[0] == e.recommend(q, NOON)
@@ -0,0 +1,95 @@
+import asyncio
+
+from app.services.event_dedup import EventDeduper, RotatingBloom, is_redelivery, webhook_event_id
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1_700_000_000.0
+
+    def __call__(self):
+        return self.t
+
+
+def ev(event_id, redelivery=False):
+    return {"type": "message", "webhookEventId": event_id,
+            "deliveryContext": {"isRedelivery": redelivery},
+            "source": {"type": "user", "userId": "U1"}, "message": {"type": "text", "text": "hi"}}
+
+
+def make(clock, shared=None, exact_ttl=300, window=3600):
+    bloom = RotatingBloom(capacity=1000, buckets=6, bucket_seconds=window / 6, clock=clock)
+    return EventDeduper(bloom, exact_ttl=exact_ttl, shared=shared, clock=clock)
+
+
+def dup(d, e):
+    return asyncio.run(d.is_duplicate(e))
+
+
+def test_event_fields():
+    assert webhook_event_id(ev("01H")) == "01H" and is_redelivery(ev("01H", True))
+    assert webhook_event_id({"type": "message"}) is None and not is_redelivery({})
+
+
+def test_exact_window_drops_repeats_and_events_without_id_pass():
+    d = make(Clock())
+    assert not dup(d, ev("A"))
+    assert dup(d, ev("A", redelivery=True))
+    assert dup(d, ev("A"))
+    assert not dup(d, {"type": "message"}) and not dup(d, {"type": "message"})
+    s = d.stats()
+    assert (s["checked"], s["dropped"], s["dropped_by"]["exact"], s["redeliveries"]) == (3, 2, 2, 1)
+
+
+def test_bloom_covers_redeliveries_after_exact_window_until_it_rotates_out():
+    clock = Clock()
+    d = make(clock)
+    assert not dup(d, ev("A"))
+    clock.t += 1200                       # 超過精確視窗，仍在 Bloom 的 window 內
+    assert dup(d, ev("A", redelivery=True))
+    assert d.stats()["dropped_by"]["bloom"] == 1
+    clock.t += 1200
+    # 沒標記重送的事件不會只因 Bloom 命中被丟掉
+    assert not dup(d, ev("B"))
+    clock.t += 3 * 3600                   # 所有時間桶都輪替過
+    assert not dup(d, ev("A", redelivery=True))
+
+
+def test_bloom_false_positive_rate_and_fixed_memory():
+    clock = Clock()
+    bloom = RotatingBloom(capacity=10_000, fp_rate=1e-3, buckets=3, bucket_seconds=600, clock=clock)
+    size = bloom.stats()["bytes"]
+    for i in range(10_000):
+        bloom.add(f"seen-{i}")
+    assert all(f"seen-{i}" in bloom for i in range(0, 10_000, 97))
+    fp = sum(f"new-{i}" in bloom for i in range(20_000)) / 20_000
+    assert fp < 3e-3, fp
+    assert bloom.stats()["bytes"] == size
+
+
+def test_shared_backend_claims_across_instances_and_errors_degrade():
+    class FakeRedis:
+        def __init__(self):
+            self.keys = set()
+
+        async def claim(self, event_id):
+            if event_id in self.keys:
+                return False
+            self.keys.add(event_id)
+            return True
+
+    shared = FakeRedis()
+    a, b = make(Clock(), shared), make(Clock(), shared)
+    assert not dup(a, ev("X"))
+    assert dup(b, ev("X", redelivery=True))     # 另一個 instance 已經處理過
+    assert b.stats()["dropped_by"]["shared"] == 1
+
+    class Down:
+        async def claim(self, event_id):
+            raise ConnectionError("down")
+
+    c = make(Clock(), Down())
+    assert not dup(c, ev("Y"))
+    assert dup(c, ev("Y"))                       # 本機仍然記得
+    assert c.stats()["errors"] == 1
+
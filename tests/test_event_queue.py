@@ -0,0 +1,131 @@
+import asyncio
+
+from app.services.event_queue import EventDispatcher, event_user_id
+
+
+def ev(user, n):
+    return {"type": "message", "source": {"type": "user", "userId": user},
+            "message": {"type": "text", "text": str(n)}}
+
+
+def test_event_user_id():
+    assert event_user_id(ev("U1", 0)) == "U1"
+    assert event_user_id({"type": "follow", "source": {"type": "group"}}) is None
+
+
+def test_per_user_order_is_kept_while_users_interleave():
+    done = []
+
+    async def handler(e):
+        await asyncio.sleep(0.001 * (int(e["message"]["text"]) % 3))
+        done.append((e["source"]["userId"], int(e["message"]["text"])))
+
+    async def go():
+        d = EventDispatcher(handler, workers=3, queue_size=100)
+        d.start()
+        for i in range(10):
+            for u in ("U1", "U2", "U3"):
+                assert d.submit(ev(u, i))
+        await d.stop()
+        return d
+
+    d = asyncio.run(go())
+    for u in ("U1", "U2", "U3"):
+        assert [n for uid, n in done if uid == u] == list(range(10))
+    assert d.stats()["processed"] == 30 and d.depth == 0 and d.stats()["active_users"] == 0
+
+
+def test_slow_user_does_not_stall_other_users():
+    release = None
+    done = []
+
+    async def handler(e):
+        if e["source"]["userId"] == "SLOW":
+            await release.wait()
+        done.append(e["source"]["userId"])
+
+    async def go():
+        nonlocal release
+        release = asyncio.Event()
+        d = EventDispatcher(handler, workers=2, queue_size=100)
+        d.start()
+        d.submit(ev("SLOW", 0))
+        d.submit(ev("SLOW", 1))
+        for u in ("U1", "U2", "U3"):
+            d.submit(ev(u, 0))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        # 兩個 handler 名額：SLOW 佔一個，其他人輪流用另一個
+        assert sorted(done) == ["U1", "U2", "U3"]
+        assert d.stats()["busy_workers"] == 1 and d.depth == 2
+        release.set()
+        await d.stop()
+        return d
+
+    asyncio.run(go())
+    assert done[-2:] == ["SLOW", "SLOW"]
+
+
+def test_full_backlog_drops_without_running_inline():
+    calls = []
+    gate = None
+
+    async def handler(e):
+        calls.append(e["message"]["text"])
+        await gate.wait()
+
+    async def go():
+        nonlocal gate
+        gate = asyncio.Event()
+        d = EventDispatcher(handler, workers=1, queue_size=2)
+        assert not d.submit(ev("U1", 0))          # 未啟動：交回呼叫端
+        d.start()
+        assert d.submit(ev("U1", 1)) and d.submit(ev("U1", 2))
+        assert not d.submit(ev("U1", 3))          # 積壓滿了：丟掉，不會在這裡執行
+        await asyncio.sleep(0)
+        assert calls == ["1"]
+        gate.set()
+        await d.stop()
+        return d
+
+    d = asyncio.run(go())
+    assert calls == ["1", "2"]
+    s = d.stats()
+    assert (s["enqueued"], s["processed"], s["rejected"]) == (2, 2, 1)
+
+
+def test_handler_errors_do_not_break_the_chain():
+    done = []
+
+    async def handler(e):
+        if e["message"]["text"] == "0":
+            raise RuntimeError("boom")
+        done.append(e["message"]["text"])
+
+    async def go():
+        d = EventDispatcher(handler, workers=1)
+        d.start()
+        for i in range(3):
+            d.submit(ev("U1", i))
+        await d.stop()
+        return d
+
+    d = asyncio.run(go())
+    assert done == ["1", "2"] and d.stats()["failed"] == 1
+
+
+def test_stop_cancels_what_does_not_drain_in_time():
+    async def handler(e):
+        await asyncio.sleep(10)
+
+    async def go():
+        d = EventDispatcher(handler, workers=1)
+        d.start()
+        d.submit(ev("U1", 0))
+        d.submit(ev("U1", 1))
+        await asyncio.sleep(0)
+        await d.stop(drain_timeout=0.01)
+        return d
+
+    d = asyncio.run(go())
+    assert d.depth == 0 and not d.running and d.stats()["active_users"] == 0
@@ -0,0 +1,74 @@
+from app.handlers.flex_cache import FlexCache
+
+
+def place(name):
+    return {"name": name, "city": "台北", "district": "信義區", "type": "spot", "tags": [],
+            "geo": {"lat": None, "lng": None},
+            "gmaps": f"https://www.google.com/maps/search/?api=1&query={name}"}
+
+
+class Versions:
+    def __init__(self):
+        self.v = 1
+
+    def __call__(self):
+        return self.v
+
+
+def page(cache, items, calls, version=None, page_no=1):
+    def items_fn():
+        calls.append(page_no)
+        return items
+    return cache.page_message("台北", "信義區", "landmark", page_no, 6, items_fn, version=version)
+
+
+def test_pages_and_bubbles_are_reused_within_a_version():
+    cache = FlexCache(Versions())
+    items, calls = [place("a"), place("b")], []
+    msg = page(cache, items, calls)
+    assert msg["contents"]["type"] == "carousel" and len(msg["contents"]["contents"]) == 2
+    assert page(cache, items, calls) is msg and calls == [1]
+    assert cache.bubble(items[0]) is msg["contents"]["contents"][0]
+    assert page(cache, [place("c")], calls, page_no=2)["contents"]["type"] == "bubble"
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["pages"], s["bubbles"]) == (1, 2, 2, 3)
+
+
+def test_empty_pages_are_not_cached():
+    cache = FlexCache(Versions())
+    calls = []
+    assert page(cache, [], calls) is None and page(cache, [], calls) is None
+    assert calls == [1, 1] and cache.stats()["pages"] == 0
+
+
+def test_new_version_clears_everything():
+    versions = Versions()
+    cache = FlexCache(versions)
+    p, calls = place("a"), []
+    first = page(cache, [p], calls)
+    b = cache.bubble(p)
+    versions.v = 2                              # 熱更新換版
+    second = page(cache, [p], calls)
+    assert second is not first and second == first and calls == [1, 1]
+    assert cache.bubble(p) is not b
+    assert cache.stats()["version"] == 2 and cache.stats()["pages"] == 1
+
+
+def test_requests_holding_an_old_version_do_not_write_the_cache():
+    versions = Versions()
+    cache = FlexCache(versions)
+    p, calls = place("a"), []
+    versions.v = 2
+    current = page(cache, [p], calls, version=2)
+    stale = page(cache, [place("old")], calls, version=1)   # 換版前就開始的請求
+    assert stale is not None and stale["contents"]["hero"] != current["contents"]["hero"]
+    assert page(cache, [p], calls, version=2) is current
+    assert cache.bubble(place("old"), version=1) is not cache.bubble(place("old"), version=1)
+    assert cache.stats()["version"] == 2 and cache.stats()["bubbles"] == 1 and calls == [1, 1]
+
+
+def test_bubble_cache_is_keyed_by_object_identity():
+    cache = FlexCache(Versions())
+    a, same_fields = place("a"), place("a")
+    assert cache.bubble(a) is cache.bubble(a)
+    assert cache.bubble(same_fields) is not cache.bubble(a)
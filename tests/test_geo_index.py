@@ -0,0 +1,110 @@
+import random
+import time
+
+from app.services.geo_index import GeoIndex, haversine
+
+
+def synth(n, seed=5):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        geo = {"lat": 25.0 + rnd.uniform(-0.3, 0.3), "lng": 121.5 + rnd.uniform(-0.3, 0.3)}
+        if i % 17 == 0:
+            geo = {"lat": None, "lng": None}
+        elif i % 19 == 0:
+            geo = {"lat": str(geo["lat"]), "lng": ""}
+        rows.append({"name": f"p{i}", "type": ("walk", "cafe", "spot")[i % 3], "geo": geo})
+    return rows
+
+
+def brute(rows, t, lat, lng):
+    out = []
+    for p in rows:
+        g = p["geo"]
+        if p["type"] == t and g["lat"] not in (None, "") and g["lng"] not in (None, ""):
+            out.append((haversine(lat, lng, float(g["lat"]), float(g["lng"])), p["name"]))
+    return sorted(out)
+
+
+def test_nearest_matches_brute_force_and_skips_rows_without_coordinates():
+    rows = synth(600)
+    idx = GeoIndex(rows, cell_deg=0.02)
+    assert idx.size == sum(1 for i in range(600) if i % 17 and i % 19)
+    rnd = random.Random(1)
+    # 有些查詢點落在資料範圍外，網格要能一路擴到有資料的格子
+    for lat, lng in [(25.0, 121.5), (24.2, 120.9), (26.0, 122.4)] + [
+            (25 + rnd.uniform(-0.4, 0.4), 121.5 + rnd.uniform(-0.4, 0.4)) for _ in range(20)]:
+        for t in ("walk", "cafe"):
+            want = brute(rows, t, lat, lng)
+            got = idx.nearest(t, lat, lng, k=5)
+            assert [p["name"] for _, p in got] == [n for _, n in want[:5]]
+            assert [round(d, 9) for d, _ in got] == [round(d, 9) for d, _ in want[:5]]
+            assert idx.nearest_one(t, lat, lng)["name"] == want[0][1]
+
+
+def test_within_radius_and_limit():
+    rows = synth(600)
+    idx = GeoIndex(rows)
+    want = [(d, n) for d, n in brute(rows, "spot", 25.0, 121.5) if d <= 8.0]
+    got = idx.within("spot", 25.0, 121.5, 8.0)
+    assert want and [p["name"] for _, p in got] == [n for _, n in want]
+    assert [p["name"] for _, p in idx.within("spot", 25.0, 121.5, 8.0, limit=3)] == [n for _, n in want[:3]]
+    assert idx.within("spot", 25.0, 121.5, -1) == []
+
+
+def test_unknown_type_small_k_and_empty_index():
+    rows = synth(30)
+    idx = GeoIndex(rows)
+    assert set(idx.types()) == {"walk", "cafe", "spot"}
+    assert idx.nearest("event", 25.0, 121.5) == [] and idx.nearest_one("event", 25.0, 121.5) is None
+    assert idx.nearest("walk", 25.0, 121.5, k=0) == []
+    assert len(idx.nearest("walk", 25.0, 121.5, k=100)) == len(brute(rows, "walk", 25.0, 121.5))
+    assert GeoIndex([]).nearest_one("walk", 25.0, 121.5) is None
+
+
+class CountingCells(dict):
+    def __init__(self, cells):
+        super().__init__(cells)
+        self.lookups = 0
+
+    def get(self, key, default=None):
+        self.lookups += 1
+        return super().get(key, default)
+
+
+def test_queries_far_from_the_data_stay_cheap_and_exact():
+    rows = synth(600)
+    idx = GeoIndex(rows)
+    cells = idx._grid["walk"] = CountingCells(idx._grid["walk"])
+    occupied_box = 61 * 61      # 0.6 度見方、每格 0.01 度
+    for lat, lng in [(48.85, 2.35), (35.68, 139.76), (22.3, 114.2), (-33.9, 151.2), (25.2, 121.95)]:
+        cells.lookups = 0
+        t0 = time.perf_counter()
+        got = idx.nearest("walk", lat, lng, k=3)
+        assert time.perf_counter() - t0 < 1.0
+        assert cells.lookups <= occupied_box      # 不再隨距離平方成長（巴黎原本要查上億格）
+        assert [p["name"] for _, p in got] == [n for _, n in brute(rows, "walk", lat, lng)[:3]]
+        near = idx.within("walk", lat, lng, 30.0)
+        assert [p["name"] for _, p in near] == [n for d, n in brute(rows, "walk", lat, lng) if d <= 30.0]
+    assert idx.within("walk", 48.85, 2.35, 10_000.0)       # 半徑夠大也照樣找得到
+
+
+def test_ring_stop_bound_holds_for_queries_north_of_the_data():
+    # 資料最北到北緯 60 度，查詢點可能更北：經度 1 度在查詢點那裡更窄，下界要依查詢點的緯度估
+    rnd = random.Random(3)
+    rows = [{"name": f"p{i}", "type": "walk",
+             "geo": {"lat": rnd.uniform(55.0, 60.0), "lng": rnd.uniform(0.0, 40.0)}} for i in range(300)]
+    idx = GeoIndex(rows, cell_deg=0.5)
+    for _ in range(20_000):
+        lat, lng = rnd.uniform(55.0, 63.0), rnd.uniform(0.0, 40.0)
+        g = rows[rnd.randrange(len(rows))]["geo"]
+        (cx, cy), (px, py) = idx._cell(lat, lng), idx._cell(g["lat"], g["lng"])
+        ring = max(abs(px - cx), abs(py - cy))
+        if ring:
+            # 第 ring 圈的點至少跟查詢點差 ring - 1 格
+            assert haversine(lat, lng, g["lat"], g["lng"]) >= idx._gap_km(ring - 1, idx._cos_floor(lat)) - 1e-9
+    for _ in range(50):
+        lat, lng = rnd.uniform(60.0, 63.0), rnd.uniform(0.0, 40.0)
+        want = brute(rows, "walk", lat, lng)
+        assert [p["name"] for _, p in idx.nearest("walk", lat, lng, k=3)] == [n for _, n in want[:3]]
+        assert [p["name"] for _, p in idx.within("walk", lat, lng, 150.0)] == [n for d, n in want if d <= 150.0]
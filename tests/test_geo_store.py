@@ -0,0 +1,78 @@
+import math
+import random
+
+import numpy as np
+
+from app.services import geo_store
+from app.services.geo_index import haversine
+from app.services.geo_store import GeoStore, haversine_np
+from app.utils.category import to_category
+
+
+def synth(n, seed=11):
+    rnd = random.Random(seed)
+    types = ("walk", "museum", "food", "spot")
+    rows = []
+    for i in range(n):
+        geo = {"lat": 25.0 + rnd.uniform(-0.5, 0.5), "lng": 121.5 + rnd.uniform(-0.5, 0.5)}
+        if i % 13 == 0:
+            geo = {"lat": None, "lng": None}
+        rows.append({"name": f"p{i}", "type": types[i % 4], "tags": [], "geo": geo})
+    return rows
+
+
+def brute(rows, lat, lng, keep=lambda p: True):
+    return sorted((haversine(lat, lng, p["geo"]["lat"], p["geo"]["lng"]), i)
+                  for i, p in enumerate(rows) if p["geo"]["lat"] is not None and keep(p))
+
+
+def test_haversine_np_matches_scalar_and_broadcasts():
+    lats = np.array([24.9, 25.0, 25.3])
+    d = haversine_np(25.0, 121.5, lats, 121.6)
+    assert np.allclose(d, [haversine(25.0, 121.5, x, 121.6) for x in lats])
+    assert haversine_np(25.0, 121.5, 25.0, 121.5) == 0.0
+
+
+def test_missing_coordinates_are_masked_as_inf():
+    rows = synth(40)
+    gs = GeoStore(rows)
+    d = gs.distances(25.0, 121.5)
+    assert d.shape == (40,) and gs.size == 40 - len(range(0, 40, 13))
+    assert all(math.isinf(d[i]) for i in range(0, 40, 13))
+    assert gs.distances([25.0, 25.1], [121.5, 121.4]).shape == (2, 40)
+    assert GeoStore([]).nearest(25.0, 121.5) == []
+
+
+def test_nearest_and_per_category_match_brute_force():
+    rows = synth(400)
+    gs = GeoStore(rows)
+    want = brute(rows, 25.1, 121.4)
+    got = gs.nearest(25.1, 121.4, k=7)
+    assert [p["name"] for _, p in got] == [rows[i]["name"] for _, i in want[:7]]
+    assert np.allclose([d for d, _ in got], [d for d, _ in want[:7]])
+
+    walks = brute(rows, 25.1, 121.4, lambda p: p["type"] == "walk")
+    assert [p["name"] for _, p in gs.nearest(25.1, 121.4, k=3, types=["walk"])] == [rows[i]["name"] for _, i in walks[:3]]
+    assert gs.nearest(25.1, 121.4, types=["nope"]) == []
+
+    groups = gs.nearest_per_category(25.1, 121.4, n=2)
+    assert set(groups) == {to_category(p) for p in rows}
+    for cat, hits in groups.items():
+        best = brute(rows, 25.1, 121.4, lambda p: to_category(p) == cat)[:2]
+        assert [p["name"] for _, p in hits] == [rows[i]["name"] for _, i in best]
+    assert set(gs.nearest_per_category(25.1, 121.4, categories=["museum"])) == {"museum"}
+
+
+def test_rank_many_matches_single_queries_across_chunks(monkeypatch):
+    rows = synth(300)
+    gs = GeoStore(rows)
+    rnd = random.Random(2)
+    lats = [25 + rnd.uniform(-0.5, 0.5) for _ in range(25)]
+    lngs = [121.5 + rnd.uniform(-0.5, 0.5) for _ in range(25)]
+    monkeypatch.setattr(geo_store, "_MAX_MATRIX_CELLS", 300 * 4)   # 每塊 4 位使用者
+    ranked = gs.rank_many(lats, lngs, k=5, categories=["museum", "food_market"])
+    assert len(ranked) == 25
+    for lat, lng, idx in zip(lats, lngs, ranked):
+        single = gs.nearest(lat, lng, k=5, categories=["museum", "food_market"])
+        assert [rows[i]["name"] for i in idx] == [p["name"] for _, p in single]
+    assert gs.rank_many([], []) == [] and gs.rank_many([25.0], [121.5], types=["nope"]) == [[]]
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from app.services.image_compose import LADDER_SIZES, derivative_path, ensure_resized, generate_derivatives
+
+
+def _grid(tmp_path):
+    im = Image.new("RGB", (1040, 1040), (255, 255, 255))
+    for i, color in enumerate([(200, 40, 40), (40, 160, 60), (30, 60, 200)]):
+        im.paste(Image.new("RGB", (520, 346), color), ((i % 2) * 520, (i // 2) * 346))
+    im.save(tmp_path / "categories_1040_grid.png")
+
+
+def test_one_pass_builds_every_line_size(tmp_path):
+    _grid(tmp_path)
+    report = generate_derivatives(str(tmp_path))
+    assert set(report["sizes"]) == set(LADDER_SIZES)
+    assert report["bytes"] <= report["baseline_bytes"]
+    for size in LADDER_SIZES:
+        with Image.open(derivative_path(size, str(tmp_path))) as im:
+            assert im.size == (size, size)
+    assert generate_derivatives(str(tmp_path)) == {"skipped": True}
+    assert not list(tmp_path.glob("*.tmp*"))
+
+
+def test_concurrent_first_hits_share_one_generation(tmp_path):
+    _grid(tmp_path)
+    with ThreadPoolExecutor(8) as ex:
+        paths = list(ex.map(lambda s: ensure_resized(s, str(tmp_path)), [240, 300, 460, 700, 1040] * 4))
+    assert len(set(paths)) == len(LADDER_SIZES)
+    try:
+        derivative_path(1000, str(tmp_path))
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("unsupported size must not resolve")
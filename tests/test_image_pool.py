@@ -0,0 +1,100 @@
+import asyncio
+import os
+import signal
+import time
+
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services.image_pool import ImageWorkPool
+
+
+def slow_echo(value, delay: float, calls):
+    calls.append(value)
+    time.sleep(delay)
+    return value
+
+
+def pid():
+    return os.getpid()
+
+
+def die_once(marker):
+    # 第一次執行時讓 worker process 直接死掉（模擬 OOM / segfault），重跑時正常回傳
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def always_die():
+    os._exit(1)
+
+
+def test_same_key_runs_once_while_in_flight():
+    pool = ImageWorkPool(workers=0)
+    calls = []
+    try:
+        futs = [pool.submit(("ladder", "/tmp/x"), slow_echo, "a", 0.2, calls) for _ in range(5)]
+        assert len({id(f) for f in futs}) == 1
+        assert [f.result() for f in futs] == ["a"] * 5
+        assert calls == ["a"]
+        assert pool.stats()["coalesced"] == 4
+
+        # 完成後同一個 key 可以再跑
+        assert pool.run_sync(("ladder", "/tmp/x"), slow_echo, "b", 0, calls) == "b"
+        assert calls == ["a", "b"] and pool.stats()["in_flight"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_async_run_awaits_without_blocking_loop():
+    pool = ImageWorkPool(workers=0)
+    calls = []
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.create_task(ticker())
+        result = await pool.run("k", slow_echo, "v", 0.2, calls)
+        t.cancel()
+        return result, ticks
+
+    try:
+        result, ticks = asyncio.run(main())
+        assert result == "v" and ticks >= 10
+    finally:
+        pool.shutdown()
+
+
+
+def test_killed_worker_is_replaced_and_next_request_succeeds():
+    pool = ImageWorkPool(workers=1)
+    try:
+        first = pool.run_sync("pid", pid)
+        os.kill(first, signal.SIGKILL)
+        second = pool.run_sync("pid", pid)
+        assert second != first and pool.stats()["restarts"] == 1
+        assert pool.run_sync("pid", pid) == second
+    finally:
+        pool.shutdown()
+
+
+def test_job_that_kills_its_worker_is_retried_once(tmp_path):
+    pool = ImageWorkPool(workers=1)
+    try:
+        assert pool.run_sync("grid", die_once, str(tmp_path / "died")) == "ok"
+        assert pool.stats()["restarts"] == 1 and pool.stats()["failed"] == 0
+        with pytest.raises(BrokenProcessPool):   # 重跑一次還是死掉就交給呼叫者
+            pool.run_sync("bad", always_die)
+        assert pool.stats()["restarts"] == 3 and pool.stats()["failed"] == 1
+        assert pool.run_sync("pid", pid) > 0 and pool.stats()["in_flight"] == 0
+    finally:
+        pool.shutdown()
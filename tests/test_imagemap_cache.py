@@ -0,0 +1,64 @@
+import os
+import struct
+import threading
+import zlib
+
+from app.services.imagemap_cache import EncodedImageCache, etag_matches
+
+
+def rgb_png(w: int, h: int, seed: int = 0) -> bytes:
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\0" + bytes([seed % 256, 0, 0]) * w for _ in range(h))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def test_bytes_are_loaded_once_and_reloaded_when_file_changes(tmp_path):
+    calls = []
+
+    def resolve(size):
+        calls.append(size)
+        p = tmp_path / f"categories_{size}.png"
+        if not p.exists():
+            p.write_bytes(rgb_png(4, 4))
+        return str(p)
+
+    cache = EncodedImageCache(resolve)
+    a = cache.get(460)
+    assert a.data == (tmp_path / "categories_460.png").read_bytes()
+    assert cache.get(460) is a and calls == [460] and cache.hits == 1
+
+    p = tmp_path / "categories_460.png"
+    p.write_bytes(rgb_png(4, 4, seed=9))
+    os.utime(p, ns=(a.mtime_ns + 10**9, a.mtime_ns + 10**9))
+    b = cache.get(460)
+    assert b.etag != a.etag and calls == [460, 460]
+
+
+def test_concurrent_first_hits_load_once(tmp_path):
+    p = tmp_path / "x.png"
+    p.write_bytes(rgb_png(2, 2))
+    gate = threading.Event()
+    loads = []
+
+    def encode(path):
+        loads.append(path)
+        gate.wait(1)
+        return b"png"
+
+    cache = EncodedImageCache(lambda size: str(p), encode=encode)
+    threads = [threading.Thread(target=cache.get, args=(700,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1 and cache.stats()["loads"] == 1
+
+
+def test_etag_matching():
+    tag = '"abc"'
+    assert etag_matches('"abc"', tag) and etag_matches('W/"abc"', tag)
+    assert etag_matches('"x", "abc"', tag) and etag_matches("*", tag)
+    assert not etag_matches(None, tag) and not etag_matches('"abcd"', tag)
@@ -0,0 +1,52 @@
+import pytest
+
+from app.services.imagemap_layout import CATEGORY_GRID, LAYOUTS, get_layout, grid_layout, register_layout
+
+
+def test_default_layout_matches_previous_hardcoded_rects():
+    assert [(t.x, t.y, t.width, t.height, t.category) for t in CATEGORY_GRID.tiles] == [
+        (0, 0, 520, 346, "landmark"),
+        (520, 0, 520, 346, "museum"),
+        (0, 346, 520, 346, "park_walk"),
+        (520, 346, 520, 346, "food_market"),
+        (0, 692, 520, 346, "temple_history"),
+        (520, 692, 520, 346, "family_fun"),
+    ]
+    assert CATEGORY_GRID.sources == [f"categories_1040_{i}.png" for i in range(6)]
+
+
+def test_message_is_line_api_imagemap_json():
+    msg = get_layout().message("台北", "大安區", "https://x/imgmap/categories/v1")
+    assert msg["type"] == "imagemap"
+    assert msg["baseUrl"] == "https://x/imgmap/categories/v1"
+    assert msg["altText"] == "台北大安區｜請選擇類別"
+    assert msg["baseSize"] == {"width": 1040, "height": 1040}
+    assert msg["actions"][3] == {"type": "message", "area": {"x": 520, "y": 346, "width": 520, "height": 346},
+                                 "text": "CAT|台北|大安區|food_market|1"}
+
+    # 預先算好的片段共用，只有 text 每次不同
+    other = CATEGORY_GRID.message("高雄", "鼓山區", "u")
+    assert other["actions"][0]["area"] is msg["actions"][0]["area"]
+    assert other["actions"][0]["text"] == "CAT|高雄|鼓山區|landmark|1"
+
+
+def test_nine_tile_layout_can_be_registered():
+    cats = ["landmark", "museum", "park_walk", "food_market", "temple_history", "family_fun"] * 2
+    nine = grid_layout("nine", [(c, f"tile_{i}.png") for i, c in enumerate(cats[:9])], cols=3, cell_w=346, cell_h=346)
+    try:
+        register_layout(nine)
+        msg = get_layout("nine").message("台中", "西屯區", "u")
+        assert len(msg["actions"]) == 9
+        assert msg["actions"][8]["area"] == {"x": 692, "y": 692, "width": 346, "height": 346}
+        assert nine.key != CATEGORY_GRID.key
+    finally:
+        LAYOUTS.pop("nine", None)
+
+
+def test_invalid_layouts_are_rejected():
+    with pytest.raises(ValueError):
+        grid_layout("wide", [("landmark", "a.png")] * 3, cols=3, cell_w=520, cell_h=346)
+    with pytest.raises(ValueError):
+        register_layout(grid_layout("bad", [("nope", "a.png")], cols=1, cell_w=100, cell_h=100))
+    with pytest.raises(KeyError):
+        get_layout("missing")
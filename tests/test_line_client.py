@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.handlers.replies import safe_reply_or_push
+from app.services.line_client import LineApiError, LineClient
+from tests.line_stub import LineStub
+
+
+def _client(stub: LineStub, **kw) -> LineClient:
+    kw.setdefault("backoff_base", 0.0)
+    return LineClient("token", base_url="http://line-stub", transport=stub.transport(), **kw)
+
+
+def _text(t: str) -> dict:
+    return {"type": "text", "text": t}
+
+
+def test_retries_on_429_and_5xx():
+    stub = LineStub()
+    stub.failures = [429, 503]
+
+    async def run():
+        line = _client(stub)
+        await line.push("U1", [_text("hi")])
+        await line.aclose()
+        return line
+
+    line = asyncio.run(run())
+    pushes = stub.of_kind("push")
+    assert len(pushes) == 3
+    assert line.retries == 2
+    # 重試沿用同一把 retry key，LINE 端才能去重
+    assert len({c["headers"]["x-line-retry-key"] for c in pushes}) == 1
+
+
+def test_gives_up_after_max_retries():
+    stub = LineStub()
+    stub.failures = [500, 500, 500]
+
+    async def run():
+        line = _client(stub, max_retries=2)
+        try:
+            with pytest.raises(LineApiError) as ei:
+                await line.push("U1", [_text("hi")])
+            return ei.value
+        finally:
+            await line.aclose()
+
+    assert asyncio.run(run()).status == 500
+    assert len(stub.calls) == 3
+
+
+def test_same_reply_token_is_coalesced():
+    stub = LineStub()
+
+    async def run():
+        line = _client(stub)
+        await asyncio.gather(
+            line.reply("tok", [_text("a")]),
+            line.reply("tok", [_text("b"), _text("c")]),
+        )
+        await line.aclose()
+
+    asyncio.run(run())
+    replies = stub.of_kind("reply")
+    assert len(replies) == 1
+    assert [m["text"] for m in replies[0]["body"]["messages"]] == ["a", "b", "c"]
+
+
+def test_messages_over_reply_limit_go_to_push():
+    stub = LineStub()
+
+    async def run():
+        line = _client(stub)
+        await line.reply("tok", [_text(str(i)) for i in range(7)], user_id="U1")
+        await line.aclose()
+
+    asyncio.run(run())
+    assert len(stub.of_kind("reply")[0]["body"]["messages"]) == 5
+    assert [m["text"] for m in stub.of_kind("push")[0]["body"]["messages"]] == ["5", "6"]
+
+
+def test_messages_over_reply_limit_without_user_id_are_dropped_not_raised():
+    stub = LineStub()
+
+    async def run():
+        line = _client(stub)
+        await line.reply("tok", [_text(str(i)) for i in range(7)])   # 不丟例外：token 已用掉，重試也沒用
+        await line.aclose()
+        return line.stats()
+
+    assert asyncio.run(run())["dropped"] == 2
+    assert [c["kind"] for c in stub.calls] == ["reply"]
+    assert [m["text"] for m in stub.of_kind("reply")[0]["body"]["messages"]] == ["0", "1", "2", "3", "4"]
+
+
+def test_safe_reply_falls_back_to_push_on_invalid_token():
+    stub = LineStub()
+    stub.failures = [400]
+    ev = {"source": {"userId": "U1"}}
+
+    async def run():
+        line = _client(stub)
+        sent = await safe_reply_or_push(line, ev, "expired", [_text("hi")])
+        await line.aclose()
+        return sent
+
+    assert asyncio.run(run()) is True
+    assert [c["kind"] for c in stub.calls] == ["reply", "push"]
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.model_pool import ModelPool, PoolBusy
+
+
+def test_models_are_built_once_per_system_instruction():
+    built = []
+    pool = ModelPool(lambda system: built.append(system) or object(), concurrency=1)
+    try:
+        assert pool.model(None) is pool.model(None)
+        assert pool.model("翻譯") is not pool.model(None)
+        assert built == [None, "翻譯"] and pool.stats()["models"] == 2
+    finally:
+        pool.shutdown()
+
+
+def test_calls_run_on_pool_threads_up_to_concurrency():
+    active, peak, names = 0, 0, set()
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def call(i):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+            names.add(threading.current_thread().name)
+        release.wait(5)
+        with lock:
+            active -= 1
+        return i
+
+    async def go(pool):
+        tasks = [asyncio.create_task(pool.run(call, i)) for i in range(6)]
+        for _ in range(50):
+            await asyncio.sleep(0.005)
+            if pool.in_flight == 2 and pool.waiting == 4:
+                break
+        assert (pool.in_flight, pool.waiting) == (2, 4)
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    pool = ModelPool(lambda s: None, concurrency=2, max_waiting=10, name="t")
+    try:
+        assert asyncio.run(go(pool)) == list(range(6))
+    finally:
+        pool.shutdown()
+    assert peak == 2 and all(n.startswith("t-pool") for n in names)
+    s = pool.stats()
+    assert (s["calls"], s["in_flight"], s["waiting"], s["rejected"]) == (6, 0, 0, 0)
+
+
+def test_full_waiting_line_raises_pool_busy_and_frees_its_place():
+    async def go(pool):
+        gate = asyncio.Event()
+
+        async def hold():
+            async with pool.slot():
+                await gate.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(3)]   # 1 個執行中、2 個排隊
+        await asyncio.sleep(0)
+        assert (pool.in_flight, pool.waiting) == (1, 2)
+        with pytest.raises(PoolBusy):
+            async with pool.slot():
+                pass
+        gate.set()
+        await asyncio.gather(*holders)
+        async with pool.slot():   # 排隊消化後又能進來
+            pass
+
+    pool = ModelPool(lambda s: None, concurrency=1, max_waiting=2)
+    try:
+        asyncio.run(go(pool))
+    finally:
+        pool.shutdown()
+    s = pool.stats()
+    assert (s["calls"], s["rejected"], s["waiting"]) == (4, 1, 0)
+
+
+def test_cancelled_waiter_and_failing_call_release_their_slot():
+    def boom():
+        raise ValueError("sdk error")
+
+    async def go(pool):
+        gate = asyncio.Event()
+
+        async def hold():
+            async with pool.slot():
+                await gate.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(pool.run(lambda: 1))
+        await asyncio.sleep(0)
+        assert pool.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert pool.waiting == 0
+        gate.set()
+        await holder
+        with pytest.raises(ValueError):
+            await pool.run(boom)
+        assert pool.in_flight == 0
+        return await pool.run(lambda: "ok")
+
+    pool = ModelPool(lambda s: None, concurrency=1, max_waiting=1)
+    try:
+        assert asyncio.run(go(pool)) == "ok"
+    finally:
+        pool.shutdown()
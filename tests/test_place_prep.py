@@ -0,0 +1,70 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from app.services.place_prep import PrepStats, iter_json_array, iter_source, prepare_files, prepare_place
+from app.utils.links import is_canonical_gmaps
+
+DATA = Path(__file__).resolve().parents[1] / "app" / "data"
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 1 << 16])
+def test_stream_parser_handles_chunk_boundaries(chunk):
+    items = [{"a": 1, "s": "台北,]"}, 12345, [1, 2], "x", None, {"n": -1.5e3}]
+    text = json.dumps(items, indent=2, ensure_ascii=False)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk)) == items
+    assert list(iter_json_array(io.StringIO(" [ ] "), chunk_size=chunk)) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1}'), chunk_size=chunk))
+
+
+def test_prepare_place_builds_links_and_validates_images():
+    p = prepare_place({"name": "甲", "place_id": "Pid", "gmaps": "https://maps.app.goo.gl/?q=x",
+                       "geo": {"lat": None, "lng": None}, "image_url": " http://img.example/a.jpg "})
+    assert "query_place_id=Pid" in p["gmaps"] and p["image_url"] == "https://img.example/a.jpg"
+
+    p = prepare_place({"name": "乙", "geo": {"lat": "25.0", "lng": 121.5}, "image_url": "/static/a.png"})
+    assert p["gmaps"].endswith("query=25.0000000%2C121.5000000") and "image_url" not in p
+
+
+def test_non_string_image_urls_are_dropped_and_counted():
+    stats = PrepStats()
+    rows = [prepare_place({"name": n, "image_url": v}, stats)
+            for n, v in [("a", 404), ("b", ["https://x/a.jpg"]), ("c", None), ("d", "  "), ("e", 0)]]
+    assert all("image_url" not in r for r in rows)
+    assert stats.images_dropped == 2 and stats.images_upgraded == 0
+
+
+def test_prepared_files_are_canonical_and_idempotent(tmp_path):
+    stats = prepare_files([DATA / "taichung.json", DATA / "taipei.csv"], tmp_path / "a")
+    assert stats.rows == 145 + 148 and stats.rows_per_s > 0
+    a = tmp_path / "a" / "taichung.json"
+    rows = json.loads(a.read_text(encoding="utf-8"))
+    assert all(is_canonical_gmaps(p["gmaps"]) for p in rows)
+    csv_rows = list(iter_source(tmp_path / "a" / "taipei.csv"))
+    assert isinstance(csv_rows[0]["tags"], list) and set(csv_rows[0]["geo"]) == {"lat", "lng"}
+    assert all(is_canonical_gmaps(p["gmaps"]) for p in csv_rows)
+
+    again = prepare_files([a, tmp_path / "a" / "taipei.csv"], tmp_path / "b")
+    assert again.gmaps_rewritten == 0
+    assert (tmp_path / "b" / "taichung.json").read_bytes() == a.read_bytes()
+    assert (tmp_path / "b" / "taipei.csv").read_bytes() == (tmp_path / "a" / "taipei.csv").read_bytes()
+
+
+def test_prepared_dir_loads_like_the_sources(tmp_path):
+    from app.config.settings import Settings
+
+    src = Settings(places_dir=DATA, places_path=None)
+    prepare_files(src.iter_place_files(), tmp_path)
+    out = Settings(places_dir=tmp_path, places_path=None)
+    # 輸出目錄當 PLACES_DIR：讀到同一組檔案、同樣的資料列（CSV 重複列一樣以 JSON 為準），只有連結 / 圖片被正規化
+    assert [p.name for p in out.iter_place_files()] == [p.name for p in src.iter_place_files()]
+    before, after = src.load_places(), out.load_places()
+    assert len(after) == len(before) == 484
+    assert [(p["city"], p["name"]) for p in after] == [(p["city"], p["name"]) for p in before]
+    assert all(is_canonical_gmaps(p["gmaps"]) for p in after)
+
+    prepare_files([DATA / "taipei.csv"], tmp_path / "csv_only")
+    assert len(Settings(places_dir=tmp_path / "csv_only", places_path=None).load_places()) == 148
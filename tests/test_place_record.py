@@ -0,0 +1,48 @@
+import json
+
+from app.services.place_record import PlaceRecord, TagVocab
+from app.utils.category import to_category
+
+RAW = {
+    "name": "象山步道", "type": "walk", "city": "台北", "district": "信義區",
+    "description": "熱門親山步道，夜景觀賞點", "tags": ["登山", "夜景", "戶外"],
+    "hours": "依場館或店家為準", "cost": "依消費或免費",
+    "geo": {"lat": None, "lng": None}, "gmaps": "https://maps.google.com/?q=x",
+}
+
+
+def test_record_reads_like_the_source_dict():
+    vocab = TagVocab()
+    r = PlaceRecord.from_dict(RAW, vocab)
+    assert set(r) == set(RAW)
+    assert r["tags"] == ("登山", "夜景", "戶外")
+    assert dict(r["geo"]) == RAW["geo"]
+    assert r.get("image_url") is None and r.get("image_url", "d") == "d" and "image_url" not in r
+    assert to_category(r) == to_category(RAW)
+    assert json.loads(json.dumps({k: (dict(v) if k == "geo" else list(v) if k == "tags" else v)
+                                  for k, v in r.items()})) == RAW
+
+
+def test_repeated_strings_are_shared_and_tags_are_bits():
+    vocab = TagVocab()
+    a = PlaceRecord.from_dict(RAW, vocab)
+    b = PlaceRecord.from_dict(json.loads(json.dumps(RAW)), vocab)
+    assert a["hours"] is b["hours"] and a["city"] is b["city"]
+    assert a.tag_bits == b.tag_bits and len(vocab) == 3
+    assert a.has_tags(vocab.mask(["夜景"])) and not a.has_tags(vocab.mask(["夜景", "未知"]) | (1 << 10))
+    assert not hasattr(a, "__dict__")
+
+
+def test_tag_bits_round_trip_past_64_tags_and_query_masks_do_not_grow_the_vocab():
+    vocab = TagVocab(f"t{i}" for i in range(70))
+    r = PlaceRecord.from_dict(dict(RAW, tags=["t69", "t0", "夜景"]), vocab)
+    assert r.tag_bits == (1 << 69) | 1 | (1 << 70) and len(vocab) == 71
+    # 讀回來照來源順序（Flex bubble 的 tag 順序不變），bit 順序只在 decode 時才看得到
+    assert r["tags"] == r.tags == ("t69", "t0", "夜景") and vocab.decode(r.tag_bits) == ("t0", "t69", "夜景")
+    assert PlaceRecord.from_dict(dict(RAW, tags=["t0", "t69"]), vocab)._tag_order is None
+    assert r.has_tags(vocab.mask(["t69", "夜景"])) and not r.has_tags(vocab.mask(["t1"]))
+    assert vocab.mask(["沒見過", "t69"]) == 1 << 69 and "沒見過" not in vocab and len(vocab) == 71
+    assert r.has_tags(vocab.mask([])) and PlaceRecord.from_dict(dict(RAW, tags=[]), vocab)["tags"] == ()
+    # 有重複的 tags 原樣保留、不編成 bit，讀回來才會跟來源一致
+    dup = PlaceRecord.from_dict(dict(RAW, tags=["t0", "t0"]), vocab)
+    assert dup["tags"] == ["t0", "t0"] and dup.tag_bits == 0
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+from app.services.place_reload import PlaceReloader, files_fingerprint
+
+
+class FakeStore:
+    def __init__(self, version):
+        self.version = version
+        self.rows = (f"row-v{version}",)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def make(tmp_path, load=None):
+    src = tmp_path / "taipei.json"
+    src.write_text("[]")
+    current = {"store": FakeStore(1)}
+    versions = iter(range(2, 100))
+
+    def swap(s):
+        old, current["store"] = current["store"], s
+        return old
+
+    r = PlaceReloader(load or (lambda: FakeStore(next(versions))), swap,
+                      lambda: files_fingerprint([src, tmp_path / "missing.snap"]))
+    r.mark_loaded(current["store"])
+    return r, src, current
+
+
+def test_reload_only_when_files_change(tmp_path):
+    r, src, current = make(tmp_path)
+    in_flight = current["store"]  # 處理中的請求握著的版本
+
+    assert r.reload_now()["status"] == "unchanged"
+    src.write_text('[{"name": "x"}]')
+    res = r.reload_now()
+    assert res["status"] == "reloaded" and res["version"] == 2
+    assert current["store"].version == 2 and in_flight.rows == ("row-v1",)
+    assert r.reload_now()["status"] == "unchanged"
+    assert r.reload_now(force=True)["version"] == 3
+
+    st = r.stats()
+    assert st["reloads"] == 2 and st["unchanged"] == 2 and st["last_reload_ms"] is not None
+
+
+def test_failed_reload_keeps_old_version_and_retries(tmp_path):
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("bad json")
+        return FakeStore(7)
+
+    r, src, current = make(tmp_path, load)
+    src.write_text("[1]")
+    res = r.reload_now()
+    assert res["status"] == "failed" and "bad json" in res["error"]
+    assert current["store"].version == 1 and r.stats()["failures"] == 1
+    # 檔案狀態沒記下來，下一次輪詢會再試
+    assert r.reload_now()["status"] == "reloaded" and current["store"].version == 7
+
+
+def test_concurrent_reload_is_rejected_and_background_loop_polls(tmp_path):
+    gate = threading.Event()
+
+    def slow_load():
+        gate.wait(5)
+        return FakeStore(9)
+
+    r, src, current = make(tmp_path, slow_load)
+    r.interval = 0.01
+
+    async def go():
+        src.write_text("[2]")
+        first = asyncio.create_task(r.reload(force=True))
+        await asyncio.sleep(0.05)
+        busy = await r.reload(force=True)
+        gate.set()
+        done = await first
+        r.start()
+        src.write_text("[3, 3]")
+        for _ in range(200):
+            if r.reloads >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await r.stop()
+        return busy, done
+
+    busy, done = asyncio.run(go())
+    assert busy["status"] == "busy" and done["status"] == "reloaded"
+    assert r.reloads == 2 and not r.stats()["running"]
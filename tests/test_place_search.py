@@ -0,0 +1,77 @@
+import random
+
+from app.services.place_search import PlaceSearchIndex, tokenize
+from app.utils.category import to_category
+
+PLACES = [
+    {"name": "台北101觀景台", "city": "台北", "district": "信義區", "type": "spot",
+     "description": "台北地標與高空景觀平台", "tags": ["地標", "觀景", "夜景"]},
+    {"name": "象山步道", "city": "台北", "district": "信義區", "type": "walk",
+     "description": "看101與台北夜景的熱門步道", "tags": ["步道", "夜景"]},
+    {"name": "彩虹眷村", "city": "台中", "district": "南屯區", "type": "spot",
+     "description": "色彩繽紛的拍照景點", "tags": ["拍照", "文化"]},
+    {"name": "宮原眼科", "city": "台中", "district": "中區", "type": "shop",
+     "description": "老建築裡的冰淇淋與甜點", "tags": ["甜點", "美食", "古蹟"]},
+    {"name": "駁二藝術特區", "city": "高雄", "district": "鹽埕區", "type": "museum",
+     "description": "倉庫改建的藝文園區", "tags": ["展覽", "藝術"]},
+]
+
+
+def build(rows, previous=None):
+    return PlaceSearchIndex(rows, [to_category(p) for p in rows], previous=previous)
+
+
+def names(hits):
+    return [h.place["name"] for h in hits]
+
+
+def test_tokenize_uses_cjk_bigrams_and_ascii_words():
+    assert tokenize("台北101夜景") == ["台北", "101", "夜景"]
+    assert tokenize("ＡＢＣ 甜點！") == ["abc", "甜點"]
+
+
+def test_name_matches_rank_above_description_matches():
+    idx = build(PLACES)
+    assert names(idx.search("象山"))[0] == "象山步道"
+    assert names(idx.search("101"))[:2] == ["台北101觀景台", "象山步道"]
+    assert names(idx.search("甜點")) == ["宮原眼科"]
+    assert idx.search("不存在的字") == []
+
+
+def test_multi_term_queries_intersect_and_relax_to_best_subset():
+    idx = build(PLACES)
+    assert names(idx.search("信義 夜景步道")) == ["象山步道"]
+    # 沒有一筆同時有全部的詞 → 用命中最多詞的組合（老建 / 建築 / 甜點），不是只剩「藝文」
+    assert names(idx.search("老建築甜點 藝文")) == ["宮原眼科"]
+
+
+def test_filters():
+    idx = build(PLACES)
+    assert names(idx.search("夜景", city="台中")) == []
+    assert names(idx.search("拍照", city="台中", district="南屯區")) == ["彩虹眷村"]
+    assert names(idx.search("台北", category="park_walk")) == ["象山步道"]
+
+
+def test_incremental_build_reuses_unchanged_rows():
+    first = build(PLACES)
+    rows = PLACES[:4] + [dict(PLACES[4], description="港邊的藝文園區與夜景")]
+    second = build(rows, previous=first)
+    assert second.reused == 4
+    assert "駁二藝術特區" in names(second.search("夜景"))
+
+
+def test_top_k_on_a_large_corpus_respects_filters_and_cache():
+    rnd = random.Random(7)
+    words = ["夜景", "步道", "甜點", "咖啡", "老街", "公園", "古蹟", "市場", "展覽", "溫泉", "海景", "森林"]
+    rows = [{"name": f"{rnd.choice(words)}{rnd.choice(words)}{i}", "city": rnd.choice(["台北", "台中", "高雄"]),
+             "district": "中區", "description": "".join(rnd.sample(words, 4)), "tags": rnd.sample(words, 2)}
+            for i in range(20_000)]
+    idx = PlaceSearchIndex(rows, ["landmark"] * len(rows))
+
+    for w in words:
+        hits = idx.search(w, limit=10, city="台中")
+        assert len(hits) == 10 and all(h.place["city"] == "台中" for h in hits)
+    for q in ["咖啡老街", "甜點 展覽", "森林公園", "夜景12"]:
+        first = names(idx.search(q, limit=10))
+        assert first and len(first) <= 10
+        assert names(idx.search(q, limit=10)) == first   # 第二次命中結果快取
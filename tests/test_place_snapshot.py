@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.services.place_record import PlaceRecord, TagVocab
+from app.services.place_snapshot import SnapshotError, read_snapshot, write_snapshot
+from app.utils.category import to_category
+
+DATA = Path(__file__).resolve().parents[1] / "app" / "data"
+
+
+def _records(raw):
+    vocab = TagVocab()
+    recs = [PlaceRecord.from_dict(p, vocab) for p in raw]
+    return recs, [to_category(r) for r in recs]
+
+
+def _plain(r):
+    return {k: (dict(v) if k == "geo" else list(v) if k == "tags" else v) for k, v in r.items()}
+
+
+def test_roundtrip_matches_json(tmp_path):
+    raw = json.loads((DATA / "taichung.json").read_text(encoding="utf-8"))
+    raw += [
+        {"name": "有座標", "city": "台北", "district": "大安區", "geo": {"lat": 25.03, "lng": 121.54},
+         "place_id": "ChIJ123", "tags": ["夜景", "夜景"], "rating": 4.5},
+        {"name": "沒有欄位"},
+        {"name": "順序甲", "tags": ["甲", "乙"]},
+        {"name": "順序乙", "tags": ["乙", "丙", "甲"]},    # 和 bit 順序不同
+    ]
+    recs, cats = _records(raw)
+    path = tmp_path / "p.snap"
+    write_snapshot(path, recs, cats)
+
+    snap = read_snapshot(path)
+    assert snap.categories == cats
+    assert [_plain(r) for r in snap.rows] == [_plain(r) for r in recs]
+    assert [list(r["tags"]) for r in snap.rows[-2:]] == [p["tags"] for p in raw[-2:]]
+    # 重複字串讀回來共用同一個物件
+    assert snap.rows[0]["hours"] is snap.rows[1]["hours"]
+
+
+def test_corrupt_or_stale_snapshot_is_rejected(tmp_path):
+    src = tmp_path / "taipei.json"
+    src.write_text(json.dumps([{"name": "a", "city": "台北", "district": "信義區", "tags": ["地標"]}]))
+    recs, cats = _records(json.loads(src.read_text()))
+    path = tmp_path / "p.snap"
+    write_snapshot(path, recs, cats, sources=[src])
+    assert len(read_snapshot(path, sources=[src]).rows) == 1
+
+    # 新增或少了來源檔都算過期（新檔不在 header 裡也要發現）
+    extra = tmp_path / "taipei.csv"
+    extra.write_text("name,city\nb,台北\n", encoding="utf-8")
+    with pytest.raises(SnapshotError, match="added"):
+        read_snapshot(path, sources=[src, extra])
+    with pytest.raises(SnapshotError, match="removed"):
+        read_snapshot(path, sources=[])
+
+    src.write_text("[]")
+    with pytest.raises(SnapshotError, match="stale"):
+        read_snapshot(path, sources=[src])
+
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_snapshot(path)
+
+    path.write_bytes(b"{}")
+    with pytest.raises(SnapshotError):
+        read_snapshot(path)
+    with pytest.raises(SnapshotError):
+        read_snapshot(tmp_path / "missing.snap")
+
+
+def test_snapshot_and_json_fallback_read_the_same_sources(tmp_path, monkeypatch):
+    from app.config.settings import Settings
+    from app.services import place_snapshot, places
+
+    (tmp_path / "taipei.json").write_text(json.dumps(
+        [{"name": "a", "city": "台北", "district": "信義區", "tags": ["地標"]}], ensure_ascii=False), encoding="utf-8")
+    # CSV 裡與 JSON 重複的那筆以 JSON 為準，另一筆只在 CSV 裡
+    (tmp_path / "taipei.csv").write_text(
+        "name,city,district,tags0,lat,lng\na,台北,信義區,重複,,\nb,台北,大安區,公園,25.03,121.54\n", encoding="utf-8")
+    cfg = Settings(places_dir=tmp_path, places_path=None, places_snapshot=tmp_path / "p.snap")
+    monkeypatch.setattr(places, "settings", cfg)
+    monkeypatch.setattr("app.config.settings.settings", cfg)
+
+    fallback = places.PlaceStore.from_settings()
+    assert fallback.origin != "snapshot"
+    assert place_snapshot.main(["-o", str(tmp_path / "p.snap")]) == 0
+    snap = places.PlaceStore.from_settings()
+    assert snap.origin == "snapshot"
+    assert [_plain(r) for r in snap.rows] == [_plain(r) for r in fallback.rows]
+    assert [r["name"] for r in snap.rows] == ["a", "b"] and snap.rows[0]["tags"] == ("地標",)
+
+    (tmp_path / "kaohsiung.json").write_text("[]", encoding="utf-8")   # 新來源 → 快照過期，退回讀檔
+    assert places.PlaceStore.from_settings().origin != "snapshot"
+
+
+def test_snapshot_path_follows_places_dir_so_synced_snapshots_are_used(tmp_path, monkeypatch):
+    from app.config.settings import Settings
+    from app.services import place_snapshot, places
+
+    assert Settings(places_dir=tmp_path).snapshot_path == tmp_path / "places.snap"
+    assert Settings(places_dir=tmp_path, places_snapshot=tmp_path / "x" / "p.snap").snapshot_path == tmp_path / "x" / "p.snap"
+    assert Settings(places_dir=tmp_path, places_snapshot=None).snapshot_path is None
+
+    (tmp_path / "taipei.json").write_text(json.dumps(
+        [{"name": "a", "city": "台北", "district": "信義區"}], ensure_ascii=False), encoding="utf-8")
+    cfg = Settings(places_dir=tmp_path, places_path=None)
+    monkeypatch.setattr(places, "settings", cfg)
+    monkeypatch.setattr("app.config.settings.settings", cfg)
+    # 像 GCS 同步那樣把 .snap 放進 places_dir，不另外設 PLACES_SNAPSHOT 也會用到
+    assert place_snapshot.main([]) == 0 and (tmp_path / "places.snap").is_file()
+    assert places.PlaceStore.from_settings().origin == "snapshot"
@@ -0,0 +1,116 @@
+import threading
+
+from app.services import places
+from app.services.places import PlaceIndex, PlaceStore, filter_places, get_store, register_warmer, swap_store
+from app.utils.category import to_category
+
+
+def place(name, city="台北", district="信義區", type_="spot", tags=()):
+    return {"name": name, "city": city, "district": district, "type": type_, "tags": list(tags)}
+
+
+ROWS = [
+    place("台北101"),
+    place("故宮", district="士林區", type_="museum"),
+    place("饒河夜市", tags=["夜市"]),
+    place("象山步道", type_="walk"),
+    place("四四南村"),
+    place("士林夜市", district="士林區", tags=["夜市"]),
+    place("國美館", city="台中", district="西區", type_="museum"),
+]
+
+
+def test_buckets_keep_source_order_and_categories_are_computed_once():
+    idx = PlaceIndex(ROWS)
+    assert idx.categories == [to_category(p) for p in ROWS]
+    assert [p["name"] for p in idx.bucket("台北", "信義區")] == ["台北101", "饒河夜市", "象山步道", "四四南村"]
+    assert [p["name"] for p in idx.bucket("台北", "信義區", "landmark")] == ["台北101", "四四南村"]
+    assert [p["name"] for p in idx.by_city["台北"]] == [p["name"] for p in ROWS[:6]]
+    assert idx.categories_of("台北", "信義區") == ("food_market", "landmark", "park_walk")
+    assert idx.categories_of("台北", "士林區") == ("food_market", "museum")
+
+
+def test_missing_keys_return_empty_without_growing_buckets():
+    idx = PlaceIndex(ROWS)
+    before = (len(idx.by_district), len(idx.by_category))
+    assert idx.bucket("台北", "大安區") == () and idx.bucket("台北", "信義區", "museum") == ()
+    assert idx.categories_of("高雄", "前金區") == ()
+    assert (len(idx.by_district), len(idx.by_category)) == before
+    assert isinstance(idx.bucket("台北", "信義區"), tuple)
+
+
+def test_precomputed_categories_are_used_as_is():
+    idx = PlaceIndex(ROWS[:2], categories=["museum", "museum"])
+    assert idx.bucket("台北", "信義區", "museum") == (ROWS[0],)
+    assert idx.version != PlaceIndex(ROWS[:2]).version
+
+
+def test_filter_places_pages_a_bucket():
+    class Store:
+        index = PlaceIndex([place(f"p{i}") for i in range(13)])
+
+    pages = [filter_places("台北", "信義區", None, page=n, page_size=6, store=Store) for n in (1, 2, 3)]
+    assert [len(p["items"]) for p in pages] == [6, 6, 1]
+    assert [p["has_next"] for p in pages] == [True, True, False]
+    assert pages[2]["items"][0]["name"] == "p12" and pages[0]["total"] == 13
+    assert filter_places("台北", "信義區", "museum", store=Store)["items"] == []
+
+
+def test_store_freezes_rows_and_indexes_names():
+    raw = ROWS + [place("台北101", district="中正區"), dict(place("無連結"), gmaps="maps.app.goo.gl/x")]
+    store = PlaceStore(raw)
+    assert len(store) == len(raw) and store.by_name["台北101"]["district"] == "信義區"
+    assert store.rows[0]["name"] == "台北101" and not hasattr(store.rows[0], "__dict__")
+    assert store.by_name["無連結"]["gmaps"].startswith("https://www.google.com/maps")
+    assert [p["name"] for p in store.by_category["museum"]] == ["故宮", "國美館"]
+    assert store.stats()["version"] == store.version == store.index.version
+
+
+def test_swap_keeps_the_old_store_intact_for_requests_in_flight(monkeypatch):
+    monkeypatch.setattr(places, "_STORE", PlaceStore(ROWS))
+    in_flight = get_store()
+    new = PlaceStore(ROWS[:2])
+    assert swap_store(new) is in_flight
+    assert get_store() is new and new.version > in_flight.version
+    assert len(in_flight) == len(ROWS) and filter_places("台北", "信義區", None, store=in_flight)["total"] == 4
+    assert filter_places("台北", "信義區", None)["total"] == 1
+
+
+def test_derived_is_built_once_per_store_and_follows_swaps():
+    builds = []
+    started = threading.Barrier(4)
+
+    def build(store):
+        builds.append(store.version)
+        return {"n": len(store)}
+
+    a, b = PlaceStore(ROWS), PlaceStore(ROWS[:3])
+    out = []
+
+    def worker():
+        started.wait()
+        out.append(a.derived("count", build))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert builds == [a.version] and all(x is out[0] for x in out)
+    assert b.derived("count", build) == {"n": 3} and builds == [a.version, b.version]
+    # 衍生物可以依賴另一個衍生物
+    assert a.derived("double", lambda s: s.derived("count", build)["n"] * 2) == 14 and len(builds) == 2
+
+
+def test_warm_builds_lazy_indexes_and_registered_warmers(monkeypatch):
+    monkeypatch.setattr(places, "_WARMERS", [])
+    warmed = []
+
+    @register_warmer
+    def broken(store):
+        raise RuntimeError("bad warmer")
+
+    register_warmer(lambda store: warmed.append(store.derived("names", lambda s: sorted(s.by_name))))
+    store = PlaceStore(ROWS).warm()       # 一個 warmer 失敗不影響其他
+    assert {"by_category", "geo_index", "geo_store"} <= set(vars(store))
+    assert warmed and store.derived("names", lambda s: []) is warmed[0]
@@ -0,0 +1,85 @@
+from app.services.rate_limit import (
+    LIMITED_GLOBAL, LIMITED_USER, MODES, Limit, RateLimiter, limited_reply, parse_limits,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def make(user_per_min=6, user_burst=3, global_per_min=60, global_burst=5, modes=("ai",)):
+    clock = Clock()
+    lim = Limit(user_per_min, user_burst, global_per_min, global_burst)
+    return RateLimiter({m: lim for m in modes}, clock=clock), clock
+
+
+def test_user_burst_then_refill():
+    rl, clock = make()
+    assert [rl.allow("U1", "ai") for _ in range(4)] == [None, None, None, "user"]
+    clock.t += 5          # 6/min = 每 10 秒一個
+    assert rl.allow("U1", "ai") == "user"
+    clock.t += 5
+    assert rl.allow("U1", "ai") is None
+    assert rl.allow("U2", "ai") is None   # 別人不受影響
+    s = rl.stats()["ai"]
+    assert (s["allowed"], s["rejected_user"], s["users"], s["users_limited"]) == (5, 2, 2, 1)
+
+
+def test_global_bucket_caps_all_users():
+    rl, clock = make(global_burst=5)
+    assert [rl.allow(f"U{i}", "ai") for i in range(7)] == [None] * 5 + ["global"] * 2
+    assert rl.stats()["ai"]["global_fill"] == 0.0
+    clock.t += 1          # 60/min = 每秒一個
+    assert rl.allow("U9", "ai") is None
+    assert rl.stats()["ai"]["rejected_global"] == 2
+
+
+def test_modes_are_separate_and_multi_mode_is_all_or_nothing():
+    rl, clock = make(user_burst=1, modes=("ai", "push", "summary"))
+    assert rl.allow("U1", "summary") is None
+    assert rl.allow("U1", "summary") == "user"
+    assert rl.allow("U1", "ai", "push") is None
+    assert rl.allow("U1", "ai", "push") == "user"
+    # push 被擋時 ai 的 token 也不能被扣掉
+    rl2, _ = make(user_burst=1, modes=("ai", "push"))
+    rl2.allow("U1", "push")
+    assert rl2.allow("U1", "ai", "push") == "user"
+    assert rl2.allow("U1", "ai") is None
+    assert rl.allow("U1", "translate") is None   # 沒設定的模式不限
+
+
+def test_full_user_buckets_are_pruned_at_capacity():
+    clock = Clock()
+    rl = RateLimiter({"ai": Limit(60, 2, 10_000, 10_000)}, max_users=3, clock=clock)
+    for u in ("U1", "U2", "U3"):
+        rl.allow(u, "ai")
+    clock.t += 1          # U1..U3 都補滿了
+    rl.allow("U4", "ai")
+    assert rl.stats()["ai"]["users"] == 1
+
+
+def test_active_users_are_bounded_by_evicting_least_recently_used():
+    clock = Clock()
+    rl = RateLimiter({"ai": Limit(6, 3, 10_000, 10_000)}, max_users=10, clock=clock)
+    assert [rl.allow("U0", "ai") for _ in range(4)] == [None, None, None, "user"]
+    for i in range(1, 100):               # 同一瞬間，沒有任何 bucket 補滿
+        rl.allow(f"U{i}", "ai")
+        if i % 5 == 0:
+            assert rl.allow("U0", "ai") == "user"   # 一直被擋的人也算最近用過，不會被淘汰而重拿額度
+        assert rl.stats()["ai"]["users"] <= 10
+    assert rl.allow("U0", "ai") == "user"
+    assert [rl.allow("U1", "ai") for _ in range(3)] == [None] * 3   # 很久沒用的已被淘汰，從滿的開始
+
+
+def test_parse_limits_and_canned_replies():
+    default = Limit(6, 3, 300, 30)
+    limits = parse_limits('{"ai": [2, 1, 100, 10]}', default)
+    assert limits["ai"] == Limit(2.0, 1, 100.0, 10) and limits["fallback"] == default
+    assert set(limits) == set(MODES)
+    assert parse_limits('{"ai": [1]}', default)["ai"] == default
+    assert limited_reply("user") == LIMITED_USER and limited_reply("global") == LIMITED_GLOBAL
+
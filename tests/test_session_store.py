@@ -0,0 +1,116 @@
+import asyncio
+import gc
+import tracemalloc
+
+from app.services.roulette import FOOD_TYPES, spin_food_roulette
+from app.services.session_store import RECENT_MAX, MemoryBackend, Session, SessionStore
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_remember_is_bounded_and_moves_repeats_to_the_end():
+    s = Session()
+    assert s.recent_of("today") == ()
+    for i in range(RECENT_MAX + 3):
+        s.remember("today", f"p{i}")
+    assert s.recent_of("today") == tuple(f"p{i}" for i in range(3, RECENT_MAX + 3))
+    s.remember("today", "p3")
+    assert s.recent_of("today")[-1] == "p3" and len(s.recent_of("today")) == RECENT_MAX
+    assert s.recent_of("food") == ()
+
+
+def test_dict_round_trip_for_shared_backend():
+    s = Session("台北", "信義區", ("food_market", 2))
+    s.remember("food", "火鍋 🍲")
+    t = Session.from_dict(s.to_dict())
+    assert (t.city, t.district, t.cursor, t.recent_of("food")) == ("台北", "信義區", ("food_market", 2), ("火鍋 🍲",))
+
+
+def test_lru_cap_and_ttl_expiry():
+    async def go():
+        store = SessionStore(MemoryBackend(max_users=3), ttl=60)
+        for u in ("U1", "U2", "U3"):
+            s = await store.get(u)
+            s.remember("today", u)
+            await store.save(u, s)
+        await store.get("U1")               # U1 變成最近使用
+        await store.save("U4", Session())   # 淘汰最久沒動的 U2
+        assert (await store.get("U2")).recent_of("today") == ()
+        assert (await store.get("U1")).recent_of("today") == ("U1",)
+        assert store.stats()["evicted"] == 1
+
+        short = SessionStore(MemoryBackend(), ttl=0.05)
+        await short.save("U1", Session("台北"))
+        assert (await short.get("U1")).city == "台北"
+        await asyncio.sleep(0.08)
+        assert (await short.get("U1")).city is None
+        assert short.stats()["expired"] == 1
+
+    run(go())
+
+
+def test_missing_user_id_and_backend_errors_degrade_to_empty_session():
+    class Broken:
+        expired = evicted = 0
+
+        async def get(self, user_id):
+            raise ConnectionError("down")
+
+        async def set(self, user_id, session, ttl):
+            raise ConnectionError("down")
+
+        def size(self):
+            return None
+
+    async def go():
+        store = SessionStore(Broken())
+        s = await store.get("U1")
+        s.remember("today", "x")
+        await store.save("U1", s)
+        await store.save(None, s)
+        assert (await store.get(None)).recent_of("today") == ()
+        assert store.stats()["errors"] == 2
+
+    run(go())
+
+
+def test_roulette_skips_recent_picks_until_exhausted():
+    recent = tuple(FOOD_TYPES[:-1])
+    for _ in range(20):
+        assert spin_food_roulette(recent=recent)["food"] == FOOD_TYPES[-1]
+    assert spin_food_roulette(recent=tuple(FOOD_TYPES))["food"] in FOOD_TYPES
+
+
+def test_memory_per_user_is_small_and_full_store_stays_bounded():
+    n = 100_000
+    ids = [f"U{i:032x}" for i in range(n)]
+    names = [f"place{i}" for i in range(50)]
+
+    async def fill(store):
+        for i, u in enumerate(ids):
+            s = await store.get(u)
+            s.city, s.district = "台北", "信義區"
+            s.remember("today", names[i % 50])
+            await store.save(u, s)
+
+    gc.collect()
+    tracemalloc.start()
+    store = SessionStore(MemoryBackend(max_users=n), ttl=3600)
+    run(fill(store))
+    per_user, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_user /= n
+    assert per_user < 700, f"{per_user:.0f} B/user"
+
+    async def touch(extra):
+        for u in extra:
+            s = await store.get(u)
+            s.remember("food", "火鍋 🍲")
+            await store.save(u, s)
+
+    # 滿載後每位新使用者都淘汰最久沒用的一位（單次成本見 bench/bench_session_memory）
+    run(touch([f"V{i:032x}" for i in range(1000)]))
+    st = store.stats()
+    assert st["size"] == n and st["evicted"] == 1000